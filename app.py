@@ -1,11 +1,18 @@
+import os
+import startup
 from flask import Flask
+from storage import CapacityExceeded
 
 # Import blueprints
-from routes.pages import pages
-from routes.auth import auth
-from routes.events import events
-from routes.admin import admin
-from routes.analytics import analytics
+with startup.timed("import blueprints"):
+    from routes.pages import pages
+    from routes.auth import auth
+    from routes.events import events
+    from routes.admin import admin
+    from routes.analytics import analytics
+    from routes.metrics import metrics, instrument_dynamodb
+    from routes.promotions import ensure_worker_thread
+    from routes.passwords import BrokenProcessPool, PasswordBusy
 
 app = Flask(__name__)
 
@@ -15,6 +22,37 @@ app.register_blueprint(auth)
 app.register_blueprint(events)
 app.register_blueprint(admin)
 app.register_blueprint(analytics)
+app.register_blueprint(metrics)
+
+
+@app.errorhandler(CapacityExceeded)
+def capacity_exceeded(e):
+    # Low-priority work shed to keep capacity for bookings
+    return "The service is busy right now. Please try again shortly.", 503, {"Retry-After": "5"}
+
+
+@app.errorhandler(PasswordBusy)
+@app.errorhandler(BrokenProcessPool)
+def password_busy(e):
+    # Logins and registrations beyond the password hashing queue, or caught
+    # by a hashing worker dying; the pool is replaced for the next request
+    return "Too many sign-ins right now. Please try again shortly.", 503, {"Retry-After": "2"}
+
+
+# Count, time and cost every DynamoDB call for /metrics and Server-Timing.
+# The client itself is created lazily in each worker process.
+if os.getenv("STORAGE_BACKEND", "dynamodb") == "dynamodb":
+    from db import on_client_created
+    on_client_created(instrument_dynamodb)
+
+# Waitlist promotions run in a background thread of each web process unless
+# a separate worker (promotion_worker.py) is deployed. The thread is started
+# by the first request a process serves, so with gunicorn --preload every
+# forked worker gets its own.
+if os.getenv("PROMOTION_WORKER", "thread") == "thread":
+    app.before_request(ensure_worker_thread)
+
+startup.ready("app ready")
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
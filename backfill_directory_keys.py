@@ -0,0 +1,42 @@
+from db import get_table, users_table_name
+from storage.directory import name_key
+from storage.dynamodb import scan_all
+
+# DynamoDB-only migration: users created before the admin directory have no
+# name_key, so the directory's name index does not list them. The local
+# storage backends only list users created since, so recreate those stores.
+def backfill_directory_keys():
+    users_table = get_table(users_table_name)
+
+    print("Adding directory keys to existing users...")
+
+    updated = 0
+
+    # Walk every user that still lacks a key
+    for user in scan_all(
+        users_table,
+        ProjectionExpression="id, full_name, username, email, #r",
+        FilterExpression="attribute_not_exists(name_key)",
+        ExpressionAttributeNames={"#r": "role"}
+    ):
+        key = name_key(user)
+        if not key:
+            print(f"Skipped {user['id']}: no name or email")
+            continue
+
+        # The directory index is keyed by role, so users without one stay
+        # unlisted until a role is set
+        if "role" not in user:
+            print(f"Note {user['id']}: no role, not listed in the directory")
+
+        users_table.update_item(
+            Key={"id": user["id"]},
+            UpdateExpression="SET name_key = :k",
+            ExpressionAttributeValues={":k": key}
+        )
+        updated += 1
+
+    print(f"Updated {updated} users.")
+
+if __name__ == "__main__":
+    backfill_directory_keys()
@@ -0,0 +1,40 @@
+from db import get_db, get_table, users_table_name, user_emails_table_name
+
+# DynamoDB-only migration: the local storage backends always claim emails
+def backfill_email_claims():
+    db = get_db()
+    users_table = get_table(users_table_name)
+    user_emails_table = get_table(user_emails_table_name)
+
+    print("Claiming emails for existing users...")
+
+    claimed = 0
+    scan_kwargs = {"ProjectionExpression": "id, email"}
+
+    # Walk every page of the users table
+    while True:
+        response = users_table.scan(**scan_kwargs)
+
+        for user in response.get("Items", []):
+            email = user.get("email")
+            if not email:
+                continue
+
+            try:
+                # Only claim emails nobody holds yet; re-runs are harmless
+                user_emails_table.put_item(
+                    Item={"email": email, "user_id": user["id"]},
+                    ConditionExpression="attribute_not_exists(email)"
+                )
+                claimed += 1
+            except db.meta.client.exceptions.ConditionalCheckFailedException:
+                print(f"Skipped {email}: already claimed")
+
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    print(f"Claimed {claimed} emails.")
+
+if __name__ == "__main__":
+    backfill_email_claims()
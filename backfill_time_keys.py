@@ -0,0 +1,36 @@
+from storage import get_storage
+from routes.timekeys import TIME_KEY_FIELDS, time_keys
+from storage.listing import LISTING_KEY
+
+def backfill_time_keys():
+    storage = get_storage()
+
+    # Writing starts_at also files the event under the start-time index the
+    # event list reads, so events from before that index are rewritten too
+    print("Adding normalised time fields to existing events...")
+
+    updated = 0
+
+    # Walk every event
+    for event in storage.events.scan(
+        ["id", "event_date", "event_time", "created_at", LISTING_KEY] + TIME_KEY_FIELDS
+    ):
+        if all(field in event for field in TIME_KEY_FIELDS + [LISTING_KEY]):
+            continue
+
+        try:
+            keys = time_keys(event)
+        except ValueError as e:
+            print(f"Skipped {event['id']}: {e}")
+            continue
+
+        if not keys:
+            continue
+
+        storage.events.update_fields(event["id"], keys)
+        updated += 1
+
+    print(f"Updated {updated} events.")
+
+if __name__ == "__main__":
+    backfill_time_keys()
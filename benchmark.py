@@ -0,0 +1,474 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Load test for the booking and listing hot paths. Drives the Flask app
+# in-process against a local stand-in for DynamoDB and prints one JSON
+# document, so runs can be saved and compared over time:
+#
+#   python benchmark.py --backend memory --clients 32 > bench.json
+#
+# Backends: memory and sqlite use the local storage layer; moto runs the
+# real DynamoDB code against moto's mock (pip install moto). Moto does not
+# apply concurrent updates atomically, so use --clients 1 when checking the
+# booking invariants against it.
+
+SCENARIOS = ["list_events", "book_hot_event", "cancel_with_promotion", "login", "analytics"]
+PASSWORD = "benchmark-password"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test UniGather request handlers")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "moto"], default="memory")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--users", type=int, default=200, help="students competing for the hot event")
+    parser.add_argument("--events", type=int, default=500, help="events in the listing")
+    parser.add_argument("--capacity", type=int, default=50, help="capacity of the hot event")
+    parser.add_argument("--requests", type=int, default=400, help="requests per read scenario")
+    parser.add_argument("--logins", type=int, default=40, help="requests in the login scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+# BACKEND SETUP
+
+
+def create_moto_tables():
+    # Mirrors the key schemas in terraform/dynamoDB.tf
+    import boto3
+    import db
+
+    dynamodb = boto3.resource("dynamodb", region_name=db.region)
+    throughput = {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5}
+
+    def create(name, keys, extra_attributes=(), **kwargs):
+        dynamodb.create_table(
+            TableName=name,
+            KeySchema=[
+                {"AttributeName": key, "KeyType": key_type}
+                for key, key_type in zip(keys, ("HASH", "RANGE"))
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": name, "AttributeType": "S"}
+                for name in list(keys) + list(extra_attributes)
+            ],
+            ProvisionedThroughput=throughput,
+            **kwargs
+        )
+
+    def including(*attributes):
+        # Same projected attributes as the index in terraform, so reading
+        # an attribute an index does not carry fails here too
+        return {"ProjectionType": "INCLUDE", "NonKeyAttributes": list(attributes)}
+
+    def directory_index(name, sort_key, projection):
+        return {
+            "IndexName": name,
+            "KeySchema": [
+                {"AttributeName": "role", "KeyType": "HASH"},
+                {"AttributeName": sort_key, "KeyType": "RANGE"}
+            ],
+            "Projection": projection,
+            "ProvisionedThroughput": throughput
+        }
+
+    create(db.users_table_name, ["id"], ["email", "role", "name_key"], GlobalSecondaryIndexes=[
+        {
+            "IndexName": "email-index",
+            "KeySchema": [{"AttributeName": "email", "KeyType": "HASH"}],
+            "Projection": including(
+                "password", "role", "full_name", "username", "session_version"
+            ),
+            "ProvisionedThroughput": throughput
+        },
+        directory_index("role-name-index", "name_key", including("full_name", "email")),
+        directory_index("role-email-index", "email", including("full_name"))
+    ])
+    dynamodb.create_table(
+        TableName=db.events_table_name,
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "id", "AttributeType": "S"},
+            {"AttributeName": "listing_key", "AttributeType": "S"},
+            {"AttributeName": "starts_at", "AttributeType": "N"}
+        ],
+        GlobalSecondaryIndexes=[{
+            "IndexName": "start-time-index",
+            "KeySchema": [
+                {"AttributeName": "listing_key", "KeyType": "HASH"},
+                {"AttributeName": "starts_at", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+            "ProvisionedThroughput": throughput
+        }],
+        ProvisionedThroughput=throughput
+    )
+    create(db.user_emails_table_name, ["email"])
+    create(db.analytics_table_name, ["kind", "bucket"])
+    create(db.promotion_jobs_table_name, ["id"])
+    create(
+        db.bookings_table_name, ["event_id", "user_id"], ["status_key"],
+        LocalSecondaryIndexes=[{
+            "IndexName": "event-status-index",
+            "KeySchema": [
+                {"AttributeName": "event_id", "KeyType": "HASH"},
+                {"AttributeName": "status_key", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "KEYS_ONLY"}
+        }],
+        GlobalSecondaryIndexes=[{
+            "IndexName": "user-index",
+            "KeySchema": [
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "status_key", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "KEYS_ONLY"},
+            "ProvisionedThroughput": throughput
+        }]
+    )
+
+
+def start_backend(args):
+    # Selects the backend before anything imports the storage layer.
+    # Returns a context to keep open for the run, if the backend needs one.
+    os.environ["PROMOTION_WORKER"] = "off"
+    os.environ.setdefault("DEV_MODE", "on")
+    # Every client is one thread of the same process, so let all their
+    # logins queue for password hashing rather than be turned away
+    os.environ.setdefault("PASSWORD_QUEUE", str(args.clients))
+    os.environ.setdefault("PASSWORD_QUEUE_TIMEOUT", "60")
+
+    if args.backend == "moto":
+        from moto import mock_aws
+
+        for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            os.environ.setdefault(name, "benchmark")
+        os.environ["STORAGE_BACKEND"] = "dynamodb"
+        mock = mock_aws()
+        mock.start()
+        create_moto_tables()
+        return mock
+
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if args.backend == "sqlite" and not os.getenv("SQLITE_PATH"):
+        # A throwaway database, removed again in main()
+        os.environ["SQLITE_PATH"] = f"benchmark-{uuid.uuid4().hex[:8]}.db"
+        return os.environ["SQLITE_PATH"]
+    return None
+
+
+class CallCounter:
+    # Counts data layer calls: DynamoDB API calls on the moto backend,
+    # repository calls on the local backends
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def hit(self, **kwargs):
+        with self.lock:
+            self.calls += 1
+
+    def reset(self):
+        with self.lock:
+            calls, self.calls = self.calls, 0
+        return calls
+
+    def install(self, backend, storage):
+        if backend == "moto":
+            import db
+            db.on_client_created(
+                lambda client: client.meta.events.register("before-call.dynamodb", self.hit)
+            )
+            return
+
+        for repository in (storage.users, storage.events, storage.bookings, storage.analytics):
+            for name in dir(repository):
+                method = getattr(repository, name)
+                if not name.startswith("_") and callable(method):
+                    setattr(repository, name, self.wrap(method))
+
+    def wrap(self, method):
+        def counted(*args, **kwargs):
+            self.hit()
+            return method(*args, **kwargs)
+        return counted
+
+
+# DATA
+
+
+def seed(storage, args):
+    # Creates the staff account, the competing students and a listing of
+    # events spread over the coming months, plus one hot event
+    from werkzeug.security import generate_password_hash
+    from routes.passwords import PASSWORD_METHOD
+    from routes.timekeys import time_keys
+
+    # Hashing is slow on purpose, so every account shares one hash, made
+    # with the current work factor so logins never trigger a rehash
+    password_hash = generate_password_hash(PASSWORD, method=PASSWORD_METHOD)
+
+    def user(user_id, role):
+        return {
+            "id": user_id,
+            "full_name": f"Benchmark {user_id}",
+            "email": f"{user_id}@benchmark.ac.uk",
+            "password": password_hash,
+            "role": role
+        }
+
+    storage.users.create(user("staff", "staff"))
+    students = [f"student-{i}" for i in range(args.users)]
+    for student_id in students:
+        storage.users.create(user(student_id, "student"))
+
+    start = datetime(2030, 1, 1, 9, 0)
+    for i in range(args.events + 1):
+        when = start + timedelta(hours=7 * i)
+        event = {
+            "id": "hot-event" if i == args.events else f"event-{i}",
+            "host_name": "Benchmark",
+            "host_email": "staff@benchmark.ac.uk",
+            "event_name": f"Event {i}",
+            "event_loc": "Main Hall",
+            "event_date": when.strftime("%Y-%m-%d"),
+            "event_time": when.strftime("%H:%M"),
+            "event_cap": args.capacity if i == args.events else 100,
+            "event_desc": "Generated by benchmark.py",
+            "created_at": (start - timedelta(days=i % 60)).isoformat(),
+            "booked_count": 0,
+            "waitlist_count": 0
+        }
+        event.update(time_keys(event))
+        storage.events.create(event)
+
+    from routes.analytics_store import rebuild
+    rebuild()
+    return students
+
+
+# RUNNING
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(app, counter, calls, clients):
+    # Runs (user_id, role, method, path, kwargs) calls on `clients` threads,
+    # each with its own test client. Returns latency and throughput figures.
+    from routes import analytics_store
+    from routes.permissions import issue_session
+
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(call):
+        user_id, role, method, path, kwargs = call
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+
+        if user_id:
+            client.set_cookie("session", issue_session({"id": user_id, "role": role}))
+        else:
+            client.delete_cookie("session")
+
+        started = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+
+        with lock:
+            latencies.append(elapsed * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    counter.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(send, calls))
+    wall = time.perf_counter() - started
+
+    # Counter updates are written in the background; apply this scenario's
+    # before its calls are counted so they never spill into the next one
+    analytics_store.flush()
+    db_calls = counter.reset()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": round(wall, 4),
+        "requests_per_sec": round(len(latencies) / wall, 1) if wall else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3)
+        },
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "server_errors": sum(n for code, n in statuses.items() if code >= 500),
+        "db_calls": db_calls,
+        "db_calls_per_request": round(db_calls / len(latencies), 2)
+    }
+
+
+def check_hot_event(storage, args, students, expect_booked):
+    # Booking invariants: never over capacity, the counters match the
+    # booking items, nobody is booked twice or both booked and waitlisted,
+    # and nobody who asked is lost
+    event = storage.events.get("hot-event", consistent=True)
+    booked = storage.bookings.booked_user_ids("hot-event")
+    waitlisted = storage.bookings.waitlisted_user_ids("hot-event")
+    failures = []
+
+    if len(booked) > args.capacity:
+        failures.append(f"oversold: {len(booked)} booked for {args.capacity} seats")
+    if int(event.get("booked_count", -1)) != len(booked):
+        failures.append(f"booked_count {event.get('booked_count')} != {len(booked)} booked")
+    if int(event.get("waitlist_count", -1)) != len(waitlisted):
+        failures.append(
+            f"waitlist_count {event.get('waitlist_count')} != {len(waitlisted)} waiting"
+        )
+    if len(set(booked)) != len(booked) or len(set(waitlisted)) != len(waitlisted):
+        failures.append("duplicate booking or waitlist entry")
+    if set(booked) & set(waitlisted):
+        failures.append("user both booked and waitlisted")
+    if set(booked) | set(waitlisted) != set(expect_booked):
+        failures.append("booked plus waitlisted users do not match the users who asked")
+    if len(booked) != min(args.capacity, len(expect_booked)):
+        failures.append(f"{len(booked)} booked while seats were free")
+
+    return {
+        "capacity": args.capacity,
+        "booked": len(booked),
+        "waitlisted": len(waitlisted),
+        "ok": not failures,
+        "failures": failures
+    }
+
+
+def main():
+    args = parse_args()
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    context = start_backend(args)
+    try:
+        from app import app
+        from storage import get_storage
+        from routes.promotions import drain_promotions
+        from routes import analytics_store
+
+        storage = get_storage()
+        students = seed(storage, args)
+        counter = CallCounter()
+        counter.install(args.backend, storage)
+
+        results = {}
+        invariants = {}
+
+        if "list_events" in scenarios:
+            pages = [
+                (students[i % len(students)], "student", "GET", "/events?limit=50", {})
+                for i in range(args.requests)
+            ]
+            results["list_events"] = run_scenario(app, counter, pages, args.clients)
+
+        if "book_hot_event" in scenarios or "cancel_with_promotion" in scenarios:
+            bookings = [
+                (student_id, "student", "POST", "/book-event", {"json": {"eventId": "hot-event"}})
+                for student_id in students
+            ]
+            results["book_hot_event"] = run_scenario(app, counter, bookings, args.clients)
+            invariants["after_booking"] = check_hot_event(storage, args, students, students)
+
+        if "cancel_with_promotion" in scenarios:
+            # Half the booked users cancel; each cancel queues a promotion
+            # which the worker applies once the cancels are in
+            cancelling = storage.bookings.booked_user_ids("hot-event")[::2]
+            cancels = [
+                (student_id, "student", "POST", "/cancel-booking", {"json": {"eventId": "hot-event"}})
+                for student_id in cancelling
+            ]
+            results["cancel_with_promotion"] = run_scenario(app, counter, cancels, args.clients)
+
+            counter.reset()
+            started = time.perf_counter()
+            promoted = drain_promotions()
+            analytics_store.flush()
+            results["cancel_with_promotion"]["promotion"] = {
+                "jobs_finished": promoted,
+                "seconds": round(time.perf_counter() - started, 4),
+                "db_calls": counter.reset()
+            }
+            remaining = [s for s in students if s not in cancelling]
+            invariants["after_promotion"] = check_hot_event(storage, args, students, remaining)
+
+        if "login" in scenarios:
+            logins = [
+                (None, None, "POST", "/login", {"data": {
+                    "email": f"{students[i % len(students)]}@benchmark.ac.uk",
+                    "password": PASSWORD
+                }})
+                for i in range(args.logins)
+            ]
+            results["login"] = run_scenario(app, counter, logins, args.clients)
+
+        if "analytics" in scenarios:
+            paths = ["/api/analytics", "/api/analytics/weekly", "/api/analytics/daily", "/api/analytics/summary"]
+            reads = [
+                ("staff", "staff", "GET", paths[i % len(paths)], {})
+                for i in range(args.requests)
+            ]
+            results["analytics"] = run_scenario(app, counter, reads, args.clients)
+    finally:
+        # Let queued counter updates finish while the backend still exists
+        if "routes.analytics_store" in sys.modules:
+            sys.modules["routes.analytics_store"].flush()
+
+        if args.backend == "moto":
+            context.stop()
+        elif context:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(context + suffix):
+                    os.remove(context + suffix)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args)
+        },
+        "scenarios": results,
+        "invariants": invariants
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    # A broken invariant fails the run so it can gate CI
+    if not all(check["ok"] for check in invariants.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,87 @@
 import os
-import boto3
+import threading
+import startup
 
 # Global config setup
 region = os.getenv("AWS_REGION", "eu-west-2")
 users_table_name = os.getenv("USERS_TABLE", "users")
 events_table_name = os.getenv("EVENTS_TABLE", "events")
+user_emails_table_name = os.getenv("USER_EMAILS_TABLE", "user_emails")
+analytics_table_name = os.getenv("ANALYTICS_TABLE", "analytics")
+promotion_jobs_table_name = os.getenv("PROMOTION_JOBS_TABLE", "promotion_jobs")
+bookings_table_name = os.getenv("BOOKINGS_TABLE", "bookings")
+
+# Client tuning: enough pooled connections for every request thread, kept
+# alive between requests, short timeouts and botocore's standard retries
+# (exponential backoff with jitter, also on throttling)
+MAX_POOL_CONNECTIONS = int(os.getenv("DYNAMODB_MAX_POOL_CONNECTIONS", 50))
+CONNECT_TIMEOUT = float(os.getenv("DYNAMODB_CONNECT_TIMEOUT", 2))
+READ_TIMEOUT = float(os.getenv("DYNAMODB_READ_TIMEOUT", 5))
+RETRY_MODE = os.getenv("DYNAMODB_RETRY_MODE", "standard")
+MAX_ATTEMPTS = int(os.getenv("DYNAMODB_MAX_ATTEMPTS", 5))
+
+# The resource is created on first use in each process, never at import.
+# A process forked after that (gunicorn --preload) sees a different pid
+# and builds its own, so connection pools are never shared across workers.
+_lock = threading.Lock()
+_pid = None
+_resource = None
+_tables = {}
+_client_hooks = []
+
+
+def client_config():
+    from botocore.config import Config
+
+    return Config(
+        region_name=region,
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries={"mode": RETRY_MODE, "max_attempts": MAX_ATTEMPTS}
+    )
 
-# Creates the resource
-dynamodb = boto3.resource("dynamodb", region_name=region)
 
 def get_db():
-    """Returns the base DynamoDB resource"""
-    return dynamodb
+    """Returns this process's DynamoDB resource, creating it on first use"""
+    global _pid, _resource, _tables
+
+    if _pid == os.getpid():
+        return _resource
+
+    with _lock:
+        if _pid != os.getpid():
+            with startup.timed("dynamodb client"):
+                import boto3
+
+                # A session per process: boto3's default session is shared
+                # module state and not safe to carry across a fork
+                session = boto3.session.Session()
+                resource = session.resource("dynamodb", config=client_config())
+                for hook in _client_hooks:
+                    hook(resource.meta.client)
+
+            _tables = {}
+            _resource = resource
+            _pid = os.getpid()
+
+    return _resource
+
+
+def get_table(name):
+    """Returns this process's Table object for a table name"""
+    resource = get_db()
+    table = _tables.get(name)
+    if table is None:
+        table = _tables.setdefault(name, resource.Table(name))
+    return table
+
 
-users_table = dynamodb.Table(users_table_name)
-events_table = dynamodb.Table(events_table_name)
\ No newline at end of file
+def on_client_created(hook):
+    """Runs hook(client) on the DynamoDB client of every process, e.g. to
+    register botocore event handlers"""
+    with _lock:
+        _client_hooks.append(hook)
+        if _pid == os.getpid():
+            hook(_resource.meta.client)
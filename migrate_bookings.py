@@ -0,0 +1,122 @@
+from db import (
+    bookings_table_name, events_table_name, get_db, get_table, users_table_name
+)
+from storage.base import BOOKED_PREFIX, waitlist_key
+from storage.dynamodb import scan_all
+
+# DynamoDB-only migration from the booking lists kept on each event
+# (booked_users, waitlist_users) and user (booked_events) to one item per
+# booking in the bookings table. Run it once while the app is stopped,
+# before starting the version that reads the bookings table. Re-runs are
+# harmless: migrated events no longer have lists, and an interrupted event
+# writes the same items again.
+
+
+def booking_items(event):
+    # Booking items for an event's lists, keeping both lists' order. Booked
+    # users sort by the event's creation time and their list position, since
+    # the lists never recorded when each booking was made.
+    booked = []
+    for position, user_id in enumerate(dict.fromkeys(event.get("booked_users", []))):
+        booked.append({
+            "event_id": event["id"],
+            "user_id": user_id,
+            "status_key": f"{BOOKED_PREFIX}{event.get('created_at', '')}#{position:06d}"
+        })
+
+    booked_ids = {item["user_id"] for item in booked}
+    waiting = [
+        user_id for user_id in dict.fromkeys(event.get("waitlist_users", []))
+        if user_id not in booked_ids
+    ]
+    waitlisted = [
+        {
+            "event_id": event["id"],
+            "user_id": user_id,
+            "status_key": waitlist_key(position)
+        }
+        for position, user_id in enumerate(waiting, start=1)
+    ]
+    return booked, waitlisted
+
+
+def migrate_event(events_table, bookings_table, event):
+    booked, waitlisted = booking_items(event)
+
+    with bookings_table.batch_writer(overwrite_by_pkeys=["event_id", "user_id"]) as batch:
+        for item in booked + waitlisted:
+            batch.put_item(Item=item)
+
+    # Counters replace the lists, but only if the lists are still the ones
+    # the items were written from
+    conditions = []
+    values = {
+        ":b": len(booked),
+        ":w": len(waitlisted),
+        ":s": len(waitlisted)
+    }
+    for name, placeholder in (("booked_users", ":old_b"), ("waitlist_users", ":old_w")):
+        if name in event:
+            conditions.append(f"{name} = {placeholder}")
+            values[placeholder] = event[name]
+        else:
+            conditions.append(f"attribute_not_exists({name})")
+
+    events_table.update_item(
+        Key={"id": event["id"]},
+        UpdateExpression=(
+            "SET booked_count = :b, waitlist_count = :w, waitlist_seq = :s "
+            "REMOVE booked_users, waitlist_users"
+        ),
+        ConditionExpression=" AND ".join(conditions),
+        ExpressionAttributeValues=values
+    )
+    return len(booked), len(waitlisted)
+
+
+def migrate_bookings():
+    db = get_db()
+    events_table = get_table(events_table_name)
+    users_table = get_table(users_table_name)
+    bookings_table = get_table(bookings_table_name)
+
+    print("Moving event booking lists to the bookings table...")
+
+    migrated = booked = waitlisted = 0
+
+    # Walk every event that still has lists
+    for event in scan_all(
+        events_table,
+        ProjectionExpression="id, created_at, booked_users, waitlist_users",
+        FilterExpression="attribute_exists(booked_users) OR attribute_exists(waitlist_users)"
+    ):
+        try:
+            counts = migrate_event(events_table, bookings_table, event)
+        except db.meta.client.exceptions.ConditionalCheckFailedException:
+            print(f"Skipped {event['id']}: its lists changed, run again")
+            continue
+
+        migrated += 1
+        booked += counts[0]
+        waitlisted += counts[1]
+
+    print(f"Migrated {migrated} events: {booked} bookings, {waitlisted} waitlisted.")
+
+    print("Removing booked_events from users...")
+
+    cleared = 0
+    for user in scan_all(
+        users_table,
+        ProjectionExpression="id",
+        FilterExpression="attribute_exists(booked_events)"
+    ):
+        users_table.update_item(
+            Key={"id": user["id"]},
+            UpdateExpression="REMOVE booked_events"
+        )
+        cleared += 1
+
+    print(f"Cleared {cleared} users.")
+
+if __name__ == "__main__":
+    migrate_bookings()
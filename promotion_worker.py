@@ -0,0 +1,7 @@
+from routes.promotions import run_worker
+
+# Standalone waitlist promotion worker. Run it alongside the web app with
+# PROMOTION_WORKER=off set on the web processes.
+if __name__ == "__main__":
+    print("Promotion worker started.")
+    run_worker()
@@ -0,0 +1,208 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from werkzeug.security import generate_password_hash
+from routes.passwords import PASSWORD_METHOD
+from storage import get_storage
+from storage.directory import ROLES
+from storage.throttle import TokenBucket
+
+# Bulk user provisioning. Creates accounts from a CSV file (with a header
+# row) or a JSON Lines file, one user per row with full_name, email,
+# password and an optional role:
+#
+#   python provision_users.py intake.csv --rate 25 --failures failed.jsonl
+#
+# Rows stream through in chunks: passwords are hashed in a process pool a
+# few chunks ahead of the writes, and users are written in batches at no
+# more than --rate users per second. Rows that cannot be created are
+# reported with their line number and reason, and the run carries on.
+
+# Users hashed and written together
+CHUNK_SIZE = 50
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create UniGather users in bulk")
+    parser.add_argument("path", help="CSV or JSONL file of users")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--role", default="student", choices=ROLES,
+                        help="role of rows without one (default: student)")
+    parser.add_argument("--rate", type=float, default=25,
+                        help="users written per second at most; 0 for no limit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="password hashing processes")
+    parser.add_argument("--failures", help="write failed rows here as JSON Lines")
+    return parser.parse_args()
+
+
+# INPUT
+
+
+def read_rows(path, file_format):
+    # Yields (line number, row dict) without loading the whole file
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else {"_error": "invalid JSON"}
+
+
+def to_user(row, default_role):
+    # Validates a row the way registration does; raises ValueError
+    if "_error" in row:
+        raise ValueError(row["_error"])
+
+    full_name = str(row.get("full_name") or "").strip()
+    email = str(row.get("email") or "").strip().lower()
+    password = str(row.get("password") or "").strip()
+    role = str(row.get("role") or default_role).strip().lower()
+
+    if not full_name or not email or not password:
+        raise ValueError("full_name, email and password are required")
+    if not email.endswith(".ac.uk"):
+        raise ValueError("not an ac.uk email address")
+    if role not in ROLES:
+        raise ValueError(f"unknown role {role}")
+
+    user = {
+        "id": str(uuid.uuid4()),
+        "full_name": full_name,
+        "email": email,
+        "role": role
+    }
+    return user, password
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=PASSWORD_METHOD)
+
+
+# PROVISIONING
+
+
+class Report:
+    # Counts outcomes, prints progress about once a second and records failures
+    def __init__(self, failures_path):
+        self.started = time.perf_counter()
+        self.printed = 0
+        self.created = 0
+        self.failed = 0
+        self.failures = open(failures_path, "w") if failures_path else None
+
+    def fail(self, line_number, email, reason):
+        self.failed += 1
+        record = {"line": line_number, "email": email, "reason": reason}
+        if self.failures:
+            self.failures.write(json.dumps(record) + "\n")
+        else:
+            print(f"Line {line_number} ({email or 'no email'}): {reason}", file=sys.stderr)
+
+    def progress(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        if not final and elapsed - self.printed < 1:
+            return
+        self.printed = elapsed
+        rate = self.created / elapsed if elapsed else 0
+        print(f"Created {self.created}, failed {self.failed} ({rate:.1f} users/s)")
+
+    def close(self):
+        self.progress(final=True)
+        if self.failures:
+            self.failures.close()
+
+
+def valid_users(rows, default_role, report):
+    # Yields (line number, user, password) for rows that can be created,
+    # reporting the rest, including emails repeated within the file
+    seen = set()
+    for line_number, row in rows:
+        try:
+            user, password = to_user(row, default_role)
+        except ValueError as e:
+            report.fail(line_number, (row or {}).get("email"), str(e))
+            continue
+
+        if user["email"] in seen:
+            report.fail(line_number, user["email"], "email repeated in input")
+            continue
+        seen.add(user["email"])
+        yield line_number, user, password
+
+
+def wait_for_rate(bucket, count):
+    while not bucket.try_take(count):
+        time.sleep(0.05)
+
+
+def write_chunk(storage, chunk, hashes, bucket, report):
+    lines = {}
+    users = []
+    for (line_number, user, _), password_hash in zip(chunk, hashes):
+        users.append(dict(user, password=password_hash))
+        lines[user["id"]] = line_number
+
+    if bucket:
+        wait_for_rate(bucket, len(users))
+
+    try:
+        failed = storage.users.create_many(users)
+    except storage.errors as e:
+        failed = [(user, f"storage error: {e}") for user in users]
+
+    for user, reason in failed:
+        report.fail(lines[user["id"]], user["email"], reason)
+    report.created += len(users) - len(failed)
+    report.progress()
+
+
+def provision(args):
+    storage = get_storage()
+    file_format = args.format or ("jsonl" if args.path.endswith((".jsonl", ".json")) else "csv")
+    bucket = TokenBucket(args.rate, max(args.rate, CHUNK_SIZE)) if args.rate > 0 else None
+    report = Report(args.failures)
+
+    users = valid_users(read_rows(args.path, file_format), args.role, report)
+
+    # Keeps a few chunks hashing ahead of the chunk being written
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pending = deque()
+        while True:
+            while len(pending) < args.workers * 2:
+                chunk = list(islice(users, CHUNK_SIZE))
+                if not chunk:
+                    break
+                hashes = [pool.submit(hash_password, password) for _, _, password in chunk]
+                pending.append((chunk, hashes))
+
+            if not pending:
+                break
+
+            chunk, hashes = pending.popleft()
+            write_chunk(storage, chunk, [h.result() for h in hashes], bucket, report)
+
+    report.close()
+    return report
+
+
+if __name__ == "__main__":
+    result = provision(parse_args())
+    sys.exit(1 if result.failed else 0)
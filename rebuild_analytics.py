@@ -0,0 +1,8 @@
+from routes.analytics_store import rebuild
+
+if __name__ == "__main__":
+    print("Rebuilding analytics from the events table...")
+    scanned, skipped = rebuild()
+    print(f"Analytics rebuilt from {scanned} events.")
+    if skipped:
+        print(f"Skipped {skipped} events with unreadable dates.")
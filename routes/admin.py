@@ -1,19 +1,41 @@
-from flask import Blueprint, request, jsonify, render_template
-from db import get_db
-from routes.permissions import has_permission
+from flask import Blueprint, request, jsonify, render_template, send_file
+from storage import InvalidCursor, get_storage, low_priority
+from storage.directory import ROLES, SEARCH_KEYS, normalise
+from routes.permissions import current_user_id, has_permission
+from routes.cache import TTLCache
+from routes.pagination import (
+    PaginationError, decode_cursor, encode_cursor, parse_limit
+)
+from routes.packs import PACK_FORMATS, read_status, result_path, start_pack
 
 admin = Blueprint("admin", __name__)
 
-db = get_db()
-users_table = db.Table("users")
-events_table = db.Table("events")
+storage = get_storage()
+
+# Display names of recently resolved users, kept per worker process
+display_name_cache = TTLCache(maxsize=10000, ttl=300)
+
+
+def resolve_display_names(user_ids):
+    # Maps user IDs to display names, reading only cache misses from storage
+    names = display_name_cache.get_many(user_ids)
+    missing = [uid for uid in user_ids if uid not in names]
+
+    if missing:
+        items = storage.users.get_many(missing, ["id", "full_name", "username"])
+        for item in items:
+            name = item.get("full_name", item.get("username", "Unknown"))
+            display_name_cache.set(item["id"], name)
+            names[item["id"]] = name
+
+    return names
 
 
 # ADMIN PAGE
 @admin.route("/admin")
 def admin_page():
     # Renders the admin dashboard page (admin-only access)
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Ensure the user has admin permissions
     if not has_permission(user_id, ["admin"]):
@@ -25,15 +47,39 @@ def admin_page():
 # ADMIN APIs
 @admin.get("/api/users")
 def get_all_users():
-    # Returns a list of all users (admin-only API)
-    user_id = request.cookies.get("user_id")
+    # Returns one page of the user directory (admin-only API). `q` matches
+    # the start of the name, or of the email when it contains "@" or
+    # field=email; `role` limits the page to one role.
+    user_id = current_user_id()
 
     # Check admin permission
     if not has_permission(user_id, ["admin"]):
         return "Unauthorised: only admins allowed.", 403
 
-    # Fetch all users from DynamoDB
-    items = users_table.scan().get("Items", [])
+    query = normalise(request.args.get("q", ""))
+    field = request.args.get("field") or ("email" if "@" in query else "name")
+    role = request.args.get("role")
+
+    if field not in SEARCH_KEYS:
+        return "Unknown search field", 400
+    if role and role not in ROLES:
+        return "Unknown role", 400
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor = decode_cursor(request.args.get("cursor"))
+    except PaginationError as e:
+        return str(e), 400
+
+    # Reads only the matching slice of the directory index, and gives way
+    # to bookings when capacity is short
+    try:
+        with low_priority():
+            items, next_cursor = storage.users.search(
+                field, query, [role] if role else list(ROLES), limit, cursor
+            )
+    except InvalidCursor as e:
+        return str(e), 400
 
     # Format user data for frontend consumption
     users_list = [
@@ -46,13 +92,16 @@ def get_all_users():
         for u in items
     ]
 
-    return jsonify(users_list), 200
+    return jsonify({
+        "items": users_list,
+        "next_cursor": encode_cursor(next_cursor)
+    }), 200
 
 
 @admin.post("/update-role")
 def update_role():
     # Updates a user's role (admin-only action)
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Verify admin permissions
     if not has_permission(user_id, ["admin"]):
@@ -62,22 +111,60 @@ def update_role():
     data = request.get_json()
 
     try:
-        # Update the user's role in DynamoDB
-        users_table.update_item(
-            Key={"id": data.get("userId")},
-            UpdateExpression="SET #r = :s",
-            ExpressionAttributeNames={"#r": "role"},
-            ExpressionAttributeValues={":s": data.get("newRole")}
-        )
+        # Update the user's role and bump their session version so tokens
+        # carrying the old role stop being accepted
+        if not storage.users.update_role(data.get("userId"), data.get("newRole")):
+            return "User not found", 404
         return "Role updated", 200
     except Exception:
         return "Failed", 500
 
 
+# Users one bulk role change may touch
+MAX_BULK_ROLE_USERS = 1000
+
+
+@admin.post("/update-roles")
+def update_roles():
+    # Changes the role of many users at once (admin-only action). With
+    # currentRole, only users who still have that role are changed.
+    user_id = current_user_id()
+
+    # Verify admin permissions
+    if not has_permission(user_id, ["admin"]):
+        return "Unauthorised: only admins allowed.", 403
+
+    data = request.get_json()
+    user_ids = data.get("userIds") or []
+    new_role = data.get("newRole")
+    current_role = data.get("currentRole")
+
+    if not isinstance(user_ids, list) or not all(isinstance(u, str) for u in user_ids):
+        return "userIds must be a list of user IDs", 400
+    if len(user_ids) > MAX_BULK_ROLE_USERS:
+        return f"At most {MAX_BULK_ROLE_USERS} users per request", 400
+    if new_role not in ROLES or (current_role and current_role not in ROLES):
+        return "Unknown role", 400
+
+    # Admins cannot demote themselves by accident in a bulk change
+    user_ids = [u for u in dict.fromkeys(user_ids) if u != user_id]
+
+    try:
+        skipped = storage.users.update_roles(user_ids, new_role, current_role)
+    except storage.errors as e:
+        print(f"Bulk role update error: {e}")
+        return "Failed", 500
+
+    return jsonify({
+        "updated": len(user_ids) - len(skipped),
+        "skipped": skipped
+    }), 200
+
+
 @admin.post("/view-attendees")
 def view_attendees():
     # Returns the list of attendee names for a specific event
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Allow only staff or admin users
     if not has_permission(user_id, ["staff", "admin"]):
@@ -87,23 +174,103 @@ def view_attendees():
     data = request.get_json()
     event_id = data.get("eventId")
 
-    # Fetch the event from DynamoDB
-    event = events_table.get_item(Key={"id": event_id}).get("Item")
+    # Fetch the event
+    event = storage.events.get(event_id, ["id"], cached=True)
     if not event:
         return "Event not found", 404
 
     # Get booked user IDs
-    booked_ids = event.get("booked_users", [])
-    if not booked_ids:
-        return "No attendees yet.", 200
-
-    # Resolve user IDs to display names
-    attendee_names = []
-    for uid in booked_ids:
-        u_item = users_table.get_item(Key={"id": uid}).get("Item")
-        if u_item:
-            attendee_names.append(
-                u_item.get("full_name", u_item.get("username", "Unknown"))
-            )
+    booked_ids = storage.bookings.booked_user_ids(event_id)
+
+    # Resolve user IDs to display names, keeping booking order and
+    # skipping users that no longer exist
+    names = resolve_display_names(booked_ids) if booked_ids else {}
+    attendees = [
+        {"id": uid, "name": names[uid]}
+        for uid in booked_ids
+        if uid in names
+    ]
+
+    return jsonify({
+        "event_id": event_id,
+        "count": len(attendees),
+        "attendees": attendees
+    }), 200
+
+
+
+# ATTENDEE PACKS
+
+
+@admin.post("/attendee-packs")
+def create_attendee_pack():
+    # Starts building a printable pack for an event: every booking
+    # confirmation in a ZIP ("zip") or one attendee sheet PDF ("sheet")
+    user_id = current_user_id()
+
+    # Allow only staff or admin users
+    if not has_permission(user_id, ["staff", "admin"]):
+        return "Unauthorised: only staff and admins can print attendee packs.", 403
+
+    data = request.get_json()
+    event_id = data.get("eventId")
+    pack_format = data.get("format", "zip")
+
+    if pack_format not in PACK_FORMATS:
+        return "Unknown pack format", 400
+
+    event = storage.events.get(event_id, [
+        "id", "event_name", "event_date", "event_time", "event_loc"
+    ])
+    if not event:
+        return "Event not found", 404
+
+    # Resolve every attendee in batches before handing off to the workers
+    booked_ids = storage.bookings.booked_user_ids(event_id)
+    names = resolve_display_names(booked_ids) if booked_ids else {}
+    attendees = [
+        {"id": uid, "full_name": names[uid]}
+        for uid in booked_ids
+        if uid in names
+    ]
+
+    job_id = start_pack(pack_format, event, attendees)
+    return jsonify({"job_id": job_id, "total": len(attendees)}), 202
+
+
+@admin.get("/attendee-packs/<job_id>")
+def attendee_pack_status(job_id):
+    # Reports progress of a pack build
+    user_id = current_user_id()
+
+    if not has_permission(user_id, ["staff", "admin"]):
+        return "Unauthorised: only staff and admins can print attendee packs.", 403
+
+    status = read_status(job_id)
+    if not status:
+        return "Pack not found", 404
+
+    return jsonify(status), 200
+
+
+@admin.get("/attendee-packs/<job_id>/download")
+def download_attendee_pack(job_id):
+    # Streams a finished pack from disk
+    user_id = current_user_id()
+
+    if not has_permission(user_id, ["staff", "admin"]):
+        return "Unauthorised: only staff and admins can print attendee packs.", 403
+
+    status = read_status(job_id)
+    if not status:
+        return "Pack not found", 404
+    if status["state"] != "done":
+        return "Pack is not ready yet", 409
 
-    return f"Attendees: {', '.join(attendee_names)}", 200
+    mimetype, extension = PACK_FORMATS[status["format"]]
+    return send_file(
+        result_path(job_id, status["format"]),
+        as_attachment=True,
+        download_name=f"attendees_{status['event_id']}.{extension}",
+        mimetype=mimetype
+    )
@@ -1,13 +1,78 @@
-from flask import Blueprint, request, jsonify, render_template
-from collections import defaultdict
-from dateutil import parser
-from db import get_db
-from routes.permissions import has_permission
+import os
+from flask import Blueprint, jsonify, render_template
+from routes.permissions import current_user_id, has_permission
+from routes.analytics_store import GLOBAL, ORDERED_DAYS, read_all_counters
+from routes.cache import TTLCache
+from storage import low_priority
 
 analytics = Blueprint("analytics", __name__)
 
-db = get_db()
-events_table = db.Table("events")
+# The whole dashboard is cached per worker for a few seconds; concurrent
+# misses share a single read of the analytics table
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", 30))
+dashboard_cache = TTLCache(maxsize=1, ttl=ANALYTICS_CACHE_TTL)
+
+
+def weekly_view(weeks):
+    # Weekly event and attendee counts, in chronological order
+    weeks_sorted = [w for w in sorted(weeks) if weeks[w].get("events", 0) > 0]
+
+    return {
+        "weeks": weeks_sorted,
+        "events": [int(weeks[w].get("events", 0)) for w in weeks_sorted],
+        "attendees": [int(weeks[w].get("attendees", 0)) for w in weeks_sorted]
+    }
+
+
+def daily_view(days):
+    # Event and attendee counts per day of the week, Monday first
+    return {
+        "days": ORDERED_DAYS,
+        "events": [int(days.get(d, {}).get("events", 0)) for d in ORDERED_DAYS],
+        "attendees": [int(days.get(d, {}).get("attendees", 0)) for d in ORDERED_DAYS]
+    }
+
+
+def summary_view(totals):
+    # Overall booking and capacity statistics
+    total_capacity = int(totals.get("capacity", 0))
+    total_booked = int(totals.get("booked", 0))
+    total_waitlisted = int(totals.get("waitlisted", 0))
+
+    # Calculate average fill rate percentage
+    avg_fill_rate = (
+        round((total_booked / total_capacity) * 100, 2)
+        if total_capacity > 0 else 0
+    )
+
+    # Derive cancellation count
+    cancellations = total_capacity - total_booked - total_waitlisted
+    if cancellations < 0:
+        cancellations = 0
+
+    return {
+        "average_fill_rate": avg_fill_rate,
+        "booked": total_booked,
+        "waitlisted": total_waitlisted,
+        "cancellations": cancellations
+    }
+
+
+def compute_dashboard():
+    # Builds every analytics view from one read of the counters
+    with low_priority():
+        counters = read_all_counters()
+    kind, bucket = GLOBAL
+
+    return {
+        "summary": summary_view(counters.get(kind, {}).get(bucket, {})),
+        "weekly": weekly_view(counters.get("week", {})),
+        "daily": daily_view(counters.get("weekday", {}))
+    }
+
+
+def load_dashboard():
+    return dashboard_cache.get_or_set("dashboard", compute_dashboard)
 
 
 # ANALYTICS PAGE
@@ -16,7 +81,7 @@ events_table = db.Table("events")
 @analytics.route("/analytics")
 def analytics_page():
     # Renders the analytics dashboard page (staff/admin access)
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Check staff or admin permissions
     if not has_permission(user_id, ["staff", "admin"]):
@@ -29,130 +94,52 @@ def analytics_page():
 # ANALYTICS APIs
 
 
-@analytics.get("/api/analytics/weekly")
-def analytics_weekly():
-    # Returns weekly event and attendee statistics
-    user_id = request.cookies.get("user_id")
+@analytics.get("/api/analytics")
+def analytics_all():
+    # Returns the summary, weekly and daily statistics in one response
+    user_id = current_user_id()
 
     # Restrict access to staff and admins
     if not has_permission(user_id, ["staff", "admin"]):
         return "Unauthorised: only staff and admins allowed.", 403
 
-    # Fetch all events
-    events = events_table.scan().get("Items", [])
+    return jsonify(load_dashboard()), 200
 
-    weekly_events = defaultdict(int)
-    weekly_attendees = defaultdict(int)
 
-    # Group events by ISO calendar week
-    for event in events:
-        created_at = event.get("created_at")
-        if not created_at:
-            continue
 
-        dt = parser.parse(created_at)
-        year, week, _ = dt.isocalendar()
-        week_key = f"{year}-W{week:02d}"
-
-        weekly_events[week_key] += 1
-        weekly_attendees[week_key] += len(event.get("booked_users", []))
+@analytics.get("/api/analytics/weekly")
+def analytics_weekly():
+    # Returns weekly event and attendee statistics
+    user_id = current_user_id()
 
-    # Sort weeks chronologically
-    weeks_sorted = sorted(weekly_events.keys())
+    # Restrict access to staff and admins
+    if not has_permission(user_id, ["staff", "admin"]):
+        return "Unauthorised: only staff and admins allowed.", 403
 
-    return jsonify({
-        "weeks": weeks_sorted,
-        "events": [weekly_events[w] for w in weeks_sorted],
-        "attendees": [weekly_attendees[w] for w in weeks_sorted]
-    }), 200
+    return jsonify(load_dashboard()["weekly"]), 200
 
 
 
 @analytics.get("/api/analytics/daily")
 def analytics_daily():
     # Returns daily event and attendee statistics
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Restrict access to staff and admins
     if not has_permission(user_id, ["staff", "admin"]):
         return "Unauthorised: only staff and admins allowed.", 403
 
-    # Fetch all events
-    events = events_table.scan().get("Items", [])
-
-    daily_events = defaultdict(int)
-    daily_attendees = defaultdict(int)
-
-    # Group events by day of the week
-    for event in events:
-        event_date = event.get("event_date")
-        if not event_date:
-                continue
-
-        dt = parser.parse(event_date)
-        day = dt.strftime("%A")
-
-
-        daily_events[day] += 1
-        daily_attendees[day] += len(event.get("booked_users", []))
-
-    # Ensure consistent day ordering
-    ordered_days = [
-        "Monday", "Tuesday", "Wednesday",
-        "Thursday", "Friday", "Saturday", "Sunday"
-    ]
-
-    return jsonify({
-        "days": ordered_days,
-        "events": [daily_events[d] for d in ordered_days],
-        "attendees": [daily_attendees[d] for d in ordered_days]
-    }), 200
+    return jsonify(load_dashboard()["daily"]), 200
 
 
 
 @analytics.get("/api/analytics/summary")
 def analytics_summary():
     # Returns overall booking and capacity statistics
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Restrict access to staff and admins
     if not has_permission(user_id, ["staff", "admin"]):
         return "Unauthorised: only staff and admins allowed.", 403
 
-    # Fetch all events
-    events = events_table.scan().get("Items", [])
-
-    total_capacity = 0
-    total_booked = 0
-    total_waitlisted = 0
-    total_events = 0
-
-    # Aggregate capacity and booking data
-    for event in events:
-        cap = int(event.get("event_cap", 0))
-        booked = len(event.get("booked_users", []))
-        waitlisted = len(event.get("waitlist_users", []))
-
-        total_capacity += cap
-        total_booked += booked
-        total_waitlisted += waitlisted
-        total_events += 1
-
-    # Calculate average fill rate percentage
-    avg_fill_rate = (
-        round((total_booked / total_capacity) * 100, 2)
-        if total_capacity > 0 else 0
-    )
-
-    # Derive cancellation count
-    cancellations = total_capacity - total_booked - total_waitlisted
-    if cancellations < 0:
-        cancellations = 0
-
-    return jsonify({
-        "average_fill_rate": avg_fill_rate,
-        "booked": total_booked,
-        "waitlisted": total_waitlisted,
-        "cancellations": cancellations
-    }), 200
-
+    return jsonify(load_dashboard()["summary"]), 200
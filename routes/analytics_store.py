@@ -0,0 +1,191 @@
+import os
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from routes.timekeys import time_keys
+from storage import get_storage, low_priority
+
+storage = get_storage()
+
+# Counter updates queued in one process before new ones are dropped
+ANALYTICS_QUEUE = int(os.getenv("ANALYTICS_QUEUE", 1000))
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+_queued = 0
+
+# Counter items are keyed by kind plus a bucket within that kind:
+#   ("global", "all")         events, capacity, booked, waitlisted
+#   ("week", "2025-W07")      events, attendees (grouped by created_at)
+#   ("weekday", "Monday")     events, attendees (grouped by event_date)
+GLOBAL = ("global", "all")
+
+ORDERED_DAYS = [
+    "Monday", "Tuesday", "Wednesday",
+    "Thursday", "Friday", "Saturday", "Sunday"
+]
+
+
+def stored_or_computed(event, field):
+    # Reads a normalised time field, computing it for events not yet backfilled
+    if field in event:
+        return event[field]
+    return time_keys(event).get(field)
+
+
+def week_bucket(event):
+    # ISO week an event was created in, e.g. "2025-W07"
+    week = stored_or_computed(event, "created_week")
+    return ("week", week) if week else None
+
+
+def weekday_bucket(event):
+    # Day of the week an event takes place on, e.g. "Monday"
+    weekday = stored_or_computed(event, "event_weekday")
+    return ("weekday", ORDERED_DAYS[int(weekday)]) if weekday is not None else None
+
+
+def event_deltas(event, events=0, capacity=0, booked=0, waitlisted=0):
+    # Spreads one event's counter changes over the items they belong to
+    deltas = {
+        GLOBAL: {
+            "events": events,
+            "capacity": capacity,
+            "booked": booked,
+            "waitlisted": waitlisted
+        }
+    }
+    for bucket in (week_bucket(event), weekday_bucket(event)):
+        if bucket:
+            deltas[bucket] = {"events": events, "attendees": booked}
+    return deltas
+
+
+def apply_deltas(deltas):
+    # Adds each non-zero counter change atomically
+    for (kind, bucket), counters in deltas.items():
+        counters = {name: value for name, value in counters.items() if value}
+        if not counters:
+            continue
+
+        storage.analytics.add(kind, bucket, counters)
+
+
+def get_writer():
+    # One background thread per process applies counter updates. A process
+    # forked after it was created (gunicorn --preload) starts its own.
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer_pid != os.getpid():
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analytics")
+            _writer_pid = os.getpid()
+        return _writer
+
+
+def write_deltas(deltas):
+    global _queued
+    try:
+        with low_priority():
+            apply_deltas(deltas)
+    except Exception as e:
+        print(f"Analytics update error: {e}", file=sys.stderr)
+    finally:
+        with _writer_lock:
+            _queued -= 1
+
+
+def record(event, **changes):
+    # Queues the aggregate updates for a write to `event`, e.g.
+    # record(event, booked=1) or record(event, booked=-1, waitlisted=-1).
+    # They are applied in the background as low-priority work, so bookings
+    # never wait on analytics capacity. Analytics are best effort: updates
+    # that fail, are shed or overflow the queue are logged and dropped, and
+    # rebuild() corrects any drift.
+    global _queued
+    try:
+        deltas = event_deltas(event, **changes)
+    except ValueError as e:
+        print(f"Analytics update error: {e}", file=sys.stderr)
+        return
+
+    writer = get_writer()
+    with _writer_lock:
+        if _queued >= ANALYTICS_QUEUE:
+            print("Analytics update dropped: queue full", file=sys.stderr)
+            return
+        _queued += 1
+    writer.submit(write_deltas, deltas)
+
+
+def flush():
+    # Waits until every update queued so far has been applied
+    get_writer().submit(lambda: None).result()
+
+
+def event_contribution(event):
+    # Every counter an existing event contributes to the aggregates
+    return {
+        "events": 1,
+        "capacity": int(event.get("event_cap", 0)),
+        "booked": int(event.get("booked_count", 0)),
+        "waitlisted": int(event.get("waitlist_count", 0))
+    }
+
+
+# READS
+
+
+def read_all_counters():
+    # Reads every counter item of the (small) analytics table and groups
+    # them as {kind: {bucket: counters}}
+    counters = defaultdict(dict)
+    for item in storage.analytics.read_all():
+        counters[item["kind"]][item["bucket"]] = item
+    return counters
+
+
+# REBUILD
+
+
+def rebuild():
+    # Recomputes every aggregate from a full scan of the events table and
+    # replaces the stored counters. Writes made while this runs may be lost,
+    # so run it when traffic is quiet. Events whose dates cannot be parsed
+    # are skipped and logged rather than aborting the rebuild.
+    # Returns (scanned, skipped).
+    # Updates still queued would otherwise land on top of the new totals
+    flush()
+
+    totals = defaultdict(lambda: defaultdict(int))
+    scanned = 0
+    skipped = 0
+
+    def add(event):
+        nonlocal scanned, skipped
+        try:
+            deltas = event_deltas(event, **event_contribution(event))
+        except ValueError as e:
+            print(f"Skipped {event.get('id')}: {e}")
+            skipped += 1
+            return
+
+        for key, counters in deltas.items():
+            for name, value in counters.items():
+                totals[key][name] += value
+        scanned += 1
+
+    with low_priority():
+        storage.events.scan_each(add, [
+            "id", "created_at", "event_date", "event_time", "created_week",
+            "event_weekday", "event_cap", "booked_count", "waitlist_count"
+        ])
+
+    # Buckets with no events left disappear with the old counters
+    storage.analytics.replace_all([
+        {"kind": kind, "bucket": bucket, **counters}
+        for (kind, bucket), counters in totals.items()
+    ])
+
+    return scanned, skipped
@@ -1,12 +1,38 @@
+import logging
 import uuid
-from flask import Blueprint, request, redirect, make_response, render_template
-from boto3.dynamodb.conditions import Attr
-from werkzeug.security import generate_password_hash, check_password_hash
-from db import get_db
+from concurrent.futures.process import BrokenProcessPool
+from flask import Blueprint, g, request, redirect, make_response, render_template
+from storage import EmailTaken, get_storage
+from routes.passwords import PasswordBusy, hash_password, needs_rehash, verify_password
+from routes.permissions import SESSION_COOKIE, SESSION_MAX_AGE, issue_session
 
 auth = Blueprint("auth", __name__)
-db = get_db()
-users_table = db.Table("users")
+storage = get_storage()
+logger = logging.getLogger(__name__)
+
+
+# SESSION
+
+
+def set_session_cookie(response, token):
+    response.set_cookie(
+        SESSION_COOKIE,
+        token,
+        max_age=SESSION_MAX_AGE,
+        httponly=True,
+        samesite="Lax",
+        secure=request.is_secure
+    )
+
+
+@auth.after_app_request
+def refresh_session_cookie(response):
+    # Sends back a reissued token when the session was revalidated this request
+    token = g.get("refreshed_session")
+    if token:
+        set_session_cookie(response, token)
+    return response
+
 
 
 # LOGIN
@@ -18,28 +44,35 @@ def login():
     email = request.form.get("email", "").strip().lower()
     password = request.form.get("password", "").strip()
 
-    # Finds the user in DynamoDB via their provided email
-    response = users_table.scan(
-        FilterExpression=Attr("email").eq(email)
-    )
-    items = response.get("Items", [])
+    # Finds the user via their provided email
+    user = storage.users.find_by_email(email)
 
     # Error if an invalid email is provided
-    if not items:
+    if not user:
         return "Invalid email or password", 401
 
-    user = items[0]
     stored_hashed_password = user.get("password")
 
     # Hashes the provided password and checks against the stored hashed password
-    if not check_password_hash(stored_hashed_password, password):
+    if not verify_password(stored_hashed_password, password):
         return "Invalid email or password", 401
 
+    # Upgrades a hash made with an older work factor while the plain text
+    # password is at hand. Failing to do so never fails the login.
+    if needs_rehash(stored_hashed_password):
+        try:
+            storage.users.update_password(
+                user["id"], hash_password(password), stored_hashed_password
+            )
+        except Exception:
+            logger.exception("Password rehash failed for user %s", user["id"])
+
     # If not returned by now, previous checks must have been successes
     display_name = user.get("full_name", user.get("username", "User"))
 
     response = make_response(redirect("/events-page"))
-    response.set_cookie("user_id", user["id"])
+    # The signed session is the only cookie trusted for identity and role
+    set_session_cookie(response, issue_session(user))
     response.set_cookie("role", user["role"])
     response.set_cookie("username", display_name)
 
@@ -52,6 +85,7 @@ def login():
 @auth.route("/logout")
 def logout():
     response = make_response(redirect("/"))
+    response.set_cookie(SESSION_COOKIE, "", expires=0)
     response.set_cookie("user_id", "", expires=0)
     response.set_cookie("role", "", expires=0)
     response.set_cookie("username", "", expires=0)
@@ -80,33 +114,32 @@ def register():
             error="Registration is restricted to ac.uk email addresses."
         ), 400
 
-    # Checks if the email is already in use
-    existing_user = users_table.scan(
-        FilterExpression=Attr("email").eq(email)
-    )
-    if existing_user.get("Items"):
+    # Checks if the email is already in use (accounts created before email
+    # claims existed are only visible through the index)
+    if storage.users.find_by_email(email):
         return "An account with this email already exists", 400
 
-    # Hashes the password (do not store plain text passwords)
-    hashed_password = generate_password_hash(
-        password,
-        method="pbkdf2:sha256"
-    )
-
-    # Prepares the new user's entry
-    new_user = {
-        "id": str(uuid.uuid4()),
-        "full_name": full_name,
-        "email": email,
-        "password": hashed_password,
-        "role": "student",
-        "booked_events": []
-    }
-
-    # Saves to database
     try:
-        users_table.put_item(Item=new_user)
+        # Hashes the password (do not store plain text passwords)
+        hashed_password = hash_password(password)
+
+        # Prepares the new user's entry
+        new_user = {
+            "id": str(uuid.uuid4()),
+            "full_name": full_name,
+            "email": email,
+            "password": hashed_password,
+            "role": "student"
+        }
+
+        # Saves to database, rejecting the email if another registration won the race
+        storage.users.create(new_user)
         return redirect("/login")
+    except EmailTaken:
+        return "An account with this email already exists", 400
+    except (PasswordBusy, BrokenProcessPool):
+        # Answered with the same 503 as a busy login (see app.py)
+        raise
     except Exception as e:
         print(f"Registration Error: {e}")
         return "Failed to create account. Please try again later.", 500
@@ -1,50 +1,108 @@
+import os
+import time
 import uuid
 from datetime import datetime
-from flask import Blueprint, request, jsonify, send_file
-from db import get_db
-from routes.permissions import has_permission
-from routes.pdf import generate_booking_pdf
+from io import BytesIO
+from flask import Blueprint, request, jsonify, make_response, send_file
+from storage import InvalidCursor, get_storage
+from storage.base import (
+    ALREADY_BOOKED, ALREADY_JOINED, ALREADY_WAITLISTED, BOOKED, CANCELLED,
+    CONFLICT, EVENT_NOT_FOUND, USER_NOT_FOUND, WAITLISTED
+)
+from routes.permissions import current_user_id, has_permission
+from routes.pdf import booking_details, booking_digest, cached_booking_pdf
+from routes import analytics_store
+from routes.timekeys import starts_at_of, time_keys
+from routes.cache import Generation, TTLCache
+from routes.pagination import (
+    PaginationError, decode_cursor, encode_cursor, parse_limit
+)
 
 events = Blueprint("events", __name__)
 
-db = get_db()
-events_table = db.Table("events")
-users_table = db.Table("users")
+storage = get_storage()
 
 
 # GET ALL EVENTS
 
+# Attributes read for the event list
+LISTING_FIELDS = [
+    "id", "host_name", "host_email", "event_name", "event_loc", "event_date",
+    "event_time", "event_cap", "event_desc", "created_at",
+    "starts_at", "booked_count", "waitlist_count"
+]
+
+
+def to_listing(item, user_bookings):
+    # Adds the start time and the caller's own booking status, taken from
+    # their {event_id: status} bookings, to a stored event
+    listing = dict(item)
+    status = user_bookings.get(item["id"])
+
+    listing["starts_at"] = starts_at_of(item)
+    listing["booked_count"] = int(item.get("booked_count", 0))
+    listing["waitlist_count"] = int(item.get("waitlist_count", 0))
+    listing["is_booked"] = status == BOOKED
+    listing["is_waitlisted"] = status == WAITLISTED
+    return listing
+
+
+def sort_by_start(items):
+    # Sorts events by earliest to furthest but sorts past events to the very bottom
+    now = int(time.time())
+    items.sort(key=lambda e: (e["starts_at"] < now, e["starts_at"]))
+    return items
+
+
+# Event list pages are cached per worker. Every write in this blueprint
+# bumps the generation, which retires the cached pages in this worker at
+# once; the short TTL bounds how stale other workers can be.
+EVENT_LIST_CACHE_TTL = int(os.getenv("EVENT_LIST_CACHE_TTL", 5))
+event_list_cache = TTLCache(maxsize=256, ttl=EVENT_LIST_CACHE_TTL)
+event_list_generation = Generation()
+
+
+def invalidate_event_list():
+    event_list_generation.bump()
+
+
+def read_event_page(limit, cursor):
+    # Reads one page of the event list, or serves it from the cache
+    cache_key = (event_list_generation.value, limit, encode_cursor(cursor))
+
+    def read():
+        return storage.events.list_page(limit, cursor, LISTING_FIELDS)
+
+    return event_list_cache.get_or_set(cache_key, read)
+
+
 @events.get("/events")
 def get_all_events():
-    # Returns all events sorted by creation time
-    response = events_table.scan()
-    items = response.get("Items", [])
-
-    # Ensure DynamoDB sets are converted to lists for frontend compatibility
-    for item in items:
-        if "booked_users" not in item or not isinstance(item["booked_users"], list):
-            item["booked_users"] = (
-                list(item["booked_users"])
-                if isinstance(item.get("booked_users"), set)
-                else []
-            )
-
-        if "waitlist_users" not in item or not isinstance(item["waitlist_users"], list):
-            item["waitlist_users"] = (
-                list(item["waitlist_users"])
-                if isinstance(item.get("waitlist_users"), set)
-                else []
-            )
+    # Returns one page of events: upcoming events earliest first, then past
+    # events. Follow next_cursor for the next page.
+    user_id = current_user_id()
 
-    # Sorts events by earliest to furthest but sorts past events to the very bottom
-    items.sort(
-        key=lambda e: (
-        (f"{e.get('event_date', '')} {e.get('event_time', '')}" < datetime.now().strftime("%Y-%m-%d %H:%M")),
-        f"{e.get('event_date', '')} {e.get('event_time', '')}"
-        )
-    )
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor = decode_cursor(request.args.get("cursor"))
+        page, next_cursor = read_event_page(limit, cursor)
+    except (PaginationError, InvalidCursor) as e:
+        return str(e), 400
 
-    return jsonify(items), 200
+    user_bookings = storage.bookings.user_bookings(user_id) if user_id else {}
+    items = [to_listing(item, user_bookings) for item in page]
+
+    response = jsonify({
+        "items": items,
+        "next_cursor": encode_cursor(next_cursor)
+    })
+
+    # Let browsers revalidate with If-None-Match and get a bodiless 304
+    # when nothing they can see has changed
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 
@@ -54,17 +112,12 @@ def get_all_events():
 @events.get("/events/<event_id>")
 def get_single_event(event_id):
     # Returns details for a single event by ID
-    response = events_table.get_item(Key={"id": event_id})
-    event = response.get("Item")
+    event = storage.events.get(event_id, cached=True)
 
     # Handle missing event
     if not event:
         return "Event not found", 404
 
-    # Convert booked_users to list for JSON safety
-    if "booked_users" in event and not isinstance(event["booked_users"], list):
-        event["booked_users"] = list(event["booked_users"])
-
     return jsonify(event), 200
 
 
@@ -75,41 +128,28 @@ def get_single_event(event_id):
 @events.get("/reminders")
 def get_reminders():
     # Returns upcoming events booked by the logged-in user
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Require user to be logged in
     if not user_id:
         return "Not logged in", 401
 
-    # Fetch user details
-    user_res = users_table.get_item(Key={"id": user_id})
-    user = user_res.get("Item")
-
-    if not user:
-        return "User not found", 404
-
-    booked_event_ids = user.get("booked_events", [])
+    # Fetch the user's bookings with one query
+    user_bookings = storage.bookings.user_bookings(user_id)
+    booked_event_ids = [
+        event_id for event_id, status in user_bookings.items()
+        if status == BOOKED
+    ]
 
     # No bookings found
     if not booked_event_ids:
         return jsonify([]), 200
 
-    reminders = []
-    for event_id in booked_event_ids:
-        event_res = events_table.get_item(Key={"id": event_id})
-        event = event_res.get("Item")
-        if event:
-            # Ensure booked_users is a list for frontend use
-            event["booked_users"] = list(event.get("booked_users", []))
-            reminders.append(event)
+    # Fetch every booked event in batches rather than one read per event
+    found = storage.events.get_many(booked_event_ids, LISTING_FIELDS)
+    reminders = [to_listing(event, user_bookings) for event in found]
 
-    # Sorts events by earliest to furthest but sorts past events to the very bottom
-    reminders.sort(
-        key=lambda e: (
-        (f"{e.get('event_date', '')} {e.get('event_time', '')}" < datetime.now().strftime("%Y-%m-%d %H:%M")),
-        f"{e.get('event_date', '')} {e.get('event_time', '')}"
-        )
-    )
+    sort_by_start(reminders)
 
     return jsonify(reminders), 200
 
@@ -120,37 +160,48 @@ def get_reminders():
 @events.get("/booking-confirmation/<event_id>")
 def download_booking_confirmation(event_id):
     # Generates and downloads a booking confirmation PDF for an event
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Require user to be logged in
     if not user_id:
         return "Not logged in", 401
 
     # Fetch user and event details
-    user_res = users_table.get_item(Key={"id": user_id})
-    event_res = events_table.get_item(Key={"id": event_id})
-
-    user = user_res.get("Item")
-    event = event_res.get("Item")
+    user = storage.users.get(user_id, ["id", "full_name", "username"])
+    event = storage.events.get(event_id, [
+        "id", "event_name", "event_date", "event_time", "event_loc"
+    ])
 
     # Validate booking existence
     if not user or not event:
         return "Invalid booking", 404
 
     # Ensure the user is booked for this event
-    booked_users = event.get("booked_users", [])
-    if user_id not in booked_users:
+    if storage.bookings.status(event_id, user_id) != BOOKED:
         return "You are not booked for this event", 403
 
-    # Generate booking confirmation PDF
-    pdf_buffer = generate_booking_pdf(user, event)
+    # Answer repeat downloads of an unchanged confirmation with a 304
+    # before touching the PDF cache
+    digest = booking_digest(booking_details(user, event))
+    if digest in request.if_none_match:
+        response = make_response("", 304)
+        response.set_etag(digest)
+        return response
+
+    # Serve the booking confirmation PDF, rendering it only on a cache miss
+    pdf_bytes, digest = cached_booking_pdf(user, event)
 
-    return send_file(
-        pdf_buffer,
+    response = send_file(
+        BytesIO(pdf_bytes),
         as_attachment=True,
         download_name=f"booking_{event_id}.pdf",
-        mimetype="application/pdf"
+        mimetype="application/pdf",
+        etag=digest,
+        conditional=True
     )
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
 # CREATE EVENT
@@ -160,7 +211,7 @@ def download_booking_confirmation(event_id):
 #fuction is called when  the form is submitted
 def create_event():
     
-    user_id = request.cookies.get("user_id") 
+    user_id = current_user_id()
 
   
     if not has_permission(user_id, ["staff", "admin"]):
@@ -181,12 +232,16 @@ def create_event():
             "event_cap": int(request.form.get("event_cap", 0)),
             "event_desc": request.form.get("event_desc", "").strip(),
             "created_at": datetime.utcnow().isoformat(),
-            "booked_users": [],
-            "waitlist_users": []
+            "booked_count": 0,
+            "waitlist_count": 0
         }
+        # Store normalised time fields so readers never parse date strings
+        event.update(time_keys(event))
 
-        # Save event to DynamoDB
-        events_table.put_item(Item=event)
+        # Save event to the database
+        storage.events.create(event)
+        invalidate_event_list()
+        analytics_store.record(event, events=1, capacity=event["event_cap"])
         return {"message": "Event created", "event_id": event_id}, 201
 
     except Exception as e:
@@ -196,11 +251,37 @@ def create_event():
 
 # BOOK EVENT
 
+# Fields of an event that never change after creation, cached so a booking
+# can update analytics without reading the event
+EVENT_META_FIELDS = [
+    "id", "created_at", "event_date", "event_time",
+    "created_week", "event_weekday"
+]
+event_meta_cache = TTLCache(maxsize=4096, ttl=3600)
+
+# What the user is told for each booking outcome
+BOOKING_RESPONSES = {
+    BOOKED: ("Event booked successfully", 200),
+    WAITLISTED: ("Event full. You have been added to the waitlist.", 200),
+    ALREADY_BOOKED: ("You already booked this event", 400),
+    ALREADY_WAITLISTED: ("You are already on the waitlist", 400),
+    ALREADY_JOINED: ("You are already booked or on the waitlist", 400),
+    EVENT_NOT_FOUND: ("Event not found", 404),
+    USER_NOT_FOUND: ("User not found", 404)
+}
+
+
+def get_event_meta(event_id):
+    def read():
+        return storage.events.get(event_id, EVENT_META_FIELDS)
+
+    return event_meta_cache.get_or_set(event_id, read)
+
 
 @events.post("/book-event")
 def book_event():
     # Handles event booking and waitlist logic
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Require user to be logged in
     if not user_id:
@@ -214,65 +295,24 @@ def book_event():
     data = request.get_json()
     event_id = data.get("eventId")
 
-    # Fetch event details
-    event = events_table.get_item(Key={"id": event_id}).get("Item")
-    if not event:
-        return "Event not found", 404
-
-    booked_users = event.get("booked_users", [])
-    waitlist_users = event.get("waitlist_users", [])
-    capacity = int(event.get("event_cap", 0))
-
-    # Prevent duplicate bookings
-    if user_id in booked_users:
-        return "You already booked this event", 400
-
-    if user_id in waitlist_users:
-        return "You are already on the waitlist", 400
-
-    # Add to waitlist if event is full
-    if len(booked_users) >= capacity:
-        events_table.update_item(
-            Key={"id": event_id},
-            UpdateExpression=(
-                "SET waitlist_users = "
-                "list_append(if_not_exists(waitlist_users, :e), :u)"
-            ),
-            ExpressionAttributeValues={
-                ":u": [user_id],
-                ":e": []
-            }
-        )
-        return "Event full. You have been added to the waitlist.", 200
-
-    # Add event to user's bookings
-    users_table.update_item(
-        Key={"id": user_id},
-        UpdateExpression=(
-            "SET booked_events = "
-            "list_append(if_not_exists(booked_events, :e), :b)"
-        ),
-        ExpressionAttributeValues={
-            ":b": [event_id],
-            ":e": []
-        }
-    )
+    # Books the user, or adds them to the waitlist if the event is full or
+    # freed seats are still owed to users already waiting
+    outcome, event = storage.bookings.book(event_id, user_id)
 
-    # Add user to event's booked list
-    events_table.update_item(
-        Key={"id": event_id},
-        UpdateExpression=(
-            "SET booked_users = "
-            "list_append(if_not_exists(booked_users, :e), :u)"
-        ),
-        ExpressionAttributeValues={
-            ":u": [user_id],
-            ":e": []
-        }
+    if outcome == BOOKED:
+        invalidate_event_list()
+        event = get_event_meta(event_id)
+        if event:
+            analytics_store.record(event, booked=1)
+    elif outcome == WAITLISTED:
+        invalidate_event_list()
+        analytics_store.record(event, waitlisted=1)
+
+    return BOOKING_RESPONSES.get(
+        outcome,
+        ("The event is busy right now. Please try again.", 503)
     )
 
-    return "Event booked successfully", 200
-
 
 
 # CANCEL WAITLIST
@@ -281,7 +321,7 @@ def book_event():
 @events.post("/cancel-waitlist")
 def cancel_waitlist():
     # Removes the logged-in user from an event waitlist
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
     data = request.get_json()
     event_id = data.get("eventId")
 
@@ -289,22 +329,14 @@ def cancel_waitlist():
     if not user_id or not event_id:
         return "Missing data", 400
 
-    # Fetch event details
-    event = events_table.get_item(Key={"id": event_id}).get("Item")
+    # Remove user from waitlist
+    event, removed = storage.bookings.leave_waitlist(event_id, user_id)
     if not event:
         return "Event not found", 404
 
-    # Remove user from waitlist
-    new_waitlist = [
-        u for u in event.get("waitlist_users", [])
-        if u != user_id
-    ]
-
-    events_table.update_item(
-        Key={"id": event_id},
-        UpdateExpression="SET waitlist_users = :w",
-        ExpressionAttributeValues={":w": new_waitlist}
-    )
+    if removed:
+        invalidate_event_list()
+        analytics_store.record(event, waitlisted=-1)
 
     return "You have left the waitlist", 200
 
@@ -315,8 +347,8 @@ def cancel_waitlist():
 
 @events.post("/cancel-booking")
 def cancel_booking():
-    # Cancels a user's booking and handles waitlist promotion
-    user_id = request.cookies.get("user_id")
+    # Cancels a user's booking; waitlist promotion is queued for the worker
+    user_id = current_user_id()
     data = request.get_json()
     event_id = data.get("eventId")
 
@@ -325,71 +357,14 @@ def cancel_booking():
         return "Missing user or event", 400
 
     try:
-        
-        # Remove booking from user
-       
-        user_res = users_table.get_item(Key={"id": user_id})
-        user = user_res.get("Item")
-
-        if user:
-            new_booked = [
-                e for e in user.get("booked_events", [])
-                if e != event_id
-            ]
-            users_table.update_item(
-                Key={"id": user_id},
-                UpdateExpression="SET booked_events = :b",
-                ExpressionAttributeValues={":b": new_booked}
-            )
-
-       
-        # Remove user from event
-        
-        event_res = events_table.get_item(Key={"id": event_id})
-        event = event_res.get("Item")
-
-        if not event:
-            return "Booking cancelled successfully", 200
-
-        new_attendees = [
-            u for u in event.get("booked_users", [])
-            if u != user_id
-        ]
-
-        
-        # Auto-promote from waitlist
-        
-        waitlist_users = event.get("waitlist_users", [])
-        capacity = int(event.get("event_cap", 0))
-
-        if waitlist_users and len(new_attendees) < capacity:
-            next_user_id = waitlist_users.pop(0)
-            new_attendees.append(next_user_id)
-
-            users_table.update_item(
-                Key={"id": next_user_id},
-                UpdateExpression=(
-                    "SET booked_events = "
-                    "list_append(if_not_exists(booked_events, :empty), :e)"
-                ),
-                ExpressionAttributeValues={
-                    ":e": [event_id],
-                    ":empty": []
-                }
-            )
-
-        
-        # Update event record
-        
-        events_table.update_item(
-            Key={"id": event_id},
-            UpdateExpression="SET booked_users = :b, waitlist_users = :w",
-            ExpressionAttributeValues={
-                ":b": new_attendees,
-                ":w": waitlist_users
-            }
-        )
+        outcome, event = storage.bookings.cancel(event_id, user_id)
+
+        if outcome == CONFLICT:
+            return "Failed to cancel booking", 409
 
+        if outcome == CANCELLED:
+            invalidate_event_list()
+            analytics_store.record(event, booked=-1)
         return "Booking cancelled successfully", 200
 
     except Exception as e:
@@ -403,7 +378,7 @@ def cancel_booking():
 @events.post("/delete-event")
 def delete_event():
     # Deletes an event (staff/admin only)
-    user_id = request.cookies.get("user_id")
+    user_id = current_user_id()
 
     # Check permission to delete events
     if not has_permission(user_id, ["staff", "admin"]):
@@ -414,8 +389,16 @@ def delete_event():
     event_id = data.get("eventId")
 
     try:
-        # Remove event from DynamoDB
-        events_table.delete_item(Key={"id": event_id})
+        # Remove the event, keeping the old item to update analytics
+        deleted = storage.events.delete(event_id)
+        storage.bookings.forget_event(event_id)
+        invalidate_event_list()
+
+        if deleted:
+            analytics_store.record(deleted, **{
+                name: -value
+                for name, value in analytics_store.event_contribution(deleted).items()
+            })
         return "Event deleted successfully", 200
     except Exception as e:
         return f"Error: {str(e)}", 500
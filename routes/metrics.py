@@ -0,0 +1,264 @@
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import Blueprint, Response, g, has_request_context, request
+from storage.scanning import call_totals
+
+metrics = Blueprint("metrics", __name__)
+
+# Bearer token required to scrape /metrics. Without one the endpoint is
+# off, unless DEV_MODE=on opens it for local development.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_OPEN = os.getenv("DEV_MODE", "off") == "on"
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+CALL_COUNT_BUCKETS = [0, 1, 2, 3, 5, 10, 25, 50, 100]
+
+# DynamoDB operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = {
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems"
+}
+
+
+# METRIC TYPES
+# Samples are kept per process, so each gunicorn worker reports its own
+# series; Prometheus sums them across scrapes of every task.
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts, total = self.series.get(labels, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.series[labels] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ["le"]
+        with self.lock:
+            for labels, (counts, total) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ["+Inf"], counts):
+                    cumulative += count
+                    lines.append(
+                        f"{self.name}_bucket{format_labels(names, labels + (bound,))} {cumulative}"
+                    )
+                lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {total}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+http_requests = Counter(
+    "unigather_http_requests_total",
+    "HTTP requests handled.",
+    ["route", "method", "status"]
+)
+http_seconds = Histogram(
+    "unigather_http_request_seconds",
+    "Time spent handling HTTP requests.",
+    ["route"],
+    LATENCY_BUCKETS
+)
+http_dynamodb_calls = Histogram(
+    "unigather_http_request_dynamodb_calls",
+    "DynamoDB calls made per HTTP request.",
+    ["route"],
+    CALL_COUNT_BUCKETS
+)
+dynamodb_calls = Counter(
+    "unigather_dynamodb_calls_total",
+    "DynamoDB API calls.",
+    ["route", "operation", "table"]
+)
+dynamodb_errors = Counter(
+    "unigather_dynamodb_errors_total",
+    "DynamoDB API calls that returned an error.",
+    ["route", "operation", "code"]
+)
+dynamodb_seconds = Histogram(
+    "unigather_dynamodb_call_seconds",
+    "DynamoDB API call latency, including retries.",
+    ["route", "operation"],
+    LATENCY_BUCKETS
+)
+dynamodb_capacity = Counter(
+    "unigather_dynamodb_consumed_capacity_units_total",
+    "Capacity units consumed, as reported by ReturnConsumedCapacity.",
+    ["route", "operation", "table"]
+)
+
+REGISTRY = [
+    http_requests, http_seconds, http_dynamodb_calls,
+    dynamodb_calls, dynamodb_errors, dynamodb_seconds, dynamodb_capacity
+]
+
+
+# DYNAMODB HOOKS
+
+
+def current_route():
+    # The URL rule of the request being served, or "background" for the
+    # promotion worker and scripts
+    if not has_request_context():
+        return "background"
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def table_of(params):
+    if "TableName" in params:
+        return params["TableName"]
+    if "RequestItems" in params:
+        return ",".join(sorted(params["RequestItems"]))
+    if "TransactItems" in params:
+        return ",".join(sorted({
+            action["TableName"]
+            for item in params["TransactItems"]
+            for action in item.values()
+        }))
+    return ""
+
+
+def prepare_call(params, model, context, **kwargs):
+    # Asks DynamoDB to report the capacity each call consumes, and notes
+    # the table while the parameters are still readable
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+    context["metrics_table"] = table_of(params)
+
+
+def start_call(context, **kwargs):
+    context["metrics_started"] = time.perf_counter()
+
+
+def finish_call(http_response, parsed, model, context, **kwargs):
+    started = context.get("metrics_started")
+    if started is None:
+        return
+
+    elapsed = time.perf_counter() - started
+    route = current_route()
+    table = context.get("metrics_table", "")
+
+    dynamodb_calls.inc((route, model.name, table))
+    dynamodb_seconds.observe((route, model.name), elapsed)
+
+    error = parsed.get("Error", {}).get("Code")
+    if error:
+        dynamodb_errors.inc((route, model.name, error))
+
+    consumed = parsed.get("ConsumedCapacity") or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    for entry in consumed:
+        dynamodb_capacity.inc(
+            (route, model.name, entry.get("TableName", table)),
+            entry.get("CapacityUnits", 0)
+        )
+
+    # Totals for this request's Server-Timing header. Each thread adds to
+    # its own totals; see call_totals.
+    totals = call_totals.get()
+    if totals is not None:
+        totals["calls"] += 1
+        totals["seconds"] += elapsed
+
+
+def instrument_dynamodb(client):
+    # Registers the hooks on a boto3 DynamoDB client (or a resource's
+    # meta.client); every table operation made through it is then counted
+    events = client.meta.events
+    events.register("provide-client-params.dynamodb", prepare_call)
+    events.register("before-call.dynamodb", start_call)
+    events.register("after-call.dynamodb", finish_call)
+
+
+# REQUEST TIMING
+
+
+@metrics.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.dynamodb_totals = {"calls": 0, "seconds": 0.0}
+    call_totals.set(g.dynamodb_totals)
+
+
+@metrics.after_app_request
+def record_request(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    route = current_route()
+    totals = g.get("dynamodb_totals", {"calls": 0, "seconds": 0.0})
+    calls = totals["calls"]
+    call_totals.set(None)
+
+    if route != "/metrics":
+        http_requests.inc((route, request.method, str(response.status_code)))
+        http_seconds.observe((route,), elapsed)
+        http_dynamodb_calls.observe((route,), calls)
+
+    # Shows where the time went in the browser's network panel
+    response.headers["Server-Timing"] = (
+        f'db;dur={totals["seconds"] * 1000:.1f};desc="{calls} calls", '
+        f"app;dur={elapsed * 1000:.1f}"
+    )
+    return response
+
+
+@metrics.get("/metrics")
+def prometheus_metrics():
+    if not METRICS_TOKEN:
+        if not METRICS_OPEN:
+            return "Not found", 404
+    elif not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"
+    ):
+        return "Unauthorised", 401
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
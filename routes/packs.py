@@ -0,0 +1,176 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from routes.pdf import booking_details, render_attendee_sheet, render_confirmations
+
+# Attendee packs are rendered in a process pool so PDF work never runs on a
+# request thread. Job status and results live on disk so every gunicorn
+# worker in the container can answer polls and downloads.
+PACK_DIR = os.getenv(
+    "PACK_DIR",
+    os.path.join(tempfile.gettempdir(), "unigather-packs")
+)
+PACK_PROCESSES = int(os.getenv("PACK_PROCESSES", 2))
+PACK_CHUNK_SIZE = int(os.getenv("PACK_CHUNK_SIZE", 25))
+# Finished packs are removed after this many seconds
+PACK_TTL = int(os.getenv("PACK_TTL", 3600))
+
+PACK_FORMATS = {
+    "zip": ("application/zip", "zip"),
+    "sheet": ("application/pdf", "pdf")
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # Creates the process pool on first use. Workers are spawned rather than
+    # forked so they never inherit the web process's threads or connections.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PACK_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def reset_pool(pool):
+    # Drops a pool whose worker died, so the next job starts a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+# JOB STATUS
+
+
+def job_dir(job_id):
+    return os.path.join(PACK_DIR, job_id)
+
+
+def write_status(job_id, **status):
+    # Replaces the job's status file atomically
+    path = os.path.join(job_dir(job_id), "status.json")
+    fd, tmp_path = tempfile.mkstemp(dir=job_dir(job_id))
+    with os.fdopen(fd, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+def read_status(job_id):
+    # Returns the job's status, or None for unknown (or malformed) IDs
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(job_dir(job_id), "status.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def result_path(job_id, pack_format):
+    return os.path.join(job_dir(job_id), f"pack.{PACK_FORMATS[pack_format][1]}")
+
+
+def remove_expired_packs():
+    # Deletes job directories older than PACK_TTL
+    if not os.path.isdir(PACK_DIR):
+        return
+    cutoff = time.time() - PACK_TTL
+    for name in os.listdir(PACK_DIR):
+        path = os.path.join(PACK_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+# BUILDING
+
+
+def build_pack(job_id, pack_format, event, attendees):
+    # Renders the pack in the process pool and writes the result to disk,
+    # updating the job's progress as chunks complete
+    total = len(attendees)
+    base = {"format": pack_format, "event_id": event["id"], "total": total}
+    path = result_path(job_id, pack_format)
+    pool = get_pool()
+
+    try:
+        if pack_format == "sheet":
+            names = [a["full_name"] for a in attendees]
+            data = pool.submit(render_attendee_sheet, event, names).result()
+            with open(path, "wb") as f:
+                f.write(data)
+        else:
+            chunks = [
+                attendees[i:i + PACK_CHUNK_SIZE]
+                for i in range(0, total, PACK_CHUNK_SIZE)
+            ]
+            futures = [
+                pool.submit(
+                    render_confirmations,
+                    [booking_details(a, event) for a in chunk]
+                )
+                for chunk in chunks
+            ]
+
+            done = 0
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as pack:
+                # Write chunks in order so the ZIP lists attendees as booked
+                for chunk, future in zip(chunks, futures):
+                    for attendee, pdf_bytes in zip(chunk, future.result()):
+                        pack.writestr(f"booking_{attendee['id']}.pdf", pdf_bytes)
+                    done += len(chunk)
+                    write_status(job_id, state="running", done=done, **base)
+
+        write_status(job_id, state="done", done=total, **base)
+    except BrokenProcessPool as e:
+        # A renderer crashed or was killed; a retried job gets a new pool
+        print(f"Attendee pack error for job {job_id}: {e}")
+        reset_pool(pool)
+        write_status(
+            job_id, state="failed", done=0,
+            error="The renderer stopped unexpectedly. Please try again.", **base
+        )
+    except Exception as e:
+        print(f"Attendee pack error for job {job_id}: {e}")
+        write_status(job_id, state="failed", done=0, error=str(e), **base)
+
+
+def start_pack(pack_format, event, attendees):
+    # Queues a pack build and returns its job ID straight away
+    remove_expired_packs()
+
+    job_id = uuid.uuid4().hex
+    os.makedirs(job_dir(job_id))
+    write_status(
+        job_id,
+        state="queued",
+        format=pack_format,
+        event_id=event["id"],
+        total=len(attendees),
+        done=0
+    )
+
+    threading.Thread(
+        target=build_pack,
+        args=(job_id, pack_format, event, attendees),
+        name=f"pack-{job_id}",
+        daemon=True
+    ).start()
+    return job_id
@@ -0,0 +1,57 @@
+import base64
+import json
+from decimal import Decimal
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class PaginationError(ValueError):
+    pass
+
+
+# Turns a DynamoDB LastEvaluatedKey into an opaque, URL-safe cursor string
+def encode_cursor(last_key):
+    if not last_key:
+        return None
+
+    raw = json.dumps(
+        last_key,
+        default=lambda v: int(v) if v == int(v) else float(v),
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# Turns a cursor from the client back into an ExclusiveStartKey
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(
+            base64.urlsafe_b64decode(padded.encode()),
+            parse_float=Decimal,
+            parse_int=Decimal
+        )
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+    if not isinstance(key, dict) or not key:
+        raise PaginationError("Invalid cursor")
+
+    return key
+
+
+# Reads and clamps the page size requested by the client
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if value is None or value == "":
+        return default
+
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError("Invalid limit")
+
+    return max(1, min(limit, maximum))
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Password hashing runs in a small process pool so a burst of logins never
+# holds the web process's GIL; request threads only wait for the result.
+# Each web process admits at most PASSWORD_CONCURRENCY hashes at a time and
+# lets PASSWORD_QUEUE more requests wait for a slot; anything beyond that is
+# turned away with PasswordBusy. Keep the two together below gunicorn's
+# --threads so some threads are always left for everything else.
+PASSWORD_PROCESSES = int(os.getenv("PASSWORD_PROCESSES", 2))
+PASSWORD_CONCURRENCY = int(os.getenv("PASSWORD_CONCURRENCY", 2))
+PASSWORD_QUEUE = int(os.getenv("PASSWORD_QUEUE", 1))
+# Seconds a queued request waits for a slot before giving up
+PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", 5))
+# PBKDF2-SHA256 rounds for new hashes. Stored hashes made with any other
+# method or round count are replaced on the user's next successful login.
+PASSWORD_ITERATIONS = int(os.getenv("PASSWORD_ITERATIONS", 1000000))
+PASSWORD_METHOD = f"pbkdf2:sha256:{PASSWORD_ITERATIONS}"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Requests holding or waiting for a hashing slot in this process
+_slots = threading.BoundedSemaphore(PASSWORD_CONCURRENCY)
+_admitted = 0
+_admitted_lock = threading.Lock()
+
+
+class PasswordBusy(Exception):
+    # Raised when too many requests are already waiting to hash passwords
+    pass
+
+
+def get_pool():
+    # Creates the process pool on first use. Workers are spawned rather than
+    # forked so they never inherit the web process's threads or connections.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def reset_pool(pool):
+    # Drops a pool whose worker died, so the next call starts a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def run(fn, *args, **kwargs):
+    # Runs fn in the pool once this request is admitted and holds a slot
+    global _admitted
+    with _admitted_lock:
+        if _admitted >= PASSWORD_CONCURRENCY + PASSWORD_QUEUE:
+            raise PasswordBusy("Too many password checks in progress")
+        _admitted += 1
+
+    try:
+        if not _slots.acquire(timeout=PASSWORD_QUEUE_TIMEOUT):
+            raise PasswordBusy("Timed out waiting to check a password")
+        try:
+            pool = get_pool()
+            try:
+                return pool.submit(fn, *args, **kwargs).result()
+            except BrokenProcessPool:
+                reset_pool(pool)
+                raise
+        finally:
+            _slots.release()
+    finally:
+        with _admitted_lock:
+            _admitted -= 1
+
+
+def hash_password(password):
+    return run(generate_password_hash, password, method=PASSWORD_METHOD)
+
+
+def verify_password(password_hash, password):
+    return run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    # True when a stored hash was made with another method or work factor
+    return password_hash.split("$", 1)[0] != PASSWORD_METHOD
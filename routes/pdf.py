@@ -1,17 +1,55 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from functools import lru_cache
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.utils import ImageReader
 
-def generate_booking_pdf(user, event):
-    # Generates a PDF booking confirmation for a user and event
+LOGO_PATH = "static/logoNormal.png"
+
+# Bump when the layout below changes so cached PDFs are not reused
+PDF_LAYOUT_VERSION = "1"
+
+
+@lru_cache(maxsize=1)
+def load_logo():
+    # Decodes the UniGather logo once per worker process
+    return ImageReader(LOGO_PATH)
+
+
+def booking_details(user, event):
+    # The labelled values printed on a booking confirmation
+    return [
+        ("Event Name", event["event_name"]),
+        ("Date", event["event_date"]),
+        ("Time", event["event_time"]),
+        ("Location", event["event_loc"]),
+        ("Booked By", user.get("full_name", user.get("username", "User"))),
+        ("Booking ID", event["id"]),
+    ]
+
+
+def booking_digest(details):
+    # Hash of everything that ends up on the page; identical inputs always
+    # render identical PDFs, so this doubles as the cache key and the ETag
+    payload = json.dumps(
+        [PDF_LAYOUT_VERSION, [[label, str(value)] for label, value in details]]
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_booking_pdf(details):
+    # Draws a booking confirmation and returns the PDF bytes
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
 
     # Add UniGather logo to the PDF
-    logo_path = "static/logoNormal.png"
-    logo = ImageReader(logo_path)
+    logo = load_logo()
     # Logo size & position (recommended)
     logo_width = 245
     logo_height = 150
@@ -37,14 +75,6 @@ def generate_booking_pdf(user, event):
 
     # Booking details section
     y = height - 350
-    details = [
-        ("Event Name", event["event_name"]),
-        ("Date", event["event_date"]),
-        ("Time", event["event_time"]),
-        ("Location", event["event_loc"]),
-        ("Booked By", user.get("full_name", user.get("username", "User"))),
-        ("Booking ID", event["id"]),
-    ]
 
     # Render booking details onto the PDF
     for label, value in details:
@@ -65,7 +95,168 @@ def generate_booking_pdf(user, event):
     c.showPage()
     c.save()
 
-    # Reset buffer position for download
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
+
+
+# RENDER CACHE
+
+
+class FilesystemPDFCache:
+    # Stores finished PDFs as files under `root`, standing in for an S3
+    # bucket with the same get/put interface. Reads refresh a file's mtime
+    # and writes evict the least recently used files once the total size
+    # passes `max_bytes`.
+    #
+    # Each process keeps a running total of the cache size and only walks
+    # the directory when that total passes the limit. Eviction then trims
+    # the cache to EVICT_TO of the limit, so the walk is not repeated on
+    # every write, and resets the total from what it found, which takes in
+    # files written by other workers.
+
+    EVICT_TO = 0.9
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._total = sum(size for _, size, _ in self._files())
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/")) + ".pdf"
+
+    def _files(self):
+        # (mtime, size, path) of every finished PDF. Temporary files that a
+        # worker is still writing are left alone.
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".pdf"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
 
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so readers never see half a PDF
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total += len(data) - replaced
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Removes the least recently used PDFs until the cache is back
+        # under EVICT_TO of the limit. Called with the lock held.
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * self.EVICT_TO
+
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self._total = total
+
+
+pdf_cache = FilesystemPDFCache(
+    os.getenv(
+        "PDF_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "unigather-pdf-cache")
+    ),
+    int(os.getenv("PDF_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+)
+
+
+def cached_booking_pdf(user, event):
+    # Returns (pdf_bytes, digest), rendering only when this exact
+    # confirmation has not been rendered before
+    details = booking_details(user, event)
+    digest = booking_digest(details)
+    key = f"{user['id']}/{event['id']}/{digest}"
+
+    data = pdf_cache.get(key)
+    if data is None:
+        data = render_booking_pdf(details)
+        pdf_cache.put(key, data)
+    return data, digest
+
+
+# BULK RENDERING
+# These run inside worker processes, so they only take plain data
+
+
+def render_confirmations(details_list):
+    # Renders one booking confirmation per entry in `details_list`
+    return [render_booking_pdf(details) for details in details_list]
+
+
+def render_attendee_sheet(event, names):
+    # Renders a printable attendee list for one event
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    def header():
+        c.setFont("Helvetica-Bold", 18)
+        c.drawCentredString(width / 2, height - 60, event["event_name"])
+        c.setFont("Helvetica", 11)
+        c.drawCentredString(
+            width / 2,
+            height - 80,
+            f"{event['event_date']} {event['event_time']} • {event['event_loc']}"
+        )
+        c.line(50, height - 95, width - 50, height - 95)
+        return height - 125
+
+    y = header()
+    for number, name in enumerate(names, start=1):
+        # Start a new page when the current one is full
+        if y < 60:
+            c.showPage()
+            y = header()
+
+        c.setFont("Helvetica", 12)
+        c.drawString(70, y, f"{number}.")
+        c.drawString(110, y, name)
+        c.rect(width - 90, y - 3, 12, 12)  # Tick box for sign-in
+        y -= 22
+
+    # Footer text
+    c.setFont("Helvetica", 9)
+    c.drawCentredString(width / 2, 40, f"{len(names)} attendees • Generated by UniGather")
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
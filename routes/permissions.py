@@ -1,17 +1,101 @@
-from db import get_db
+import os
+import time
+from flask import g, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from storage import get_storage
+
+storage = get_storage()
+
+# Signed session cookie carrying the user's id, role and session version
+SESSION_COOKIE = "session"
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", 60 * 60 * 24))
+# How old a token may get before its role and version are re-checked in storage
+SESSION_REVALIDATE_AFTER = int(os.getenv("SESSION_REVALIDATE_AFTER", 300))
+
+
+def session_secret():
+    # Anyone who knows the key can sign an admin session, so a missing key is
+    # only tolerated when local development is explicitly switched on
+    secret = os.getenv("SECRET_KEY")
+    if secret:
+        return secret
+    if os.getenv("DEV_MODE", "off") == "on":
+        return "dev-only-unigather-secret"
+    raise RuntimeError("SECRET_KEY must be set (or DEV_MODE=on for local development)")
+
+
+serializer = URLSafeTimedSerializer(session_secret(), salt="unigather-session")
+
+
+# Builds the session payload stored in the token for a user record
+def session_for(user):
+    return {
+        "uid": user["id"],
+        "role": user.get("role", "student"),
+        "ver": int(user.get("session_version", 0))
+    }
+
+
+# Creates a signed session token for a user record
+def issue_session(user):
+    return serializer.dumps(session_for(user))
+
+
+# Re-reads the role and version of a token that is past its revalidation window.
+# Returns the refreshed session, or None if the user is gone or the token is stale.
+def revalidate_session(session):
+    try:
+        user = storage.users.get(session["uid"], ["id", "role", "session_version"])
+    except storage.errors:
+        # The token is still signed and unexpired, so keep trusting it until
+        # the database is reachable again rather than logging everyone out
+        return session
+
+    if not user or int(user.get("session_version", 0)) != session["ver"]:
+        return None
+
+    # Reissue the token so the next revalidation is another window away
+    g.refreshed_session = issue_session(user)
+    return session_for(user)
+
+
+# Returns the verified session for the current request, or None.
+# The result is cached on flask.g so a request verifies its token only once.
+def current_session():
+    if "session" in g:
+        return g.session
+
+    session = None
+    token = request.cookies.get(SESSION_COOKIE)
+    if token:
+        try:
+            session, issued_at = serializer.loads(
+                token,
+                max_age=SESSION_MAX_AGE,
+                return_timestamp=True
+            )
+            age = time.time() - issued_at.timestamp()
+            if age > SESSION_REVALIDATE_AFTER:
+                session = revalidate_session(session)
+        except (SignatureExpired, BadSignature):
+            session = None
+
+    g.session = session
+    return session
+
+
+# Returns the logged-in user's ID from the signed session, or None
+def current_user_id():
+    session = current_session()
+    return session["uid"] if session else None
 
-db = get_db()
-users_table = db.Table("users")
 
 # Helper function to check if the user has the correct permissions
 def has_permission(user_id, allowed):
     if not user_id:
         return False
 
-    try:
-        user = users_table.get_item(Key={"id": user_id}).get("Item")
-        if not user:
-            return False
-        return user.get("role") in allowed
-    except Exception:
+    session = current_session()
+    if not session or session["uid"] != user_id:
         return False
+    return session["role"] in allowed
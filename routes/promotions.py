@@ -0,0 +1,84 @@
+import os
+import threading
+from storage import get_storage
+from routes import analytics_store
+
+storage = get_storage()
+
+# How many queued jobs a drain handles per page, and how often the
+# in-process worker thread looks for new ones
+PROMOTION_BATCH_SIZE = int(os.getenv("PROMOTION_BATCH_SIZE", 25))
+PROMOTION_POLL_INTERVAL = float(os.getenv("PROMOTION_POLL_INTERVAL", 2))
+
+
+# PROCESSING
+
+
+def process_job(job):
+    # Promotes the first waitlisted user of the job's event if a seat is free.
+    # Returns True when the job is finished, False to leave it for a retry.
+    finished, event = storage.bookings.promote(job)
+    if event:
+        analytics_store.record(event, booked=1, waitlisted=-1)
+    return finished
+
+
+def drain_promotions(max_jobs=None):
+    # Works through queued promotion jobs one page at a time.
+    # Returns the number of jobs finished.
+    finished = 0
+
+    for job in storage.bookings.pending_promotions(PROMOTION_BATCH_SIZE):
+        try:
+            if process_job(job):
+                finished += 1
+        except Exception as e:
+            print(f"Promotion error for job {job.get('id')}: {e}")
+
+        if max_jobs and finished >= max_jobs:
+            break
+
+    return finished
+
+
+# WORKER
+
+
+def run_worker(poll_interval=PROMOTION_POLL_INTERVAL, stop=None):
+    # Drains the queue forever, sleeping between empty polls
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            if drain_promotions():
+                continue
+        except Exception as e:
+            print(f"Promotion worker error: {e}")
+        stop.wait(poll_interval)
+
+
+def start_worker_thread():
+    # Runs the worker as a daemon thread inside a web process
+    thread = threading.Thread(
+        target=run_worker,
+        name="promotion-worker",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def ensure_worker_thread():
+    # Starts the worker thread once per process. Threads do not survive a
+    # fork, so a worker forked from a preloaded app starts its own.
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+
+    with _worker_lock:
+        if _worker_pid != os.getpid():
+            start_worker_thread()
+            _worker_pid = os.getpid()
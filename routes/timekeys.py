@@ -0,0 +1,41 @@
+from datetime import datetime
+
+# Normalised time fields stored on every event at write time, so readers can
+# sort and group on integers and keys instead of parsing date strings:
+#   starts_at       epoch seconds of event_date + event_time (server local time)
+#   created_week    ISO week the event was created in, e.g. "2025-W07"
+#   event_weekday   day of the week the event is on, 0 = Monday ... 6 = Sunday
+TIME_KEY_FIELDS = ["starts_at", "created_week", "event_weekday"]
+
+
+def time_keys(event):
+    # Computes the normalised time fields from an event's raw strings.
+    # Raises ValueError if event_date or event_time are malformed.
+    keys = {}
+
+    event_date = event.get("event_date")
+    if event_date:
+        start = datetime.strptime(
+            f"{event_date} {event.get('event_time') or '00:00'}",
+            "%Y-%m-%d %H:%M"
+        )
+        keys["starts_at"] = int(start.timestamp())
+        keys["event_weekday"] = start.weekday()
+
+    created_at = event.get("created_at")
+    if created_at:
+        year, week, _ = datetime.fromisoformat(created_at).isocalendar()
+        keys["created_week"] = f"{year}-W{week:02d}"
+
+    return keys
+
+
+def starts_at_of(event):
+    # Start time in epoch seconds, computed on the fly for events that have
+    # not been backfilled yet; undated or malformed events sort as 0
+    if "starts_at" in event:
+        return int(event["starts_at"])
+    try:
+        return time_keys(event).get("starts_at", 0)
+    except ValueError:
+        return 0
@@ -1,11 +1,99 @@
+import argparse
+import random
+import time
 import uuid
-from db import get_db
+from datetime import date, datetime, timedelta
+from itertools import islice
+from storage import EmailTaken, get_storage
+from storage.base import BOOKED_PREFIX, waitlist_key
+from routes.analytics_store import rebuild
+from routes.passwords import PASSWORD_METHOD
+from routes.timekeys import time_keys
 from werkzeug.security import generate_password_hash
 
+# Seeds the defined accounts below and, optionally, a synthetic dataset for
+# scale testing: generated users, events spread over a range of dates, and
+# bookings and waitlists drawn from a skewed popularity curve, with a few
+# hot events booked to capacity and a queue behind them.
+#
+#   python seed_users.py                         defined accounts only
+#   python seed_users.py --records 100000        about 100k records
+#   python seed_users.py --users 5000 --events 200 --seed 7
+#
+# The same seed and --start give the same users, events and bookings (IDs
+# included); only password salts differ. Writes go through the storage
+# layer's batch loads, to whichever backend STORAGE_BACKEND selects, and
+# expect empty tables.
+
+# Share of --records that are users and events; the rest are bookings
+USER_SHARE = 0.25
+EVENT_SHARE = 0.01
+
+FIRST_NAMES = [
+    "Aisha", "Ben", "Chloe", "Daniel", "Ella", "Farah", "George", "Hannah",
+    "Imran", "Jack", "Kate", "Liam", "Maya", "Noah", "Olivia", "Priya",
+    "Ravi", "Sophie", "Tom", "Uma", "Victor", "Wei", "Yusuf", "Zara"
+]
+LAST_NAMES = [
+    "Ahmed", "Brown", "Chen", "Davies", "Evans", "Green", "Hughes", "Islam",
+    "Jones", "Khan", "Lewis", "Morgan", "Patel", "Roberts", "Singh", "Smith",
+    "Taylor", "Thomas", "Walker", "Williams", "Wilson", "Wright", "Young"
+]
+EVENT_KINDS = [
+    "Workshop", "Guest Lecture", "Careers Fair", "Hackathon", "Society Social",
+    "Study Group", "Film Night", "Sports Taster", "Open Mic", "Networking Evening"
+]
+TOPICS = [
+    "Cloud Computing", "Machine Learning", "Cyber Security", "Robotics",
+    "Creative Writing", "Photography", "Entrepreneurship", "Chess",
+    "Climate Action", "Web Development", "Music Production", "Debating"
+]
+LOCATIONS = [
+    "Main Hall", "Library Room 2", "Engineering LT1", "Students' Union",
+    "Sports Centre", "Business School 101", "Online", "Science Atrium"
+]
+EVENT_TIMES = ["09:00", "10:30", "12:00", "14:00", "16:00", "18:00", "19:30"]
+# Event capacities and how often each occurs
+CAPACITIES = [20, 30, 50, 100, 250, 500]
+CAPACITY_WEIGHTS = [30, 25, 20, 15, 7, 3]
+
+# Users, events or bookings written per batch load
+CHUNK_SIZE = 500
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed UniGather with accounts and test data")
+    parser.add_argument("--records", type=int,
+                        help="rough total of users, events and bookings to generate")
+    parser.add_argument("--users", type=int, default=0, help="users to generate")
+    parser.add_argument("--events", type=int, default=0, help="events to generate")
+    parser.add_argument("--bookings-per-user", type=float, default=3,
+                        help="average events each user books or waits for")
+    parser.add_argument("--hot", type=float, default=0.01,
+                        help="share of events booked to capacity (default: 0.01)")
+    parser.add_argument("--hot-waitlist", type=float, default=0.5,
+                        help="waitlist of a hot event, as a share of its capacity")
+    parser.add_argument("--staff", type=float, default=0.02,
+                        help="share of generated users who are staff")
+    parser.add_argument("--days", type=int, default=120,
+                        help="days the events are spread over, a third of them past")
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today(),
+                        help="date the spread is centred on, YYYY-MM-DD (default: today)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--password", default="password123",
+                        help="password of every generated user")
+    args = parser.parse_args()
+
+    if args.records:
+        args.users = max(1, int(args.records * USER_SHARE))
+        args.events = max(1, int(args.records * EVENT_SHARE))
+        args.bookings_per_user = (args.records - args.users - args.events) / args.users
+    return args
+
+
 def seed_data():
-    db = get_db()
-    # Access the table using the name defined in your database config
-    users_table = db.Table("users")
+    # Writes to whichever backend STORAGE_BACKEND selects
+    storage = get_storage()
 
     # Defined users: 1 Admin, 2 Staff, 1 Student
     users_to_add = [
@@ -15,46 +103,245 @@ def seed_data():
             "email": "admin@university.ac.uk",
             # Explicitly use pbkdf2:sha256 to avoid the scrypt error on macOS
             "password": generate_password_hash("admin123", method='pbkdf2:sha256'),
-            "role": "admin",
-            "booked_events": []
+            "role": "admin"
         },
         {
             "id": str(uuid.uuid4()),
             "full_name": "Alice Staff",
             "email": "alice.staff@university.ac.uk",
             "password": generate_password_hash("staff123", method='pbkdf2:sha256'),
-            "role": "staff",
-            "booked_events": []
+            "role": "staff"
         },
         {
             "id": str(uuid.uuid4()),
             "full_name": "Bob Staff",
             "email": "bob.staff@university.ac.uk",
             "password": generate_password_hash("staff456", method='pbkdf2:sha256'),
-            "role": "staff",
-            "booked_events": []
+            "role": "staff"
         },
         {
             "id": str(uuid.uuid4()),
             "full_name": "Charlie Student",
             "email": "charlie@university.ac.uk",
             "password": generate_password_hash("student123", method='pbkdf2:sha256'),
-            "role": "student",
-            "booked_events": []
+            "role": "student"
         }
     ]
 
-    print("Pushing data to DynamoDB...")
+    print("Pushing data to storage...")
 
     for user in users_to_add:
         try:
-            # Use put_item to insert the user record
-            users_table.put_item(Item=user)
+            # Saves the user and claims the email so registration cannot reuse it
+            storage.users.create(user)
             print(f"Success: Added {user['role']} - {user['full_name']}")
+        except EmailTaken:
+            print(f"Skipped {user['full_name']}: email already registered")
         except Exception as e:
             print(f"Failed to add {user['full_name']}: {e}")
 
     print("All data pushed successfully!")
 
+
+# SYNTHETIC DATA
+
+
+def seeded_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_users(rng, count, staff_share, password_hash):
+    # Yields users with unique, deterministic emails. One password hash is
+    # shared, since hashing a million passwords would dominate the run.
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        yield {
+            "id": seeded_id(rng),
+            "full_name": f"{first} {last}",
+            "email": f"{first}.{last}.{i}@synthetic.ac.uk".lower(),
+            "password": password_hash,
+            "role": "staff" if rng.random() < staff_share else "student"
+        }
+
+
+def generate_events(rng, count, days, start, hosts):
+    # Events spread over `days` around `start`, a third of them in the past
+    first_day = start - timedelta(days=days // 3)
+    events = []
+    for _ in range(count):
+        host = rng.choice(hosts)
+        event_day = first_day + timedelta(days=rng.randrange(max(days, 1)))
+        created = min(
+            datetime.combine(event_day, datetime.min.time()) - timedelta(days=rng.randint(7, 60)),
+            datetime.combine(start, datetime.min.time())
+        ) + timedelta(seconds=rng.randrange(86400))
+
+        event = {
+            "id": seeded_id(rng),
+            "host_name": host["full_name"],
+            "host_email": host["email"],
+            "event_name": f"{rng.choice(TOPICS)} {rng.choice(EVENT_KINDS)}",
+            "event_loc": rng.choice(LOCATIONS),
+            "event_date": event_day.isoformat(),
+            "event_time": rng.choice(EVENT_TIMES),
+            "event_cap": rng.choices(CAPACITIES, weights=CAPACITY_WEIGHTS)[0],
+            "event_desc": "Generated for scale testing.",
+            "created_at": created.isoformat(),
+            "booked_count": 0,
+            "waitlist_count": 0,
+            "waitlist_seq": 0
+        }
+        event.update(time_keys(event))
+        events.append(event)
+    return events
+
+
+class Bookings:
+    # Booked and waitlisted users of every event, by index, applying the
+    # app's rule that users join the waitlist once an event is full
+    def __init__(self, events):
+        self.events = events
+        self.booked = [[] for _ in events]
+        self.waiting = [[] for _ in events]
+
+    def add(self, event_index, user_index):
+        if len(self.booked[event_index]) < self.events[event_index]["event_cap"]:
+            self.booked[event_index].append(user_index)
+        else:
+            self.waiting[event_index].append(user_index)
+
+    def members(self, event_index):
+        return set(self.booked[event_index]) | set(self.waiting[event_index])
+
+    def total(self):
+        return sum(map(len, self.booked)) + sum(map(len, self.waiting))
+
+
+def draw_bookings(rng, events, user_count, per_user, hot_share, hot_waitlist):
+    # Each user books an exponentially distributed number of events, picked
+    # by a Zipf-like popularity, so most events are quiet and a few are busy.
+    # Hot events are then topped up to capacity with a waitlist behind them.
+    bookings = Bookings(events)
+    if not events or not user_count:
+        return bookings
+
+    ranks = list(range(len(events)))
+    rng.shuffle(ranks)
+    cum_weights = []
+    total = 0
+    for rank in ranks:
+        total += 1 / (rank + 1) ** 1.1
+        cum_weights.append(total)
+
+    event_indexes = range(len(events))
+    for user_index in range(user_count):
+        # Rounding an exponential down loses half a booking on average
+        wanted = min(len(events), int(rng.expovariate(1 / (per_user + 0.5)))) if per_user > 0 else 0
+        chosen = set(rng.choices(event_indexes, cum_weights=cum_weights, k=wanted))
+        for event_index in sorted(chosen):
+            bookings.add(event_index, user_index)
+
+    hot_count = min(len(events), round(len(events) * hot_share))
+    for event_index in rng.sample(event_indexes, hot_count):
+        cap = events[event_index]["event_cap"]
+        wanted = cap + round(cap * hot_waitlist)
+        members = bookings.members(event_index)
+        missing = max(0, wanted - len(members))
+        candidates = rng.sample(range(user_count), min(user_count, missing + len(members)))
+        for user_index in [u for u in candidates if u not in members][:missing]:
+            bookings.add(event_index, user_index)
+
+    return bookings
+
+
+def booking_items(events, bookings, user_ids):
+    # Yields booking items and sets each event's counters to match. Seats
+    # are booked a minute apart from the event's creation, in list order.
+    for event_index, event in enumerate(events):
+        created = datetime.fromisoformat(event["created_at"])
+        for position, user_index in enumerate(bookings.booked[event_index]):
+            booked_at = created + timedelta(minutes=position + 1)
+            yield {
+                "event_id": event["id"],
+                "user_id": user_ids[user_index],
+                "status_key": BOOKED_PREFIX + booked_at.isoformat()
+            }
+        for position, user_index in enumerate(bookings.waiting[event_index], start=1):
+            yield {
+                "event_id": event["id"],
+                "user_id": user_ids[user_index],
+                "status_key": waitlist_key(position)
+            }
+
+        event["booked_count"] = len(bookings.booked[event_index])
+        event["waitlist_count"] = event["waitlist_seq"] = len(bookings.waiting[event_index])
+
+
+def load_in_chunks(load, items, label):
+    # Passes items to a batch load CHUNK_SIZE at a time, printing progress
+    started = time.perf_counter()
+    written = 0
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, CHUNK_SIZE))
+        if not chunk:
+            break
+        load(chunk)
+        written += len(chunk)
+        if written % (CHUNK_SIZE * 100) == 0:
+            print(f"  {written} {label}...")
+
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} {label} in {elapsed:.1f}s ({written / elapsed if elapsed else 0:.0f}/s)")
+    return written
+
+
+def generate_data(args):
+    storage = get_storage()
+    rng = random.Random(args.seed)
+    password_hash = generate_password_hash(args.password, method=PASSWORD_METHOD)
+
+    print(f"Generating {args.users} users and {args.events} events (seed {args.seed})...")
+
+    user_ids = []
+    hosts = []
+
+    def remember(users):
+        for user in users:
+            user_ids.append(user["id"])
+            if user["role"] == "staff":
+                hosts.append(user)
+            yield user
+
+    load_in_chunks(
+        storage.users.load_many,
+        remember(generate_users(rng, args.users, args.staff, password_hash)),
+        "users"
+    )
+
+    # Events are hosted by generated staff, or a defined account if none
+    hosts = hosts or [{"full_name": "Alice Staff", "email": "alice.staff@university.ac.uk"}]
+    events = generate_events(rng, args.events, args.days, args.start, hosts)
+    bookings = draw_bookings(
+        rng, events, len(user_ids), args.bookings_per_user, args.hot, args.hot_waitlist
+    )
+
+    # Booking items are written before their events, so the counters are
+    # filled in by the time each event is loaded
+    booked = load_in_chunks(
+        storage.bookings.load_many, booking_items(events, bookings, user_ids), "bookings"
+    )
+    load_in_chunks(storage.events.load_many, events, "events")
+
+    # Derived counters follow the new events
+    rebuild()
+
+    print(f"Generated {len(user_ids) + len(events) + booked} records.")
+
+
 if __name__ == "__main__":
-    seed_data()
\ No newline at end of file
+    args = parse_args()
+    seed_data()
+    if args.users or args.events:
+        generate_data(args)
@@ -0,0 +1,33 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Records how long each stage of process startup takes and prints one line
+# per stage to stderr, so slow cold starts on ECS show up in the task logs
+# without mixing into anything a process writes to stdout.
+# STARTUP_REPORT=off silences it.
+PROCESS_STARTED = time.perf_counter()
+REPORT = os.getenv("STARTUP_REPORT", "on") == "on"
+
+timings = {}
+
+
+def record(stage, seconds):
+    timings[stage] = seconds
+    if REPORT:
+        print(f"[startup pid={os.getpid()}] {stage}: {seconds * 1000:.1f} ms", file=sys.stderr, flush=True)
+
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def ready(stage="ready"):
+    # Time from the first import of this module until now
+    record(stage, time.perf_counter() - PROCESS_STARTED)
@@ -6,14 +6,24 @@ function getCookie(name) {
     return null;
 }
 
-// Fetches all user and displays them
-async function loadUsers() {
-    const res = await fetch("/api/users");
-    const users = await res.json();
+let nextCursor = null; // Cursor of the next page of users, if any
+
+// Fetches one page of users matching the search and role filter.
+// Replaces the table unless more users are being appended.
+async function loadUsers(append = false) {
+    const params = new URLSearchParams({ limit: 50 });
+    const query = document.getElementById("user-search").value.trim();
+    const role = document.getElementById("role-filter").value;
+    if (query) params.set("q", query);
+    if (role) params.set("role", role);
+    if (append && nextCursor) params.set("cursor", nextCursor);
+
+    const res = await fetch(`/api/users?${params}`);
+    const page = await res.json();
     const tbody = document.getElementById("user-table-body");
-    tbody.innerHTML = "";
+    if (!append) tbody.innerHTML = "";
 
-    for (const user of users) {
+    for (const user of page.items) {
         const row = document.createElement("tr");
         let actionBtn = "";
 
@@ -33,6 +43,11 @@ async function loadUsers() {
                 `;
         tbody.appendChild(row);
     }
+
+    nextCursor = page.next_cursor;
+    document.getElementById("load-more-users").style.display = nextCursor
+        ? "inline-block"
+        : "none";
 }
 
 // Updates the user's role
@@ -60,5 +75,19 @@ async function changeRole(userId, newRole) {
 
 // Waits for HTML document to finish loading
 document.addEventListener("DOMContentLoaded", () => {
+    let searchTimer = null;
+
+    // Searches again shortly after the admin stops typing
+    document.getElementById("user-search").addEventListener("input", () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => loadUsers(), 300);
+    });
+    document
+        .getElementById("role-filter")
+        .addEventListener("change", () => loadUsers());
+    document
+        .getElementById("load-more-users")
+        .addEventListener("click", () => loadUsers(true));
+
     loadUsers();
 });
@@ -40,47 +40,47 @@ function renderCharts(labels, eventsData, attendeesData) {
     });
 }
 
+let dashboard; // All analytics views, fetched once per page load
+
 // Summary stats at the top of the page
-function loadSummaryStats() {
-    fetch("/api/analytics/summary")
-        .then((res) => res.json())
-        .then((data) => {
-            document.getElementById("fillRate").innerText =
-                data.average_fill_rate + "%";
+function showSummaryStats() {
+    const data = dashboard.summary;
 
-            document.getElementById(
-                "bookingRatio"
-            ).innerText = `${data.booked} booked / ${data.waitlisted} waitlisted`;
+    document.getElementById("fillRate").innerText =
+        data.average_fill_rate + "%";
 
-            document.getElementById("cancellations").innerText =
-                data.cancellations;
-        });
+    document.getElementById(
+        "bookingRatio"
+    ).innerText = `${data.booked} booked / ${data.waitlisted} waitlisted`;
+
+    document.getElementById("cancellations").innerText = data.cancellations;
 }
 
-// Fetches weekly statistics
+// Shows weekly statistics
 function loadWeekly() {
-    fetch("/api/analytics/weekly")
-        .then((res) => res.json())
-        .then((data) => {
-            renderCharts(data.weeks, data.events, data.attendees); // Reloads the charts
-        });
+    const data = dashboard.weekly;
+    renderCharts(data.weeks, data.events, data.attendees); // Reloads the charts
 }
 
-// Fetches daily statistics
+// Shows daily statistics
 function loadDaily() {
-    fetch("/api/analytics/daily")
-        .then((res) => res.json())
-        .then((data) => {
-            renderCharts(data.days, data.events, data.attendees); // Reloads the charts
-        });
+    const data = dashboard.daily;
+    renderCharts(data.days, data.events, data.attendees); // Reloads the charts
 }
 
 // Waits for HTML document to finish loading
 document.addEventListener("DOMContentLoaded", function () {
-    document.getElementById("weeklyBtn").onclick = loadWeekly;
-    document.getElementById("dailyBtn").onclick = loadDaily;
+    // Fetches every view in a single request
+    fetch("/api/analytics")
+        .then((res) => res.json())
+        .then((data) => {
+            dashboard = data;
+
+            document.getElementById("weeklyBtn").onclick = loadWeekly;
+            document.getElementById("dailyBtn").onclick = loadDaily;
 
-    // Default view on page load
-    loadSummaryStats();
-    loadWeekly();
+            // Default view on page load
+            showSummaryStats();
+            loadWeekly();
+        });
 });
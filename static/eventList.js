@@ -80,15 +80,12 @@ function displayEvents(events, expandedEventsIds = []) {
         return;
     }
 
-    const userId = getCookie("user_id");
     const userRole = getCookie("role");
 
     for (const event of events) {
         const isStaff = userRole === "staff" || userRole === "admin"; // Checks if user is a staff member
-        const isBooked =
-            event.booked_users && event.booked_users.includes(userId); // Checks if current user has booked this event
-        const isWaitlisted =
-            event.waitlist_users && event.waitlist_users.includes(userId);
+        const isBooked = event.is_booked; // Checks if current user has booked this event
+        const isWaitlisted = event.is_waitlisted;
         const wasExpanded = expandedEventsIds.includes(event.id); // Checks if event was previously expanded by the user
         const eventDiv = document.createElement("div");
 
@@ -125,9 +122,9 @@ function displayEvents(events, expandedEventsIds = []) {
                                     }</p>
                                     <p><b>Availability:</b> ${
                                         event.event_cap -
-                                        event.booked_users.length
+                                        event.booked_count
                                     }/${event.event_cap} ${
-            event.booked_users.length < event.event_cap
+            event.booked_count < event.event_cap
                 ? `<i>spaces remaining</i>`
                 : `<i><b>fully booked</b></i>`
         }</p>
@@ -204,6 +201,18 @@ function displayEvents(events, expandedEventsIds = []) {
                                     View Attendees
                                 </button>
 
+                                <button 
+                                    class="attendee-button"
+                                    onclick="downloadAttendeePack('${event.id}', 'sheet'); event.stopPropagation();">
+                                    Attendee Sheet (PDF)
+                                </button>
+
+                                <button 
+                                    class="attendee-button"
+                                    onclick="downloadAttendeePack('${event.id}', 'zip'); event.stopPropagation();">
+                                    All Confirmations (ZIP)
+                                </button>
+
                                 <button 
                                     class="delete-button"
                                     onclick="deleteEvent('${event.id}'); event.stopPropagation();">
@@ -255,14 +264,64 @@ async function viewAttendees(eventId) {
             body: JSON.stringify({ eventId }),
         });
 
-        alert(await res.text());
-        getEvents(); // Refreshes the events list
+        if (!res.ok) {
+            alert(await res.text());
+            return;
+        }
+
+        const data = await res.json();
+        alert(
+            data.count === 0
+                ? "No attendees yet."
+                : `Attendees (${data.count}): ${data.attendees
+                      .map((attendee) => attendee.name)
+                      .join(", ")}`
+        );
     } catch (err) {
         console.error("viewAttendees():", err);
         alert("Failed to obtain attendees");
     }
 }
 
+// Builds an attendee pack on the server, polls until ready, then downloads it
+async function downloadAttendeePack(eventId, format) {
+    try {
+        const res = await fetch("/attendee-packs", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify({ eventId, format }),
+        });
+
+        if (!res.ok) {
+            alert(await res.text());
+            return;
+        }
+
+        const { job_id } = await res.json();
+
+        // Checks on the pack every second until it is built
+        while (true) {
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+            const status = await (
+                await fetch(`/attendee-packs/${job_id}`)
+            ).json();
+
+            if (status.state === "done") break;
+            if (status.state === "failed") {
+                alert("Failed to build attendee pack");
+                return;
+            }
+        }
+
+        window.location.href = `/attendee-packs/${job_id}/download`;
+    } catch (err) {
+        console.error("downloadAttendeePack():", err);
+        alert("Failed to build attendee pack");
+    }
+}
+
 async function deleteEvent(eventId) {
     if (!confirm("Are you sure you want to delete this event?")) return;
 
@@ -1,10 +1,23 @@
 // This JavaScript is called in conjunction with eventList.js
 
-// Fetches an updated events list from the backend
-async function getEvents() {
+let nextEventsCursor = null; // Cursor of the next page of events, if any
+
+// Fetches the first page of events from the backend, or the next page when appending
+async function getEvents(append = false) {
     try {
-        allEvents = await (await fetch("/events")).json(); // Fetches events from backend
+        const url = append && nextEventsCursor
+            ? `/events?cursor=${encodeURIComponent(nextEventsCursor)}`
+            : "/events";
+        const page = await (await fetch(url)).json(); // Fetches a page of events from backend
+
+        // Pages arrive in list order, so later pages are simply appended
+        allEvents = append ? allEvents.concat(page.items) : page.items;
+        nextEventsCursor = page.next_cursor;
         displayEvents(allEvents, getExpandedEventIds());
+
+        document.getElementById("load-more-events").style.display = nextEventsCursor
+            ? "inline-block"
+            : "none";
     } catch (err) {
         console.error("getEvents() error: " + err);
         document.getElementById("events-list").innerHTML =
@@ -69,5 +82,10 @@ document.addEventListener("DOMContentLoaded", function () {
     const createButton = document.getElementById("create-event-button");
     if (createButton) createButton.addEventListener("click", checkPermission);
 
+    // Loads the next page of events below the ones already shown
+    document
+        .getElementById("load-more-events")
+        .addEventListener("click", () => getEvents(true));
+
     getEvents(); // Loads events to populate the page
 });
@@ -0,0 +1,37 @@
+import os
+import threading
+from storage.base import CapacityExceeded, EmailTaken, InvalidCursor
+from storage.throttle import low_priority
+
+# Which backend the app stores its data in:
+#   dynamodb  the AWS tables named in db.py (default)
+#   memory    per-process dicts, for tests and local profiling
+#   sqlite    one local file at SQLITE_PATH
+_storage = None
+_lock = threading.Lock()
+
+
+def create_storage(backend=None):
+    backend = backend or os.getenv("STORAGE_BACKEND", "dynamodb")
+
+    # Backends are imported on demand so local runs never need boto3
+    if backend == "dynamodb":
+        from storage.dynamodb import DynamoDBStorage
+        return DynamoDBStorage()
+    if backend == "memory":
+        from storage.memory import MemoryStorage
+        return MemoryStorage()
+    if backend == "sqlite":
+        from storage.sqlite import SQLiteStorage
+        return SQLiteStorage(os.getenv("SQLITE_PATH", "unigather.db"))
+
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def get_storage():
+    """Returns the configured storage, creating it on first use"""
+    global _storage
+    with _lock:
+        if _storage is None:
+            _storage = create_storage()
+        return _storage
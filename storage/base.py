@@ -0,0 +1,246 @@
+# Repository interfaces shared by every storage backend. Routes only talk to
+# these methods, so a backend can be swapped without touching a blueprint.
+# Items are plain dicts; `fields` limits the attributes returned.
+from datetime import datetime
+
+# Outcomes of BookingRepository.book
+BOOKED = "booked"
+WAITLISTED = "waitlisted"
+ALREADY_BOOKED = "already_booked"
+ALREADY_WAITLISTED = "already_waitlisted"
+ALREADY_JOINED = "already_joined"
+EVENT_NOT_FOUND = "event_not_found"
+USER_NOT_FOUND = "user_not_found"
+BUSY = "busy"
+
+# Outcomes of BookingRepository.cancel
+CANCELLED = "cancelled"
+NOT_BOOKED = "not_booked"
+CONFLICT = "conflict"
+
+# Bookings are stored one item per (event, user). The status key orders an
+# event's bookings: "B#<booked at>" for seats and "W#<position>" for the
+# waitlist, so one range query reads either in order.
+BOOKED_PREFIX = "B#"
+WAITLIST_PREFIX = "W#"
+
+
+def booked_key():
+    return BOOKED_PREFIX + datetime.utcnow().isoformat()
+
+
+def waitlist_key(position):
+    return f"{WAITLIST_PREFIX}{int(position):012d}"
+
+
+def status_of(booking):
+    if booking["status_key"].startswith(BOOKED_PREFIX):
+        return BOOKED
+    return WAITLISTED
+
+
+class EmailTaken(Exception):
+    pass
+
+
+class InvalidCursor(ValueError):
+    # Raised for a page cursor the backend could not have handed out
+    pass
+
+
+class CapacityExceeded(Exception):
+    # Raised when low-priority work is shed to save capacity for bookings
+    pass
+
+
+class UserRepository:
+    def get(self, user_id, fields=None):
+        # Returns one user, or None
+        raise NotImplementedError
+
+    def get_many(self, user_ids, fields=None):
+        # Returns the users that exist, in no particular order
+        raise NotImplementedError
+
+    def find_by_email(self, email):
+        # Returns the user registered with an email, or None
+        raise NotImplementedError
+
+    def create(self, user):
+        # Saves a new user and claims their email; raises EmailTaken
+        raise NotImplementedError
+
+    def create_many(self, users):
+        # Saves many new users and claims their emails. Returns the users
+        # that were not saved as (user, reason) pairs.
+        failed = []
+        for user in users:
+            try:
+                self.create(user)
+            except EmailTaken:
+                failed.append((user, "email taken"))
+            except ValueError as e:
+                failed.append((user, str(e)))
+        return failed
+
+    def load_many(self, users):
+        # Writes users and their email claims as they are, without checking
+        # for existing ones. Only for loading prepared data into empty tables.
+        raise NotImplementedError
+
+    def scan(self, fields=None):
+        # Yields every user
+        raise NotImplementedError
+
+    def scan_each(self, consumer, fields=None):
+        # Passes every user to consumer(user), as fast as the backend can
+        # read them. Consumer calls never overlap.
+        for user in self.scan(fields):
+            consumer(user)
+
+    def update_role(self, user_id, role):
+        # Changes a role and bumps session_version so old tokens are refused.
+        # Returns whether the user exists; unknown IDs are left alone.
+        raise NotImplementedError
+
+    def update_roles(self, user_ids, role, expected_role=None):
+        # Changes the role of many existing users, like update_role. With
+        # expected_role, only users who currently have it are changed.
+        # Returns the IDs that were not changed.
+        raise NotImplementedError
+
+    def update_password(self, user_id, password_hash, expected_hash):
+        # Replaces a user's password hash if it is still `expected_hash`.
+        # Returns whether it was replaced.
+        raise NotImplementedError
+
+    def search(self, field, prefix, roles, limit, cursor=None):
+        # Returns one page of users with one of `roles` whose "name" or
+        # "email" starts with the lowercase `prefix`, ordered by that field,
+        # as (items, cursor); pass cursor back to read the next page. Raises
+        # InvalidCursor for a cursor this backend did not hand out.
+        raise NotImplementedError
+
+
+
+class EventRepository:
+    def get(self, event_id, fields=None, consistent=False, cached=False):
+        # Returns one event, or None. `cached` allows a result a few
+        # milliseconds old, for read-only endpoints.
+        raise NotImplementedError
+
+    def get_many(self, event_ids, fields=None):
+        # Returns the events that exist, in no particular order
+        raise NotImplementedError
+
+    def list_page(self, limit, cursor=None, fields=None):
+        # Returns one page of the event list as (items, cursor): upcoming
+        # events earliest first, then past events earliest first. Pass cursor
+        # back to read the next page. Events without a start time are left
+        # out. Raises InvalidCursor for a cursor this backend did not hand out.
+        raise NotImplementedError
+
+    def scan(self, fields=None):
+        # Yields every event
+        raise NotImplementedError
+
+    def scan_each(self, consumer, fields=None):
+        # Passes every event to consumer(event), as fast as the backend can
+        # read them. Consumer calls never overlap.
+        for event in self.scan(fields):
+            consumer(event)
+
+    def create(self, event):
+        raise NotImplementedError
+
+    def load_many(self, events):
+        # Writes events as they are, replacing any with the same ID
+        raise NotImplementedError
+
+    def update_fields(self, event_id, fields):
+        # Sets the given attributes on an existing event
+        raise NotImplementedError
+
+    def delete(self, event_id):
+        # Deletes an event and returns it as it was, or None
+        raise NotImplementedError
+
+
+class BookingRepository:
+    def book(self, event_id, user_id):
+        # Books the user if the event has room and nobody is waiting, and
+        # waitlists them otherwise. Returns (outcome, event) where event is
+        # the event as read when the user was waitlisted, else None.
+        raise NotImplementedError
+
+    def leave_waitlist(self, event_id, user_id):
+        # Takes the user off the waitlist. Returns (event, removed) where
+        # event is None if it does not exist and removed says whether the
+        # user was waiting.
+        raise NotImplementedError
+
+    def cancel(self, event_id, user_id):
+        # Cancels a booking and queues a waitlist promotion if anyone is
+        # waiting. Returns (outcome, event) where event is the event as it was
+        # before a successful cancellation, else None.
+        raise NotImplementedError
+
+    def pending_promotions(self, batch_size):
+        # Yields queued promotion jobs
+        raise NotImplementedError
+
+    def promote(self, job):
+        # Promotes the first waitlisted user of the job's event if a seat is
+        # free. Returns (finished, event) where event is the event as it was
+        # before a user was promoted, else None. An unfinished job is retried.
+        raise NotImplementedError
+
+    def status(self, event_id, user_id):
+        # Returns BOOKED, WAITLISTED or None for one user on one event
+        raise NotImplementedError
+
+    def booked_user_ids(self, event_id):
+        # Returns the IDs of an event's booked users, in booking order
+        raise NotImplementedError
+
+    def waitlisted_user_ids(self, event_id):
+        # Returns the IDs of an event's waitlisted users, first in line first
+        raise NotImplementedError
+
+    def user_bookings(self, user_id):
+        # Returns {event_id: BOOKED or WAITLISTED} for every event the user
+        # is booked on or waiting for
+        raise NotImplementedError
+
+    def forget_event(self, event_id):
+        # Deletes every booking and waitlist entry of a deleted event
+        raise NotImplementedError
+
+    def load_many(self, bookings):
+        # Writes booking items as they are. The events' counters are not
+        # touched, so they must already match the items being loaded.
+        raise NotImplementedError
+
+
+class AnalyticsRepository:
+    def add(self, kind, bucket, counters):
+        # Atomically adds each counter to the (kind, bucket) item
+        raise NotImplementedError
+
+    def read_all(self):
+        # Yields every counter item
+        raise NotImplementedError
+
+    def replace_all(self, items):
+        # Replaces every counter item with `items`
+        raise NotImplementedError
+
+
+class Storage:
+    users = None
+    events = None
+    bookings = None
+    analytics = None
+
+    # Exceptions meaning the backend could not be reached or failed
+    errors = ()
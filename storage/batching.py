@@ -0,0 +1,56 @@
+import time
+from db import get_db
+
+# DynamoDB rejects BatchGetItem requests with more than 100 keys
+BATCH_GET_LIMIT = 100
+MAX_RETRIES = 5
+
+
+def chunked(items, size):
+    # Splits a list into consecutive slices of at most `size` items
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def batch_get_items(table_name, keys, projection=None):
+    # Fetches many items by primary key with as few round trips as possible.
+    # Keys are de-duplicated, sent 100 at a time, and any UnprocessedKeys
+    # DynamoDB hands back are retried with exponential backoff.
+    # Returns the found items in no particular order; missing keys are skipped.
+    client = get_db().meta.client
+
+    unique_keys = []
+    seen = set()
+    for key in keys:
+        marker = tuple(sorted(key.items()))
+        if marker not in seen:
+            seen.add(marker)
+            unique_keys.append(key)
+
+    found = []
+    for chunk in chunked(unique_keys, BATCH_GET_LIMIT):
+        request = {"Keys": chunk}
+        if projection:
+            request["ProjectionExpression"] = ", ".join(
+                f"#p{i}" for i in range(len(projection))
+            )
+            request["ExpressionAttributeNames"] = {
+                f"#p{i}": name for i, name in enumerate(projection)
+            }
+
+        pending = {table_name: request}
+        attempt = 0
+        while pending:
+            response = client.batch_get_item(RequestItems=pending)
+            found.extend(response.get("Responses", {}).get(table_name, []))
+
+            pending = response.get("UnprocessedKeys") or {}
+            if pending:
+                if attempt >= MAX_RETRIES:
+                    raise RuntimeError(
+                        f"BatchGetItem on {table_name} left keys unprocessed"
+                    )
+                time.sleep(0.05 * (2 ** attempt))
+                attempt += 1
+
+    return found
@@ -0,0 +1,76 @@
+# Keys of the admin user directory. Users are searched by a prefix of their
+# lowercased name or email within each role, and every role's matches are
+# merged into one page ordered by that key.
+from storage.base import InvalidCursor
+
+ROLES = ("admin", "staff", "student")
+
+# Attribute each search field is ordered and matched by
+SEARCH_KEYS = {"name": "name_key", "email": "email"}
+
+# Cursor value of a role with no matches left
+DONE = "done"
+
+
+def normalise(text):
+    return " ".join(str(text).lower().split())
+
+
+def name_key(user):
+    # Users without a name are listed under their email
+    return normalise(
+        user.get("full_name") or user.get("username") or user.get("email") or ""
+    )
+
+
+def with_directory_keys(user):
+    # The user with the attributes the directory indexes. Empty keys are left
+    # out, since DynamoDB refuses empty strings in index keys.
+    user = dict(user)
+    key = name_key(user)
+    if key:
+        user["name_key"] = key
+    else:
+        user.pop("name_key", None)
+    return user
+
+
+def merge_pages(fetch, roles, limit, cursor, valid_position):
+    # Builds one page from the roles' separate, ordered matches.
+    # fetch(role, position, limit) returns (entries, more) where each entry
+    # is (sort_value, position, item) in order and position is where the next
+    # read for that role starts. `cursor` maps each role to its position, and
+    # comes from the client, so every position must pass
+    # valid_position(role, position) before it reaches a backend.
+    # Returns (items, next_cursor); next_cursor is None once every role is done.
+    if cursor is not None and not isinstance(cursor, dict):
+        raise InvalidCursor("Invalid cursor")
+    cursor = dict(cursor or {})
+    for role, position in cursor.items():
+        if role not in ROLES or (position != DONE and not valid_position(role, position)):
+            raise InvalidCursor("Invalid cursor")
+    fetched = {}
+    for role in roles:
+        if cursor.get(role) != DONE:
+            fetched[role] = fetch(role, cursor.get(role), limit)
+
+    merged = sorted(
+        ((entry[0], role, entry) for role, (entries, _) in fetched.items() for entry in entries),
+        key=lambda candidate: (candidate[0], candidate[1])
+    )[:limit]
+
+    taken = {}
+    for _, role, entry in merged:
+        taken.setdefault(role, []).append(entry)
+
+    for role, (entries, more) in fetched.items():
+        role_taken = taken.get(role, [])
+        if len(role_taken) == len(entries) and not more:
+            cursor[role] = DONE
+        elif role_taken:
+            cursor[role] = role_taken[-1][1]
+
+    items = [entry[2] for _, _, entry in merged]
+    if all(cursor.get(role) == DONE for role in roles):
+        return items, None
+    return items, cursor
@@ -0,0 +1,948 @@
+import os
+import copy
+import random
+import time
+import uuid
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import BotoCoreError, ClientError
+import db
+from storage.base import (
+    ALREADY_BOOKED, ALREADY_JOINED, ALREADY_WAITLISTED, BOOKED,
+    BOOKED_PREFIX, BUSY, CANCELLED, CONFLICT, EVENT_NOT_FOUND, NOT_BOOKED,
+    USER_NOT_FOUND, WAITLIST_PREFIX, WAITLISTED, AnalyticsRepository,
+    BookingRepository, EmailTaken, EventRepository, Storage, UserRepository,
+    booked_key, status_of, waitlist_key
+)
+from storage.batching import batch_get_items, chunked
+from storage.directory import SEARCH_KEYS, merge_pages, with_directory_keys
+from storage.listing import (
+    LISTING, LISTING_KEY, is_whole_number, page_by_start, with_listing_key
+)
+from storage.scanning import parallel_scan
+from storage.throttle import CapacityLimiter
+from routes.cache import SingleFlight, TTLCache
+
+EMAIL_INDEX = "email-index"
+# The admin directory: users by role, ordered by lowercase name or by email
+DIRECTORY_INDEXES = {"name": "role-name-index", "email": "role-email-index"}
+# Bookings by event ordered by status key (local index), and by user
+EVENT_STATUS_INDEX = "event-status-index"
+USER_INDEX = "user-index"
+# Events in start order, for the event list
+START_INDEX = "start-time-index"
+
+# Attempts made when concurrent bookings for the same event conflict
+BOOKING_ATTEMPTS = 4
+# Attempts made when the waitlist changes between the read and the write
+CANCEL_ATTEMPTS = 3
+# Users written per transaction by bulk operations; each new user takes two
+# of the 100 items a transaction may hold
+BULK_CREATE_USERS = 50
+BULK_UPDATE_USERS = 100
+
+# Event attributes analytics buckets are derived from
+ANALYTICS_FIELDS = [
+    "id", "created_at", "event_date", "event_time", "created_week", "event_weekday"
+]
+CANCEL_FIELDS = ANALYTICS_FIELDS + ["booked_count", "waitlist_count"]
+PROMOTION_FIELDS = ["event_cap"] + CANCEL_FIELDS
+
+# How long read-only endpoints may reuse an event read, in milliseconds.
+# 0 turns the micro-cache off; concurrent reads are still shared.
+EVENT_MICRO_CACHE_MS = int(os.getenv("EVENT_MICRO_CACHE_MS", 100))
+
+deserializer = TypeDeserializer()
+
+
+def projection(fields):
+    # Projection arguments for a list of attribute names. Every name is
+    # aliased so reserved words such as "role" need no special casing.
+    if not fields:
+        return {}
+    return {
+        "ProjectionExpression": ", ".join(f"#p{i}" for i in range(len(fields))),
+        "ExpressionAttributeNames": {f"#p{i}": name for i, name in enumerate(fields)}
+    }
+
+
+def scan_all(table, **scan_kwargs):
+    # Yields every item of a table, following LastEvaluatedKey across pages
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get("Items", [])
+
+        if "LastEvaluatedKey" not in response:
+            return
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def query_all(table, **query_kwargs):
+    # Yields every item a query matches, following LastEvaluatedKey
+    while True:
+        response = table.query(**query_kwargs)
+        yield from response.get("Items", [])
+
+        if "LastEvaluatedKey" not in response:
+            return
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def deserialize(item):
+    # Converts an item in wire format, as found in cancellation reasons
+    return {k: deserializer.deserialize(v) for k, v in item.items()}
+
+
+def cancellation_codes(error):
+    # Reason codes of a cancelled transaction, one per item
+    if error.response["Error"]["Code"] != "TransactionCanceledException":
+        raise error
+    return [r.get("Code") for r in error.response.get("CancellationReasons", [])]
+
+
+class DynamoDBRepository:
+    # Clients and tables are looked up on every use rather than kept, so a
+    # repository built before a fork uses the forked process's own client
+
+    @property
+    def client(self):
+        return db.get_db().meta.client
+
+
+# USERS
+
+
+class DynamoDBUsers(DynamoDBRepository, UserRepository):
+    @property
+    def table(self):
+        return db.get_table(db.users_table_name)
+
+    @property
+    def emails_table(self):
+        return db.get_table(db.user_emails_table_name)
+
+    def get(self, user_id, fields=None):
+        return self.table.get_item(
+            Key={"id": user_id}, **projection(fields)
+        ).get("Item")
+
+    def get_many(self, user_ids, fields=None):
+        return batch_get_items(
+            self.table.name,
+            [{"id": user_id} for user_id in user_ids],
+            projection=fields
+        )
+
+    # Finds a user through the email GSI instead of scanning the table
+    def find_by_email(self, email):
+        response = self.table.query(
+            IndexName=EMAIL_INDEX,
+            KeyConditionExpression=Key("email").eq(email),
+            Limit=1
+        )
+        items = response.get("Items", [])
+        return items[0] if items else None
+
+    # Saves the user and claims their email in one transaction, so two
+    # concurrent registrations for the same email cannot both succeed
+    def create(self, user):
+        try:
+            self.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Put": {
+                            "TableName": self.emails_table.name,
+                            "Item": {"email": user["email"], "user_id": user["id"]},
+                            "ConditionExpression": "attribute_not_exists(email)"
+                        }
+                    },
+                    {
+                        "Put": {
+                            "TableName": self.table.name,
+                            "Item": with_directory_keys(user),
+                            "ConditionExpression": "attribute_not_exists(id)"
+                        }
+                    }
+                ]
+            )
+        except ClientError as e:
+            codes = cancellation_codes(e)
+            if codes and codes[0] == "ConditionalCheckFailed":
+                raise EmailTaken(user["email"])
+            raise
+
+    def transact_each(self, entries, transact_items):
+        # Writes entries in transactions, transact_items(entry) giving each
+        # entry's conditional writes. An entry whose condition fails is
+        # dropped and the rest of its transaction is retried. Returns the
+        # dropped entries as (entry, index of the failed write).
+        failed = []
+        attempt = 0
+        while entries:
+            items_of = [transact_items(entry) for entry in entries]
+            try:
+                self.client.transact_write_items(
+                    TransactItems=[item for items in items_of for item in items]
+                )
+                return failed
+            except ClientError as e:
+                error = e
+                codes = cancellation_codes(e)
+
+            # Concurrent writes to the same users; back off and try again
+            if "ConditionalCheckFailed" not in codes:
+                if "TransactionConflict" not in codes or attempt >= BOOKING_ATTEMPTS:
+                    raise error
+                time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+                attempt += 1
+                continue
+
+            remaining = []
+            offset = 0
+            for entry, items in zip(entries, items_of):
+                entry_codes = codes[offset:offset + len(items)]
+                offset += len(items)
+                if "ConditionalCheckFailed" in entry_codes:
+                    failed.append((entry, entry_codes.index("ConditionalCheckFailed")))
+                else:
+                    remaining.append(entry)
+            entries = remaining
+
+        return failed
+
+    # Saves users in transactions of BULK_CREATE_USERS. BatchWriteItem cannot
+    # be conditional, and the email claims must be, so emails already known
+    # to be taken are filtered out with one batched read first.
+    def create_many(self, users):
+        claimed = {
+            claim["email"] for claim in batch_get_items(
+                self.emails_table.name,
+                [{"email": user["email"]} for user in users],
+                projection=["email"]
+            )
+        }
+        failed = [(user, "email taken") for user in users if user["email"] in claimed]
+        pending = [user for user in users if user["email"] not in claimed]
+
+        def transact_items(user):
+            return [
+                {
+                    "Put": {
+                        "TableName": self.emails_table.name,
+                        "Item": {"email": user["email"], "user_id": user["id"]},
+                        "ConditionExpression": "attribute_not_exists(email)"
+                    }
+                },
+                {
+                    "Put": {
+                        "TableName": self.table.name,
+                        "Item": with_directory_keys(user),
+                        "ConditionExpression": "attribute_not_exists(id)"
+                    }
+                }
+            ]
+
+        for chunk in chunked(pending, BULK_CREATE_USERS):
+            for user, index in self.transact_each(chunk, transact_items):
+                failed.append((user, "email taken" if index == 0 else "id taken"))
+        return failed
+
+    # Unconditional, so both tables are written through batch writers, which
+    # send 25 items per BatchWriteItem and resend unprocessed ones
+    def load_many(self, users):
+        emails_writer = self.emails_table.batch_writer(overwrite_by_pkeys=["email"])
+        users_writer = self.table.batch_writer(overwrite_by_pkeys=["id"])
+        with emails_writer as emails, users_writer as batch:
+            for user in users:
+                emails.put_item(Item={"email": user["email"], "user_id": user["id"]})
+                batch.put_item(Item=with_directory_keys(user))
+
+    def scan(self, fields=None):
+        return scan_all(self.table, **projection(fields))
+
+    def scan_each(self, consumer, fields=None):
+        parallel_scan(self.table.name, consumer, fields)
+
+    def update_roles(self, user_ids, role, expected_role=None):
+        # Conditional updates in transactions of BULK_UPDATE_USERS; users who
+        # do not exist or no longer have expected_role are skipped
+        condition = "attribute_exists(id)"
+        values = {":s": role, ":one": 1}
+        if expected_role:
+            condition += " AND #r = :expected"
+            values[":expected"] = expected_role
+
+        def transact_items(user_id):
+            return [{
+                "Update": {
+                    "TableName": self.table.name,
+                    "Key": {"id": user_id},
+                    "UpdateExpression": "SET #r = :s ADD session_version :one",
+                    "ConditionExpression": condition,
+                    "ExpressionAttributeNames": {"#r": "role"},
+                    "ExpressionAttributeValues": values
+                }
+            }]
+
+        skipped = []
+        for chunk in chunked(list(dict.fromkeys(user_ids)), BULK_UPDATE_USERS):
+            skipped.extend(user_id for user_id, _ in self.transact_each(chunk, transact_items))
+        return skipped
+
+    def update_role(self, user_id, role):
+        try:
+            self.table.update_item(
+                Key={"id": user_id},
+                UpdateExpression="SET #r = :s ADD session_version :one",
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeNames={"#r": "role"},
+                ExpressionAttributeValues={":s": role, ":one": 1}
+            )
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def update_password(self, user_id, password_hash, expected_hash):
+        try:
+            self.table.update_item(
+                Key={"id": user_id},
+                UpdateExpression="SET #pw = :p",
+                ConditionExpression="#pw = :old",
+                ExpressionAttributeNames={"#pw": "password"},
+                ExpressionAttributeValues={":p": password_hash, ":old": expected_hash}
+            )
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def search(self, field, prefix, roles, limit, cursor=None):
+        # One query per role on the directory index, merged into one page.
+        # A role's position is the last returned item's index key.
+        sort_key = SEARCH_KEYS[field]
+
+        def fetch(role, position, limit):
+            condition = Key("role").eq(role)
+            if prefix:
+                condition = condition & Key(sort_key).begins_with(prefix)
+
+            query_kwargs = {
+                "IndexName": DIRECTORY_INDEXES[field],
+                "KeyConditionExpression": condition,
+                "Limit": limit
+            }
+            if position:
+                query_kwargs["ExclusiveStartKey"] = position
+
+            response = self.table.query(**query_kwargs)
+            entries = [
+                (
+                    (item[sort_key], item["id"]),
+                    {"id": item["id"], "role": role, sort_key: item[sort_key]},
+                    item
+                )
+                for item in response.get("Items", [])
+            ]
+            return entries, "LastEvaluatedKey" in response
+
+        # Positions become ExclusiveStartKey, so only index keys of the
+        # role's own partition are accepted
+        def valid_position(role, position):
+            return (
+                isinstance(position, dict)
+                and set(position) == {"id", "role", sort_key}
+                and all(isinstance(value, str) for value in position.values())
+                and position["role"] == role
+            )
+
+        return merge_pages(fetch, roles, limit, cursor, valid_position)
+
+
+# EVENTS
+
+
+class DynamoDBEvents(DynamoDBRepository, EventRepository):
+    def __init__(self):
+        # When a popular event opens, concurrent reads of the same item in
+        # this worker share one GetItem instead of each sending their own
+        self.reads = SingleFlight()
+        self.recent = TTLCache(maxsize=1024, ttl=EVENT_MICRO_CACHE_MS / 1000)
+
+    @property
+    def table(self):
+        return db.get_table(db.events_table_name)
+
+    def get(self, event_id, fields=None, consistent=False, cached=False):
+        def read():
+            return self.table.get_item(
+                Key={"id": event_id},
+                ConsistentRead=consistent,
+                **projection(fields)
+            ).get("Item")
+
+        # Consistent reads must see every earlier write, so never share them
+        if consistent:
+            return read()
+
+        key = (self.table.name, event_id, tuple(fields or ()))
+        if cached and EVENT_MICRO_CACHE_MS > 0:
+            item = self.recent.get_or_set(key, read)
+        else:
+            item = self.reads.do(key, read)
+
+        # Every caller gets its own copy to modify
+        return copy.deepcopy(item)
+
+    def get_many(self, event_ids, fields=None):
+        return batch_get_items(
+            self.table.name,
+            [{"id": event_id} for event_id in event_ids],
+            projection=fields
+        )
+
+    def list_page(self, limit, cursor=None, fields=None):
+        # Queries of the start-time index, one half of the list at a time.
+        # A position is the last returned item's index key.
+        def fetch(past, now, position, limit):
+            starts_at = Key("starts_at")
+            query_kwargs = {
+                "IndexName": START_INDEX,
+                "KeyConditionExpression": Key(LISTING_KEY).eq(LISTING) & (
+                    starts_at.lt(now) if past else starts_at.gte(now)
+                ),
+                "Limit": limit,
+                **projection(fields)
+            }
+            if position:
+                query_kwargs["ExclusiveStartKey"] = position
+
+            response = self.table.query(**query_kwargs)
+            return response.get("Items", []), response.get("LastEvaluatedKey")
+
+        # Positions become ExclusiveStartKey, so only index keys are accepted
+        def valid_position(position):
+            return (
+                isinstance(position, dict)
+                and set(position) == {"id", LISTING_KEY, "starts_at"}
+                and isinstance(position["id"], str)
+                and position[LISTING_KEY] == LISTING
+                and is_whole_number(position["starts_at"])
+            )
+
+        return page_by_start(fetch, limit, cursor, time.time(), valid_position)
+
+    def scan(self, fields=None):
+        return scan_all(self.table, **projection(fields))
+
+    def scan_each(self, consumer, fields=None):
+        parallel_scan(self.table.name, consumer, fields)
+
+    def create(self, event):
+        self.table.put_item(Item=with_listing_key(event))
+
+    def load_many(self, events):
+        with self.table.batch_writer(overwrite_by_pkeys=["id"]) as batch:
+            for event in events:
+                batch.put_item(Item=with_listing_key(event))
+
+    def update_fields(self, event_id, fields):
+        fields = with_listing_key(fields)
+        self.table.update_item(
+            Key={"id": event_id},
+            UpdateExpression="SET " + ", ".join(
+                f"#f{i} = :f{i}" for i in range(len(fields))
+            ),
+            ExpressionAttributeNames={f"#f{i}": name for i, name in enumerate(fields)},
+            ExpressionAttributeValues={
+                f":f{i}": value for i, value in enumerate(fields.values())
+            }
+        )
+
+    def delete(self, event_id):
+        return self.table.delete_item(
+            Key={"id": event_id},
+            ReturnValues="ALL_OLD"
+        ).get("Attributes")
+
+
+# BOOKINGS
+
+
+class DynamoDBBookings(DynamoDBRepository, BookingRepository):
+    # Each booking is its own item in the bookings table, keyed by event and
+    # user. Booking, cancelling and promoting write one small item plus the
+    # event's counters, however many people are booked.
+
+    def __init__(self, users, events):
+        self.users = users
+        self.events = events
+
+    @property
+    def table(self):
+        return db.get_table(db.bookings_table_name)
+
+    @property
+    def jobs_table(self):
+        return db.get_table(db.promotion_jobs_table_name)
+
+    def get_booking(self, event_id, user_id):
+        return self.table.get_item(
+            Key={"event_id": event_id, "user_id": user_id},
+            ConsistentRead=True
+        ).get("Item")
+
+    def query_event(self, event_id, prefix, **query_kwargs):
+        # Yields an event's bookings whose status key starts with `prefix`,
+        # in status key order
+        query_kwargs["IndexName"] = EVENT_STATUS_INDEX
+        query_kwargs["KeyConditionExpression"] = (
+            Key("event_id").eq(event_id) & Key("status_key").begins_with(prefix)
+        )
+        return query_all(self.table, **query_kwargs)
+
+    def book_in_transaction(self, event_id, user_id):
+        # Books the user with one transaction: the event's booked_count only
+        # goes up while it has room and nobody is waiting, the booking item
+        # is only created if the user has none, and the user must exist
+        self.client.transact_write_items(
+            TransactItems=[
+                {
+                    "Update": {
+                        "TableName": self.events.table.name,
+                        "Key": {"id": event_id},
+                        "UpdateExpression": "ADD booked_count :one",
+                        "ConditionExpression": (
+                            "booked_count < event_cap "
+                            "AND (attribute_not_exists(waitlist_count) "
+                            "OR waitlist_count = :zero)"
+                        ),
+                        "ExpressionAttributeValues": {":one": 1, ":zero": 0},
+                        "ReturnValuesOnConditionCheckFailure": "ALL_OLD"
+                    }
+                },
+                {
+                    "Put": {
+                        "TableName": self.table.name,
+                        "Item": {
+                            "event_id": event_id,
+                            "user_id": user_id,
+                            "status_key": booked_key()
+                        },
+                        "ConditionExpression": "attribute_not_exists(user_id)",
+                        "ReturnValuesOnConditionCheckFailure": "ALL_OLD"
+                    }
+                },
+                {
+                    "ConditionCheck": {
+                        "TableName": self.users.table.name,
+                        "Key": {"id": user_id},
+                        "ConditionExpression": "attribute_exists(id)"
+                    }
+                }
+            ]
+        )
+
+    def join_waitlist(self, event, user_id):
+        # Takes the next waitlist position, then adds the user at it. A
+        # position lost to a failed write only leaves a gap in the order.
+        try:
+            position = self.events.table.update_item(
+                Key={"id": event["id"]},
+                UpdateExpression="ADD waitlist_seq :one",
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeValues={":one": 1},
+                ReturnValues="UPDATED_NEW"
+            )["Attributes"]["waitlist_seq"]
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return EVENT_NOT_FOUND, None
+
+        try:
+            self.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Put": {
+                            "TableName": self.table.name,
+                            "Item": {
+                                "event_id": event["id"],
+                                "user_id": user_id,
+                                "status_key": waitlist_key(position)
+                            },
+                            "ConditionExpression": "attribute_not_exists(user_id)"
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": self.events.table.name,
+                            "Key": {"id": event["id"]},
+                            "UpdateExpression": "ADD waitlist_count :one",
+                            "ConditionExpression": "attribute_exists(id)",
+                            "ExpressionAttributeValues": {":one": 1}
+                        }
+                    }
+                ]
+            )
+        except ClientError as e:
+            codes = cancellation_codes(e)
+            if codes[1] == "ConditionalCheckFailed":
+                return EVENT_NOT_FOUND, None
+            if codes[0] == "ConditionalCheckFailed":
+                return ALREADY_JOINED, None
+            return BUSY, None
+
+        return WAITLISTED, event
+
+    def book(self, event_id, user_id):
+        for attempt in range(BOOKING_ATTEMPTS):
+            try:
+                self.book_in_transaction(event_id, user_id)
+            except ClientError as e:
+                codes = cancellation_codes(e)
+                event_reason, booking_reason, _ = e.response["CancellationReasons"]
+
+                # Another booking touched the event at the same time; try again
+                if "TransactionConflict" in codes:
+                    time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+                    continue
+
+                # The user already has a booking item for this event
+                if codes[1] == "ConditionalCheckFailed":
+                    booking = deserialize(booking_reason.get("Item", {}))
+                    if status_of(booking) == BOOKED:
+                        return ALREADY_BOOKED, None
+                    return ALREADY_WAITLISTED, None
+
+                event = deserialize(event_reason.get("Item", {}))
+                if codes[0] == "ConditionalCheckFailed" and not event:
+                    return EVENT_NOT_FOUND, None
+
+                if codes[2] == "ConditionalCheckFailed":
+                    return USER_NOT_FOUND, None
+
+                if codes[0] != "ConditionalCheckFailed":
+                    raise
+
+                # The event is full, or freed seats are still owed to users
+                # already waiting
+                return self.join_waitlist(event, user_id)
+            else:
+                return BOOKED, None
+
+        return BUSY, None
+
+    def leave_waitlist(self, event_id, user_id):
+        event = self.events.get(event_id, ANALYTICS_FIELDS)
+        if not event:
+            return None, False
+
+        booking = self.get_booking(event_id, user_id)
+        if not booking or status_of(booking) != WAITLISTED:
+            return event, False
+
+        try:
+            self.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Delete": {
+                            "TableName": self.table.name,
+                            "Key": {"event_id": event_id, "user_id": user_id},
+                            "ConditionExpression": "status_key = :k",
+                            "ExpressionAttributeValues": {":k": booking["status_key"]}
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": self.events.table.name,
+                            "Key": {"id": event_id},
+                            "UpdateExpression": "ADD waitlist_count :minus",
+                            "ConditionExpression": "attribute_exists(id)",
+                            "ExpressionAttributeValues": {":minus": -1}
+                        }
+                    }
+                ]
+            )
+        except ClientError as e:
+            # Promoted or removed in the meantime
+            cancellation_codes(e)
+            return event, False
+
+        return event, True
+
+    def promotion_job_put(self, event_id):
+        # Transaction item that queues one waitlist promotion for an event.
+        # Added to the cancellation transaction so a cancel never commits
+        # without the promotion it owes.
+        return {
+            "Put": {
+                "TableName": self.jobs_table.name,
+                "Item": {
+                    "id": str(uuid.uuid4()),
+                    "event_id": event_id,
+                    "created_at": datetime.utcnow().isoformat()
+                }
+            }
+        }
+
+    def cancel_in_transaction(self, event, booking):
+        # Deletes the booking, frees its seat and queues a waitlist promotion
+        # in one transaction. The seat is only freed while the waitlist is the
+        # size we read, so a user who joins meanwhile is never left without
+        # the promotion they are owed. Returns False if anything changed.
+        waiting = int(event.get("waitlist_count", 0))
+        if waiting:
+            waitlist_condition = "waitlist_count = :w"
+        else:
+            waitlist_condition = "(attribute_not_exists(waitlist_count) OR waitlist_count = :w)"
+
+        transact_items = [
+            {
+                "Delete": {
+                    "TableName": self.table.name,
+                    "Key": {"event_id": event["id"], "user_id": booking["user_id"]},
+                    "ConditionExpression": "status_key = :k",
+                    "ExpressionAttributeValues": {":k": booking["status_key"]}
+                }
+            },
+            {
+                "Update": {
+                    "TableName": self.events.table.name,
+                    "Key": {"id": event["id"]},
+                    "UpdateExpression": "ADD booked_count :minus",
+                    "ConditionExpression": "attribute_exists(id) AND " + waitlist_condition,
+                    "ExpressionAttributeValues": {":minus": -1, ":w": waiting}
+                }
+            }
+        ]
+
+        # Promotion happens in the background worker
+        if waiting:
+            transact_items.append(self.promotion_job_put(event["id"]))
+
+        try:
+            self.client.transact_write_items(TransactItems=transact_items)
+            return True
+        except ClientError as e:
+            cancellation_codes(e)
+            return False
+
+    def cancel(self, event_id, user_id):
+        for _ in range(CANCEL_ATTEMPTS):
+            booking = self.get_booking(event_id, user_id)
+            if not booking or status_of(booking) != BOOKED:
+                return NOT_BOOKED, None
+
+            event = self.events.get(event_id, CANCEL_FIELDS, consistent=True)
+
+            # The event is gone; drop the booking it left behind
+            if not event:
+                self.table.delete_item(Key={"event_id": event_id, "user_id": user_id})
+                return NOT_BOOKED, None
+
+            if self.cancel_in_transaction(event, booking):
+                return CANCELLED, event
+
+        return CONFLICT, None
+
+    # PROMOTIONS
+
+    def pending_promotions(self, batch_size):
+        return scan_all(self.jobs_table, Limit=batch_size, ConsistentRead=True)
+
+    def finish_job(self, job):
+        # Removes a job that needs no further work
+        try:
+            self.jobs_table.delete_item(
+                Key={"id": job["id"]},
+                ConditionExpression="attribute_exists(id)"
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+    def drop_waitlist_head(self, event, head):
+        # Removes a waitlisted user whose account no longer exists
+        try:
+            self.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Delete": {
+                            "TableName": self.table.name,
+                            "Key": {"event_id": event["id"], "user_id": head["user_id"]},
+                            "ConditionExpression": "status_key = :k",
+                            "ExpressionAttributeValues": {":k": head["status_key"]}
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": self.events.table.name,
+                            "Key": {"id": event["id"]},
+                            "UpdateExpression": "ADD waitlist_count :minus",
+                            "ExpressionAttributeValues": {":minus": -1}
+                        }
+                    }
+                ]
+            )
+        except ClientError as e:
+            cancellation_codes(e)
+
+    def promote(self, job):
+        # The promotion and the job's deletion commit together, and every
+        # write is conditional on the state that was read, so running a job
+        # twice (or on two workers at once) promotes at most one user
+        event = self.events.get(job["event_id"], PROMOTION_FIELDS, consistent=True)
+
+        if not event:
+            self.finish_job(job)
+            return True, None
+
+        booked_count = int(event.get("booked_count", 0))
+        if booked_count >= int(event.get("event_cap", 0)):
+            self.finish_job(job)
+            return True, None
+
+        # First in line, read from the index with the table's consistency
+        head = next(self.query_event(
+            event["id"], WAITLIST_PREFIX, Limit=1, ConsistentRead=True
+        ), None)
+        if not head:
+            self.finish_job(job)
+            return True, None
+
+        try:
+            self.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Update": {
+                            "TableName": self.table.name,
+                            "Key": {"event_id": event["id"], "user_id": head["user_id"]},
+                            "UpdateExpression": "SET status_key = :b",
+                            "ConditionExpression": "status_key = :k",
+                            "ExpressionAttributeValues": {
+                                ":b": booked_key(),
+                                ":k": head["status_key"]
+                            }
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": self.events.table.name,
+                            "Key": {"id": event["id"]},
+                            "UpdateExpression": "ADD booked_count :one, waitlist_count :minus",
+                            "ConditionExpression": "booked_count < event_cap",
+                            "ExpressionAttributeValues": {":one": 1, ":minus": -1}
+                        }
+                    },
+                    {
+                        "ConditionCheck": {
+                            "TableName": self.users.table.name,
+                            "Key": {"id": head["user_id"]},
+                            "ConditionExpression": "attribute_exists(id)"
+                        }
+                    },
+                    {
+                        "Delete": {
+                            "TableName": self.jobs_table.name,
+                            "Key": {"id": job["id"]},
+                            "ConditionExpression": "attribute_exists(id)"
+                        }
+                    }
+                ]
+            )
+        except ClientError as e:
+            codes = cancellation_codes(e)
+
+            # The promoted user was deleted: drop them and retry the job later
+            if codes[2] == "ConditionalCheckFailed" and codes[0] in (None, "None"):
+                self.drop_waitlist_head(event, head)
+            # Any other failure means the state moved on; the job is retried
+            return False, None
+
+        return True, event
+
+    # VIEWS
+
+    def status(self, event_id, user_id):
+        booking = self.table.get_item(
+            Key={"event_id": event_id, "user_id": user_id}
+        ).get("Item")
+        return status_of(booking) if booking else None
+
+    def booked_user_ids(self, event_id):
+        return [b["user_id"] for b in self.query_event(event_id, BOOKED_PREFIX)]
+
+    def waitlisted_user_ids(self, event_id):
+        return [b["user_id"] for b in self.query_event(event_id, WAITLIST_PREFIX)]
+
+    def user_bookings(self, user_id):
+        bookings = query_all(
+            self.table,
+            IndexName=USER_INDEX,
+            KeyConditionExpression=Key("user_id").eq(user_id)
+        )
+        return {b["event_id"]: status_of(b) for b in bookings}
+
+    def forget_event(self, event_id):
+        keys = query_all(
+            self.table,
+            KeyConditionExpression=Key("event_id").eq(event_id),
+            **projection(["event_id", "user_id"])
+        )
+        with self.table.batch_writer() as batch:
+            for key in keys:
+                batch.delete_item(Key=key)
+
+    def load_many(self, bookings):
+        with self.table.batch_writer(overwrite_by_pkeys=["event_id", "user_id"]) as batch:
+            for booking in bookings:
+                batch.put_item(Item=booking)
+
+
+# ANALYTICS
+
+
+class DynamoDBAnalytics(DynamoDBRepository, AnalyticsRepository):
+    @property
+    def table(self):
+        return db.get_table(db.analytics_table_name)
+
+    def add(self, kind, bucket, counters):
+        self.table.update_item(
+            Key={"kind": kind, "bucket": bucket},
+            UpdateExpression="ADD " + ", ".join(
+                f"#c{i} :v{i}" for i in range(len(counters))
+            ),
+            ExpressionAttributeNames={
+                f"#c{i}": name for i, name in enumerate(counters)
+            },
+            ExpressionAttributeValues={
+                f":v{i}": value for i, value in enumerate(counters.values())
+            }
+        )
+
+    def read_all(self):
+        return scan_all(self.table)
+
+    def replace_all(self, items):
+        # Old counters are cleared so buckets with no events left disappear.
+        # Writes made while this runs may be lost.
+        stale_keys = list(scan_all(self.table, **projection(["kind", "bucket"])))
+
+        with self.table.batch_writer(overwrite_by_pkeys=["kind", "bucket"]) as batch:
+            for key in stale_keys:
+                batch.delete_item(Key={"kind": key["kind"], "bucket": key["bucket"]})
+            for item in items:
+                batch.put_item(Item=item)
+
+
+class DynamoDBStorage(Storage):
+    errors = (BotoCoreError, ClientError)
+
+    def __init__(self):
+
+        # Keep every call inside the tables' provisioned capacity
+        if os.getenv("DYNAMODB_RATE_LIMIT", "on") == "on":
+            self.limiter = CapacityLimiter()
+            db.on_client_created(self.limiter.install)
+
+        self.users = DynamoDBUsers()
+        self.events = DynamoDBEvents()
+        self.bookings = DynamoDBBookings(self.users, self.events)
+        self.analytics = DynamoDBAnalytics()
@@ -0,0 +1,64 @@
+# Keys of the event list. Events are read in start order through an index
+# on starts_at: upcoming events earliest first, then past events earliest
+# first, so every page continues where the last one stopped.
+from storage.base import InvalidCursor
+
+# Constant partition of the start-time index. Every event with a start time
+# carries it, since an index can only be read in order within one partition.
+LISTING_KEY = "listing_key"
+LISTING = "all"
+
+
+def with_listing_key(event):
+    # The event with the attribute the start-time index is partitioned by.
+    # Events without a start time stay out of the index.
+    event = dict(event)
+    if "starts_at" in event:
+        event[LISTING_KEY] = LISTING
+    return event
+
+
+def is_whole_number(value):
+    # Numbers in decoded cursors arrive as Decimal
+    try:
+        return not isinstance(value, (bool, str)) and value == int(value)
+    except (TypeError, ValueError, OverflowError):
+        return False
+
+
+def page_by_start(fetch, limit, cursor, now, valid_position):
+    # Builds one page of events in list order.
+    # fetch(past, now, position, limit) returns (items, position) for one
+    # half of the list: events starting at or after `now`, or before it when
+    # `past`. position is where the next read of that half starts, or None
+    # once it is exhausted. `cursor` comes from the client, so it is checked
+    # here and each position must pass valid_position(position).
+    # Returns (items, next_cursor); next_cursor is None at the end.
+    if cursor is None:
+        cursor = {"now": int(now), "past": False}
+    elif (
+        not isinstance(cursor, dict)
+        or set(cursor) - {"now", "past", "key"}
+        or not is_whole_number(cursor.get("now"))
+        or cursor.get("past") not in (True, False)
+        or ("key" in cursor and not valid_position(cursor["key"]))
+    ):
+        raise InvalidCursor("Invalid cursor")
+
+    now = int(cursor["now"])
+    past = cursor["past"]
+    position = cursor.get("key")
+    items = []
+
+    while True:
+        found, position = fetch(past, now, position, limit - len(items))
+        items.extend(found)
+
+        if position is None:
+            if past:
+                return items, None
+            past = True
+            if len(items) >= limit:
+                return items, {"now": now, "past": True}
+        elif len(items) >= limit:
+            return items, {"now": now, "past": past, "key": position}
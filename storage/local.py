@@ -0,0 +1,538 @@
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+import time
+from storage.directory import SEARCH_KEYS, merge_pages, with_directory_keys
+from storage.listing import page_by_start
+from storage.base import (
+    ALREADY_BOOKED, ALREADY_WAITLISTED, BOOKED, CANCELLED, EVENT_NOT_FOUND,
+    NOT_BOOKED, USER_NOT_FOUND, WAITLISTED, AnalyticsRepository,
+    BookingRepository, EmailTaken, EventRepository, Storage, UserRepository,
+    booked_key, status_of, waitlist_key
+)
+
+# Table names used inside a local store
+USERS = "users"
+EVENTS = "events"
+USER_EMAILS = "user_emails"
+ANALYTICS = "analytics"
+PROMOTION_JOBS = "promotion_jobs"
+# Bookings keyed "event#user", mirrored under "user#event" for per-user reads
+BOOKINGS = "bookings"
+USER_BOOKINGS = "user_bookings"
+# Admin directory entries keyed "<field>#<role>#<value>#<user id>"
+DIRECTORY = "user_directory"
+# Events with a start time keyed "<starts_at, 12 digits>#<event id>"
+EVENT_STARTS = "event_starts"
+
+
+def project(item, fields):
+    # Keeps only the requested attributes of an item
+    if item is None or not fields:
+        return item
+    return {name: item[name] for name in fields if name in item}
+
+
+def analytics_key(kind, bucket):
+    return f"{kind}#{bucket}"
+
+
+def pair_key(first, second):
+    return f"{first}#{second}"
+
+
+def start_key(event):
+    return f"{int(event['starts_at']):012d}#{event['id']}"
+
+
+class DocumentStore:
+    # A key/value store of JSON-like items grouped into tables. Every
+    # repository call runs inside transaction(), which holds one re-entrant
+    # lock, so each call is atomic and isolated like a DynamoDB transaction.
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.depth = 0
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self.depth == 0:
+                self.begin()
+            self.depth += 1
+            try:
+                yield
+            except BaseException:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.rollback()
+                raise
+            self.depth -= 1
+            if self.depth == 0:
+                self.commit()
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def get(self, table, key):
+        # Returns a copy of one item, or None
+        raise NotImplementedError
+
+    def put(self, table, key, item):
+        raise NotImplementedError
+
+    def delete(self, table, key):
+        raise NotImplementedError
+
+    def scan(self, table, after=None, limit=None, prefix=""):
+        # Returns copies of items ordered by key, starting after `after` and
+        # limited to keys beginning with `prefix`
+        raise NotImplementedError
+
+
+# USERS
+
+
+def directory_entries(user):
+    # {key: entry} of the directory entries a user is listed under
+    if not user.get("role"):
+        return {}
+
+    entry = {
+        name: user[name]
+        for name in ("id", "role", "full_name", "email", "name_key")
+        if name in user
+    }
+    return {
+        f"{field}#{user['role']}#{user[attribute]}#{user['id']}": entry
+        for field, attribute in SEARCH_KEYS.items()
+        if user.get(attribute)
+    }
+
+
+class LocalUsers(UserRepository):
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, user_id, fields=None):
+        with self.store.transaction():
+            return project(self.store.get(USERS, user_id), fields)
+
+    def get_many(self, user_ids, fields=None):
+        with self.store.transaction():
+            found = [self.store.get(USERS, user_id) for user_id in set(user_ids)]
+        return [project(user, fields) for user in found if user]
+
+    def find_by_email(self, email):
+        with self.store.transaction():
+            claim = self.store.get(USER_EMAILS, email)
+            return claim and self.store.get(USERS, claim["user_id"])
+
+    def create(self, user):
+        with self.store.transaction():
+            if self.store.get(USER_EMAILS, user["email"]):
+                raise EmailTaken(user["email"])
+            if self.store.get(USERS, user["id"]):
+                raise ValueError(f"User {user['id']} already exists")
+
+            self.store.put(USER_EMAILS, user["email"], {
+                "email": user["email"],
+                "user_id": user["id"]
+            })
+            user = with_directory_keys(user)
+            self.store.put(USERS, user["id"], user)
+            for key, entry in directory_entries(user).items():
+                self.store.put(DIRECTORY, key, entry)
+
+    def load_many(self, users):
+        with self.store.transaction():
+            for user in users:
+                self.store.put(USER_EMAILS, user["email"], {
+                    "email": user["email"],
+                    "user_id": user["id"]
+                })
+                user = with_directory_keys(user)
+                self.store.put(USERS, user["id"], user)
+                for key, entry in directory_entries(user).items():
+                    self.store.put(DIRECTORY, key, entry)
+
+    def scan(self, fields=None):
+        with self.store.transaction():
+            users = self.store.scan(USERS)
+        return (project(user, fields) for user in users)
+
+    def update_role(self, user_id, role):
+        with self.store.transaction():
+            user = self.store.get(USERS, user_id)
+            if not user:
+                return False
+
+            for key in directory_entries(user):
+                self.store.delete(DIRECTORY, key)
+
+            user["role"] = role
+            user["session_version"] = int(user.get("session_version", 0)) + 1
+            self.store.put(USERS, user_id, user)
+            for key, entry in directory_entries(user).items():
+                self.store.put(DIRECTORY, key, entry)
+        return True
+
+    def update_roles(self, user_ids, role, expected_role=None):
+        skipped = []
+        with self.store.transaction():
+            for user_id in dict.fromkeys(user_ids):
+                user = self.store.get(USERS, user_id)
+                if not user or (expected_role and user.get("role") != expected_role):
+                    skipped.append(user_id)
+                    continue
+                self.update_role(user_id, role)
+        return skipped
+
+    def update_password(self, user_id, password_hash, expected_hash):
+        with self.store.transaction():
+            user = self.store.get(USERS, user_id)
+            if not user or user.get("password") != expected_hash:
+                return False
+            user["password"] = password_hash
+            self.store.put(USERS, user_id, user)
+            return True
+
+    def search(self, field, prefix, roles, limit, cursor=None):
+        # Range scans over the directory entries of each role. A role's
+        # position is the key of the last entry returned.
+        sort_key = SEARCH_KEYS[field]
+
+        def fetch(role, position, limit):
+            found = self.store.scan(
+                DIRECTORY, after=position, limit=limit + 1,
+                prefix=f"{field}#{role}#{prefix}"
+            )
+            entries = [
+                (
+                    (entry[sort_key], entry["id"]),
+                    f"{field}#{role}#{entry[sort_key]}#{entry['id']}",
+                    entry
+                )
+                for entry in found[:limit]
+            ]
+            return entries, len(found) > limit
+
+        def valid_position(role, position):
+            return isinstance(position, str) and position.startswith(f"{field}#{role}#")
+
+        with self.store.transaction():
+            return merge_pages(fetch, roles, limit, cursor, valid_position)
+
+
+# EVENTS
+
+
+class LocalEvents(EventRepository):
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, event_id, fields=None, consistent=False, cached=False):
+        with self.store.transaction():
+            return project(self.store.get(EVENTS, event_id), fields)
+
+    def get_many(self, event_ids, fields=None):
+        with self.store.transaction():
+            found = [self.store.get(EVENTS, event_id) for event_id in set(event_ids)]
+        return [project(event, fields) for event in found if event]
+
+    def list_page(self, limit, cursor=None, fields=None):
+        # Range scans over the start-time entries. A position is the key of
+        # the last entry returned.
+        def fetch(past, now, position, limit):
+            bound = start_key({"id": "", "starts_at": now})
+            found = self.store.scan(
+                EVENT_STARTS, after=position or (None if past else bound), limit=limit + 1
+            )
+            if past:
+                found = [entry for entry in found if start_key(entry) < bound]
+
+            page = found[:limit]
+            events = [project(self.store.get(EVENTS, entry["id"]), fields) for entry in page]
+            return events, start_key(page[-1]) if len(found) > limit else None
+
+        def valid_position(position):
+            return (
+                isinstance(position, str)
+                and position[:12].isdigit()
+                and position[12:13] == "#"
+            )
+
+        with self.store.transaction():
+            return page_by_start(fetch, limit, cursor, time.time(), valid_position)
+
+    def scan(self, fields=None):
+        with self.store.transaction():
+            events = self.store.scan(EVENTS)
+        return (project(event, fields) for event in events)
+
+    def put(self, event):
+        # Saves an event and keeps its start-time entry in step
+        old = self.store.get(EVENTS, event["id"])
+        if old and "starts_at" in old:
+            self.store.delete(EVENT_STARTS, start_key(old))
+        self.store.put(EVENTS, event["id"], event)
+        if "starts_at" in event:
+            self.store.put(EVENT_STARTS, start_key(event), {
+                "id": event["id"],
+                "starts_at": event["starts_at"]
+            })
+
+    def create(self, event):
+        with self.store.transaction():
+            self.put(event)
+
+    def load_many(self, events):
+        with self.store.transaction():
+            for event in events:
+                self.put(event)
+
+    def update_fields(self, event_id, fields):
+        with self.store.transaction():
+            event = self.store.get(EVENTS, event_id) or {"id": event_id}
+            event.update(fields)
+            self.put(event)
+
+    def delete(self, event_id):
+        with self.store.transaction():
+            event = self.store.get(EVENTS, event_id)
+            if event:
+                self.store.delete(EVENTS, event_id)
+                if "starts_at" in event:
+                    self.store.delete(EVENT_STARTS, start_key(event))
+            return event
+
+
+# BOOKINGS
+
+
+def put_booking(store, booking):
+    store.put(BOOKINGS, pair_key(booking["event_id"], booking["user_id"]), booking)
+    store.put(USER_BOOKINGS, pair_key(booking["user_id"], booking["event_id"]), booking)
+
+
+def delete_booking(store, event_id, user_id):
+    store.delete(BOOKINGS, pair_key(event_id, user_id))
+    store.delete(USER_BOOKINGS, pair_key(user_id, event_id))
+
+
+def event_bookings(store, event_id, status):
+    # An event's bookings with one status, in status key order
+    bookings = store.scan(BOOKINGS, prefix=pair_key(event_id, ""))
+    return sorted(
+        (b for b in bookings if status_of(b) == status),
+        key=lambda b: b["status_key"]
+    )
+
+
+class LocalBookings(BookingRepository):
+    # Same rules as the DynamoDB transactions, checked and applied under the
+    # store's lock instead of through condition expressions
+
+    def __init__(self, store):
+        self.store = store
+
+    def book(self, event_id, user_id):
+        with self.store.transaction():
+            event = self.store.get(EVENTS, event_id)
+            if not event:
+                return EVENT_NOT_FOUND, None
+
+            booking = self.store.get(BOOKINGS, pair_key(event_id, user_id))
+            if booking:
+                if status_of(booking) == BOOKED:
+                    return ALREADY_BOOKED, None
+                return ALREADY_WAITLISTED, None
+
+            if not self.store.get(USERS, user_id):
+                return USER_NOT_FOUND, None
+
+            booked_count = int(event.get("booked_count", 0))
+            waitlist_count = int(event.get("waitlist_count", 0))
+
+            # The event is full, or freed seats are still owed to users
+            # already waiting
+            if booked_count >= int(event.get("event_cap", 0)) or waitlist_count:
+                position = int(event.get("waitlist_seq", 0)) + 1
+                self.store.put(EVENTS, event_id, dict(
+                    event,
+                    waitlist_seq=position,
+                    waitlist_count=waitlist_count + 1
+                ))
+                put_booking(self.store, {
+                    "event_id": event_id,
+                    "user_id": user_id,
+                    "status_key": waitlist_key(position)
+                })
+                return WAITLISTED, event
+
+            self.store.put(EVENTS, event_id, dict(event, booked_count=booked_count + 1))
+            put_booking(self.store, {
+                "event_id": event_id,
+                "user_id": user_id,
+                "status_key": booked_key()
+            })
+            return BOOKED, None
+
+    def leave_waitlist(self, event_id, user_id):
+        with self.store.transaction():
+            event = self.store.get(EVENTS, event_id)
+            if not event:
+                return None, False
+
+            booking = self.store.get(BOOKINGS, pair_key(event_id, user_id))
+            if not booking or status_of(booking) != WAITLISTED:
+                return event, False
+
+            delete_booking(self.store, event_id, user_id)
+            self.store.put(EVENTS, event_id, dict(
+                event, waitlist_count=int(event.get("waitlist_count", 0)) - 1
+            ))
+            return event, True
+
+    def cancel(self, event_id, user_id):
+        with self.store.transaction():
+            booking = self.store.get(BOOKINGS, pair_key(event_id, user_id))
+            if not booking or status_of(booking) != BOOKED:
+                return NOT_BOOKED, None
+
+            delete_booking(self.store, event_id, user_id)
+
+            # The event is gone; only its leftover booking needed removing
+            event = self.store.get(EVENTS, event_id)
+            if not event:
+                return NOT_BOOKED, None
+
+            self.store.put(EVENTS, event_id, dict(
+                event, booked_count=int(event.get("booked_count", 0)) - 1
+            ))
+
+            # Promotion happens in the background worker
+            if int(event.get("waitlist_count", 0)):
+                job_id = str(uuid.uuid4())
+                self.store.put(PROMOTION_JOBS, job_id, {
+                    "id": job_id,
+                    "event_id": event_id,
+                    "created_at": datetime.utcnow().isoformat()
+                })
+
+            return CANCELLED, event
+
+    def pending_promotions(self, batch_size):
+        with self.store.transaction():
+            jobs = self.store.scan(PROMOTION_JOBS)
+        return iter(sorted(jobs, key=lambda job: job["created_at"]))
+
+    def promote(self, job):
+        with self.store.transaction():
+            if not self.store.get(PROMOTION_JOBS, job["id"]):
+                return True, None
+
+            event = self.store.get(EVENTS, job["event_id"])
+            if not event:
+                self.store.delete(PROMOTION_JOBS, job["id"])
+                return True, None
+
+            booked_count = int(event.get("booked_count", 0))
+            waitlist = event_bookings(self.store, event["id"], WAITLISTED)
+
+            if not waitlist or booked_count >= int(event.get("event_cap", 0)):
+                self.store.delete(PROMOTION_JOBS, job["id"])
+                return True, None
+
+            head = waitlist[0]
+            waitlist_count = int(event.get("waitlist_count", 0))
+
+            # The promoted user was deleted: drop them and retry the job later
+            if not self.store.get(USERS, head["user_id"]):
+                delete_booking(self.store, event["id"], head["user_id"])
+                self.store.put(EVENTS, event["id"], dict(
+                    event, waitlist_count=waitlist_count - 1
+                ))
+                return False, None
+
+            put_booking(self.store, dict(head, status_key=booked_key()))
+            self.store.put(EVENTS, event["id"], dict(
+                event,
+                booked_count=booked_count + 1,
+                waitlist_count=waitlist_count - 1
+            ))
+            self.store.delete(PROMOTION_JOBS, job["id"])
+            return True, event
+
+    # VIEWS
+
+    def status(self, event_id, user_id):
+        with self.store.transaction():
+            booking = self.store.get(BOOKINGS, pair_key(event_id, user_id))
+        return status_of(booking) if booking else None
+
+    def booked_user_ids(self, event_id):
+        with self.store.transaction():
+            return [b["user_id"] for b in event_bookings(self.store, event_id, BOOKED)]
+
+    def waitlisted_user_ids(self, event_id):
+        with self.store.transaction():
+            return [b["user_id"] for b in event_bookings(self.store, event_id, WAITLISTED)]
+
+    def user_bookings(self, user_id):
+        with self.store.transaction():
+            bookings = self.store.scan(USER_BOOKINGS, prefix=pair_key(user_id, ""))
+        return {b["event_id"]: status_of(b) for b in bookings}
+
+    def forget_event(self, event_id):
+        with self.store.transaction():
+            for booking in self.store.scan(BOOKINGS, prefix=pair_key(event_id, "")):
+                delete_booking(self.store, event_id, booking["user_id"])
+
+    def load_many(self, bookings):
+        with self.store.transaction():
+            for booking in bookings:
+                put_booking(self.store, booking)
+
+
+# ANALYTICS
+
+
+class LocalAnalytics(AnalyticsRepository):
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, kind, bucket, counters):
+        key = analytics_key(kind, bucket)
+        with self.store.transaction():
+            item = self.store.get(ANALYTICS, key) or {"kind": kind, "bucket": bucket}
+            for name, value in counters.items():
+                item[name] = item.get(name, 0) + value
+            self.store.put(ANALYTICS, key, item)
+
+    def read_all(self):
+        with self.store.transaction():
+            return iter(self.store.scan(ANALYTICS))
+
+    def replace_all(self, items):
+        with self.store.transaction():
+            for item in self.store.scan(ANALYTICS):
+                self.store.delete(ANALYTICS, analytics_key(item["kind"], item["bucket"]))
+            for item in items:
+                self.store.put(ANALYTICS, analytics_key(item["kind"], item["bucket"]), item)
+
+
+class LocalStorage(Storage):
+    def __init__(self, store):
+        self.store = store
+        self.users = LocalUsers(store)
+        self.events = LocalEvents(store)
+        self.bookings = LocalBookings(store)
+        self.analytics = LocalAnalytics(store)
@@ -0,0 +1,45 @@
+import copy
+from bisect import bisect_left, bisect_right, insort
+from storage.local import DocumentStore, LocalStorage
+
+
+class MemoryStore(DocumentStore):
+    # Items live in per-process dicts and are copied on the way in and out,
+    # so callers can never mutate stored state without a put. Each table's
+    # keys are also kept sorted, so a scan reads only the range it needs.
+    def __init__(self):
+        super().__init__()
+        self.tables = {}
+        self.keys = {}
+
+    def get(self, table, key):
+        return copy.deepcopy(self.tables.get(table, {}).get(key))
+
+    def put(self, table, key, item):
+        items = self.tables.setdefault(table, {})
+        if key not in items:
+            insort(self.keys.setdefault(table, []), key)
+        items[key] = copy.deepcopy(item)
+
+    def delete(self, table, key):
+        if self.tables.get(table, {}).pop(key, None) is not None:
+            keys = self.keys[table]
+            del keys[bisect_left(keys, key)]
+
+    def scan(self, table, after=None, limit=None, prefix=""):
+        keys = self.keys.get(table, [])
+        start = bisect_left(keys, prefix)
+        if after is not None:
+            start = max(start, bisect_right(keys, after))
+
+        found = []
+        for key in keys[start:]:
+            if not key.startswith(prefix) or len(found) == limit:
+                break
+            found.append(self.get(table, key))
+        return found
+
+
+class MemoryStorage(LocalStorage):
+    def __init__(self):
+        super().__init__(MemoryStore())
@@ -0,0 +1,107 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from db import get_table
+from storage.throttle import (
+    CAPACITY_SHARE, LOW_PRIORITY_RESERVE, READ_CAPACITY, TokenBucket
+)
+
+# Parallel scan segments, each read by its own thread
+SCAN_SEGMENTS = int(os.getenv("DYNAMODB_SCAN_SEGMENTS", 4))
+# Items per Scan page; small pages keep the capacity cap smooth
+SCAN_PAGE_SIZE = int(os.getenv("DYNAMODB_SCAN_PAGE_SIZE", 100))
+# Read capacity units per second one scan may use across all its segments.
+# Defaults to the part of this process's share low-priority work may spend.
+SCAN_READ_CAPACITY = float(os.getenv(
+    "DYNAMODB_SCAN_READ_CAPACITY",
+    READ_CAPACITY * CAPACITY_SHARE * (1 - LOW_PRIORITY_RESERVE)
+))
+
+
+# DynamoDB call totals ({"calls", "seconds"}) of the thread serving a
+# request, which the metrics hooks add to. parallel_scan gives each segment
+# thread its own and adds them to the caller's once every segment has
+# finished, so no two threads ever update the same totals.
+call_totals = contextvars.ContextVar("dynamodb_call_totals", default=None)
+
+
+def wait_for_capacity(bucket):
+    # Blocks until the bucket is out of debt
+    while not bucket.try_take(0):
+        time.sleep(0.05)
+
+
+def parallel_scan(table_name, consumer, projection=None, segments=SCAN_SEGMENTS,
+                  read_capacity=SCAN_READ_CAPACITY):
+    # Reads a whole table as `segments` parallel scans, following every
+    # segment's LastEvaluatedKey, and passes each item to consumer(item).
+    # Consumer calls are serialised, so it needs no locking of its own.
+    # Pages are paced so the scan uses at most `read_capacity` RCU per
+    # second; 0 turns the cap off. Errors from any segment are raised.
+    table = get_table(table_name)
+    bucket = TokenBucket(read_capacity, read_capacity) if read_capacity > 0 else None
+    consumer_lock = threading.Lock()
+
+    scan_kwargs = {
+        "TotalSegments": segments,
+        "Limit": SCAN_PAGE_SIZE,
+        "ReturnConsumedCapacity": "TOTAL"
+    }
+    if projection:
+        scan_kwargs["ProjectionExpression"] = ", ".join(
+            f"#p{i}" for i in range(len(projection))
+        )
+        scan_kwargs["ExpressionAttributeNames"] = {
+            f"#p{i}": name for i, name in enumerate(projection)
+        }
+
+    def scan_segment(segment):
+        kwargs = dict(scan_kwargs, Segment=segment)
+        while True:
+            if bucket:
+                wait_for_capacity(bucket)
+
+            response = table.scan(**kwargs)
+
+            # Pay for the page after the fact; the next page waits out any debt
+            if bucket:
+                bucket.charge(float(
+                    response.get("ConsumedCapacity", {}).get("CapacityUnits", 0)
+                ))
+
+            with consumer_lock:
+                for item in response.get("Items", []):
+                    consumer(item)
+
+            if "LastEvaluatedKey" not in response:
+                return
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    caller_totals = call_totals.get()
+    segment_totals = []
+
+    def run_segment(segment):
+        if caller_totals is not None:
+            totals = {"calls": 0, "seconds": 0.0}
+            segment_totals.append(totals)
+            call_totals.set(totals)
+        scan_segment(segment)
+
+    # Each segment runs in a copy of the caller's context, so low_priority()
+    # and the request's metrics labels carry over to the pool's threads
+    context = contextvars.copy_context()
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as pool:
+            futures = [
+                pool.submit(context.copy().run, run_segment, segment)
+                for segment in range(segments)
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        # Every segment thread has joined once the pool has shut down
+        for totals in segment_totals:
+            for name, value in totals.items():
+                caller_totals[name] += value
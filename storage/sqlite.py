@@ -0,0 +1,85 @@
+import json
+import os
+import sqlite3
+from storage.local import DocumentStore, LocalStorage
+
+
+def to_json(item):
+    # Numbers read back from DynamoDB cursors arrive as Decimal
+    return json.dumps(
+        item,
+        default=lambda v: int(v) if v == int(v) else float(v),
+        separators=(",", ":")
+    )
+
+
+class SQLiteStore(DocumentStore):
+    # Every table lives in one SQLite table of JSON documents. A single
+    # connection per process is shared by all its threads; the store's lock
+    # serialises it and each outermost transaction() maps to one SQLite
+    # transaction. A forked process opens its own connection on first use.
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.pid = None
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    conn = sqlite3.connect(
+                        self.path, check_same_thread=False, isolation_level=None
+                    )
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS items ("
+                        "tbl TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, "
+                        "PRIMARY KEY (tbl, key))"
+                    )
+                    self._conn, self.pid = conn, os.getpid()
+        return self._conn
+
+    def begin(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self.conn.execute("COMMIT")
+
+    def rollback(self):
+        self.conn.execute("ROLLBACK")
+
+    def get(self, table, key):
+        row = self.conn.execute(
+            "SELECT data FROM items WHERE tbl = ? AND key = ?", (table, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, table, key, item):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO items (tbl, key, data) VALUES (?, ?, ?)",
+            (table, key, to_json(item))
+        )
+
+    def delete(self, table, key):
+        self.conn.execute("DELETE FROM items WHERE tbl = ? AND key = ?", (table, key))
+
+    def scan(self, table, after=None, limit=None, prefix=""):
+        # The prefix becomes a key range so the primary key index serves it
+        rows = self.conn.execute(
+            "SELECT data FROM items WHERE tbl = ? AND key > ? "
+            "AND key >= ? AND key < ? ORDER BY key LIMIT ?",
+            (
+                table, after or "", prefix, prefix + "\U0010ffff",
+                -1 if limit is None else limit
+            )
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+class SQLiteStorage(LocalStorage):
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path):
+        super().__init__(SQLiteStore(path))
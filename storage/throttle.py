@@ -0,0 +1,186 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from storage.base import CapacityExceeded
+
+# Provisioned capacity of each table (terraform/dynamoDB.tf) and the share
+# of it this process may spend. With several tasks and workers, set the
+# share to 1 / (tasks * workers) so they stay inside the table's budget.
+READ_CAPACITY = float(os.getenv("DYNAMODB_READ_CAPACITY", 5))
+WRITE_CAPACITY = float(os.getenv("DYNAMODB_WRITE_CAPACITY", 5))
+CAPACITY_SHARE = float(os.getenv("DYNAMODB_CAPACITY_SHARE", 1))
+# Unused capacity a bucket saves up for bursts, in seconds of its rate
+BURST_SECONDS = float(os.getenv("DYNAMODB_BURST_SECONDS", 5))
+# Fraction of each bucket low-priority work may not touch
+LOW_PRIORITY_RESERVE = float(os.getenv("DYNAMODB_LOW_PRIORITY_RESERVE", 0.5))
+# How long a low-priority call may queue for capacity before being shed
+LOW_PRIORITY_WAIT = float(os.getenv("DYNAMODB_LOW_PRIORITY_WAIT", 3))
+
+READ_OPERATIONS = {"GetItem", "Query", "Scan", "BatchGetItem", "TransactGetItems"}
+WRITE_OPERATIONS = {
+    "PutItem", "UpdateItem", "DeleteItem", "BatchWriteItem", "TransactWriteItems"
+}
+THROTTLE_CODES = {
+    "ProvisionedThroughputExceededException", "ThrottlingException",
+    "RequestLimitExceeded"
+}
+
+HIGH = "high"
+LOW = "low"
+priority = contextvars.ContextVar("dynamodb_priority", default=HIGH)
+
+
+@contextmanager
+def low_priority():
+    # Marks the DynamoDB calls made inside the block as sheddable work, such
+    # as analytics and admin scans. Generators must be consumed inside it.
+    token = priority.set(LOW)
+    try:
+        yield
+    finally:
+        priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, cost, floor=0):
+        # Takes `cost` tokens if enough are left above `floor`. A cost larger
+        # than the bucket only needs a full bucket and leaves it in debt.
+        with self.lock:
+            self.refill()
+            if self.tokens - floor < min(cost, self.burst - floor):
+                return False
+            self.tokens -= cost
+            return True
+
+    def charge(self, amount):
+        # Adjusts the bucket after the fact; negative amounts refund
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.burst, self.tokens - amount)
+
+    def drain(self):
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.tokens, 0)
+
+
+def tables_in(params):
+    # Maps each table a request touches to the number of items it touches
+    if "TableName" in params:
+        return {params["TableName"]: 1}
+
+    counts = {}
+    for table, request in params.get("RequestItems", {}).items():
+        # BatchGetItem sends {"Keys": [...]}, BatchWriteItem a list of writes
+        counts[table] = len(request["Keys"] if isinstance(request, dict) else request)
+
+    for item in params.get("TransactItems", []):
+        for action in item.values():
+            counts[action["TableName"]] = counts.get(action["TableName"], 0) + 1
+    return counts
+
+
+def estimate(operation, params):
+    # Capacity a call is expected to use, keyed by (table, "read"/"write").
+    # Transactions cost double; scans and queries are settled afterwards
+    # from the capacity DynamoDB reports.
+    if operation in READ_OPERATIONS:
+        kind = "read"
+    elif operation in WRITE_OPERATIONS:
+        kind = "write"
+    else:
+        return {}
+
+    factor = 2 if operation.startswith("Transact") else 1
+    return {(table, kind): count * factor for table, count in tables_in(params).items()}
+
+
+class CapacityLimiter:
+    # Token buckets per table for reads and writes, applied to every call of
+    # a DynamoDB client through botocore event hooks
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, table, kind):
+        with self.lock:
+            if (table, kind) not in self.buckets:
+                capacity = READ_CAPACITY if kind == "read" else WRITE_CAPACITY
+                rate = capacity * CAPACITY_SHARE
+                self.buckets[(table, kind)] = TokenBucket(rate, rate * BURST_SECONDS)
+            return self.buckets[(table, kind)]
+
+    def acquire(self, costs):
+        # High-priority calls never wait: they take their capacity at once,
+        # leaving the bucket in debt if need be, and that debt holds back
+        # low-priority work instead. Low-priority calls wait with jittered
+        # exponential backoff for capacity above the reserve and are shed
+        # past the deadline.
+        if priority.get() == HIGH:
+            for (table, kind), cost in costs.items():
+                self.bucket(table, kind).charge(cost)
+            return
+
+        deadline = time.monotonic() + LOW_PRIORITY_WAIT
+        for (table, kind), cost in costs.items():
+            bucket = self.bucket(table, kind)
+            attempt = 0
+            while not bucket.try_take(cost, bucket.burst * LOW_PRIORITY_RESERVE):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CapacityExceeded(f"No {kind} capacity left on {table}")
+                time.sleep(min(remaining, random.uniform(0, 0.025 * (2 ** attempt))))
+                attempt = min(attempt + 1, 6)
+
+    # HOOKS
+
+    def prepare_call(self, params, model, context, **kwargs):
+        costs = estimate(model.name, params)
+        if costs:
+            params.setdefault("ReturnConsumedCapacity", "TOTAL")
+        context["limiter_costs"] = costs
+
+    def start_call(self, context, **kwargs):
+        self.acquire(context.get("limiter_costs", {}))
+
+    def finish_call(self, parsed, context, **kwargs):
+        costs = context.get("limiter_costs", {})
+        if not costs:
+            return
+
+        # Throttled despite the budget: empty the buckets so every caller
+        # backs off until capacity refills
+        if parsed.get("Error", {}).get("Code") in THROTTLE_CODES:
+            for table, kind in costs:
+                self.bucket(table, kind).drain()
+            return
+
+        # Replace the estimate with what the call actually consumed
+        consumed = parsed.get("ConsumedCapacity") or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        for entry in consumed:
+            for (table, kind), cost in costs.items():
+                if table == entry.get("TableName"):
+                    self.bucket(table, kind).charge(float(entry.get("CapacityUnits", cost)) - cost)
+
+    def install(self, client):
+        events = client.meta.events
+        events.register("provide-client-params.dynamodb", self.prepare_call)
+        events.register("before-call.dynamodb", self.start_call)
+        events.register("after-call.dynamodb", self.finish_call)
@@ -11,6 +11,26 @@ resource "aws_dynamodb_table" "events_table" {
     type = "S"
   }
 
+  attribute {
+    name = "listing_key"
+    type = "S"
+  }
+
+  attribute {
+    name = "starts_at"
+    type = "N"
+  }
+
+  # Event list: every event in start order, read a page at a time
+  global_secondary_index {
+    name            = "start-time-index"
+    hash_key        = "listing_key"
+    range_key       = "starts_at"
+    projection_type = "ALL"
+    read_capacity   = 5
+    write_capacity  = 5
+  }
+
   tags = {
     Name        = "UniGather-Events"
     Environment = "Dev"
@@ -30,8 +50,168 @@ resource "aws_dynamodb_table" "users_table" {
     type = "S"
   }
 
+  attribute {
+    name = "email"
+    type = "S"
+  }
+
+  attribute {
+    name = "role"
+    type = "S"
+  }
+
+  attribute {
+    name = "name_key"
+    type = "S"
+  }
+
+  # Lets login and registration find a user by email without a full scan
+  global_secondary_index {
+    name               = "email-index"
+    hash_key           = "email"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["password", "role", "full_name", "username", "session_version"]
+    read_capacity      = 5
+    write_capacity     = 5
+  }
+
+  # Admin directory: users of one role in order of lowercase name, for prefix search
+  global_secondary_index {
+    name               = "role-name-index"
+    hash_key           = "role"
+    range_key          = "name_key"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["full_name", "email"]
+    read_capacity      = 5
+    write_capacity     = 5
+  }
+
+  # Admin directory: users of one role in order of email, for prefix search
+  global_secondary_index {
+    name               = "role-email-index"
+    hash_key           = "role"
+    range_key          = "email"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["full_name"]
+    read_capacity      = 5
+    write_capacity     = 5
+  }
+
   tags = {
     Name        = "UniGather-Users"
     Environment = "Dev"
   }
-}
\ No newline at end of file
+}
+
+# DynamoDB Table claiming each email address for exactly one user
+# Registration writes here conditionally so duplicate emails are rejected atomically
+resource "aws_dynamodb_table" "user_emails_table" {
+  name           = "user_emails"
+  billing_mode   = "PROVISIONED"
+  read_capacity  = 5
+  write_capacity = 5
+  hash_key       = "email"
+
+  attribute {
+    name = "email"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "UniGather-UserEmails"
+    Environment = "Dev"
+  }
+}
+
+# DynamoDB Table for pre-aggregated analytics counters
+# Items are keyed by kind ("global", "week", "weekday") and a bucket within it
+resource "aws_dynamodb_table" "analytics_table" {
+  name           = "analytics"
+  billing_mode   = "PROVISIONED"
+  read_capacity  = 5
+  write_capacity = 5
+  hash_key       = "kind"
+  range_key      = "bucket"
+
+  attribute {
+    name = "kind"
+    type = "S"
+  }
+
+  attribute {
+    name = "bucket"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "UniGather-Analytics"
+    Environment = "Dev"
+  }
+}
+
+# DynamoDB Table queueing waitlist promotions owed after cancellations
+resource "aws_dynamodb_table" "promotion_jobs_table" {
+  name           = "promotion_jobs"
+  billing_mode   = "PROVISIONED"
+  read_capacity  = 5
+  write_capacity = 5
+  hash_key       = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "UniGather-PromotionJobs"
+    Environment = "Dev"
+  }
+}
+
+# DynamoDB Table holding one item per booking or waitlist entry
+# status_key is "B#<booked at>" for seats and "W#<position>" for the waitlist
+resource "aws_dynamodb_table" "bookings_table" {
+  name           = "bookings"
+  billing_mode   = "PROVISIONED"
+  read_capacity  = 5
+  write_capacity = 5
+  hash_key       = "event_id"
+  range_key      = "user_id"
+
+  attribute {
+    name = "event_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "user_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "status_key"
+    type = "S"
+  }
+
+  # An event's attendees or waitlist in order, with consistent reads for promotions
+  local_secondary_index {
+    name            = "event-status-index"
+    range_key       = "status_key"
+    projection_type = "KEYS_ONLY"
+  }
+
+  # Every booking of one user, for the event list and reminders
+  global_secondary_index {
+    name            = "user-index"
+    hash_key        = "user_id"
+    range_key       = "status_key"
+    projection_type = "KEYS_ONLY"
+    read_capacity   = 5
+    write_capacity  = 5
+  }
+
+  tags = {
+    Name        = "UniGather-Bookings"
+    Environment = "Dev"
+  }
+}
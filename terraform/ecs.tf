@@ -144,7 +144,20 @@ resource "aws_ecs_task_definition" "app" {
       environment = [
         { name = "DYNAMODB_REGION", value = "eu-west-2" },
         { name = "USERS_TABLE", value = "users" },
-        { name = "EVENTS_TABLE", value = "events" }
+        { name = "EVENTS_TABLE", value = "events" },
+        { name = "USER_EMAILS_TABLE", value = "user_emails" },
+        { name = "ANALYTICS_TABLE", value = "analytics" },
+        { name = "PROMOTION_JOBS_TABLE", value = "promotion_jobs" },
+        { name = "BOOKINGS_TABLE", value = "bookings" },
+        # Each of the 2 gunicorn workers in up to 4 tasks gets an eighth of
+        # every table's 5 RCU/WCU
+        { name = "DYNAMODB_CAPACITY_SHARE", value = "0.125" }
+      ]
+
+      # Injected by ECS at startup, so the key never appears in the task
+      # definition or the Terraform state
+      secrets = [
+        { name = "SECRET_KEY", valueFrom = local.session_secret_arn }
       ]
 
       logConfiguration = {
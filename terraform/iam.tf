@@ -17,6 +17,41 @@ resource "aws_iam_role_policy_attachment" "ecs_exec_attach" {
   policy_arn = "arn:aws:iam::aws:policy/service-role/AmazonECSTaskExecutionRolePolicy"
 }
 
+data "aws_caller_identity" "current" {}
+data "aws_region" "current" {}
+
+locals {
+  session_secret_arn = "arn:aws:ssm:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:parameter${var.session_secret_parameter}"
+}
+
+# Lets ECS read the session signing key, and nothing else, when it starts a task
+resource "aws_iam_role_policy" "ecs_exec_session_secret" {
+  name = "${var.app_name}-session-secret"
+  role = aws_iam_role.ecs_exec.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action   = ["ssm:GetParameters"]
+        Effect   = "Allow"
+        Resource = local.session_secret_arn
+      },
+      {
+        # SecureString parameters encrypted with the AWS managed key
+        Action   = ["kms:Decrypt"]
+        Effect   = "Allow"
+        Resource = "*"
+        Condition = {
+          StringEquals = {
+            "kms:ViaService" = "ssm.${data.aws_region.current.name}.amazonaws.com"
+          }
+        }
+      }
+    ]
+  })
+}
+
 # Task Role
 resource "aws_iam_role" "ecs_task" {
   name = "${var.app_name}-task"
@@ -35,9 +70,12 @@ resource "aws_iam_role_policy" "dynamodb_access" {
       {
         Action = [
           "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:UpdateItem",
           "dynamodb:DeleteItem",
+          "dynamodb:ConditionCheckItem",
           "dynamodb:Query",
           "dynamodb:Scan"
         ]
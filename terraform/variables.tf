@@ -15,4 +15,12 @@ variable "image_tag" {
 variable "domain_name" {
   description = "The custom domain bought on Cloudflare"
   default     = "younesblog.org"
-}
\ No newline at end of file
+}
+
+# The key itself is never given to Terraform, so it stays out of the state
+# and the task definition. Create it once with:
+#   aws ssm put-parameter --type SecureString --name /g13-web-app/secret-key --value <key>
+variable "session_secret_parameter" {
+  description = "SSM SecureString parameter holding the key that signs session cookies"
+  default     = "/g13-web-app/secret-key"
+}
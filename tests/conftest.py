@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Signed sessions need a key, and promotions are drained by the tests
+# themselves rather than a background thread
+os.environ["DEV_MODE"] = "on"
+os.environ["PROMOTION_WORKER"] = "off"
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+
+
+def import_app():
+    # Blueprints bind the storage backend when they are imported, so every
+    # test imports the app again after choosing its backend
+    for name in list(sys.modules):
+        if name in ("app", "db", "startup") or name.startswith(("routes", "storage")):
+            del sys.modules[name]
+
+    import app
+    from storage import get_storage
+    return app.app.test_client(), get_storage()
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def app_env(request, tmp_path, monkeypatch):
+    # (test client, storage) on each backend; dynamodb runs against moto
+    monkeypatch.setenv("STORAGE_BACKEND", request.param)
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "unigather.db"))
+
+    if request.param != "dynamodb":
+        client, storage = import_app()
+        yield client, storage
+        flush_analytics()
+        return
+
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        from benchmark import create_moto_tables
+        create_moto_tables()
+
+        client, storage = import_app()
+        yield client, storage
+        flush_analytics()
+
+
+@pytest.fixture
+def memory_env(monkeypatch):
+    # (test client, storage) on the memory backend only
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    client, storage = import_app()
+    yield client, storage
+    flush_analytics()
+
+
+def flush_analytics():
+    # Lets queued counter updates land before the backend goes away
+    from routes import analytics_store
+    analytics_store.flush()
+
+
+def login_as(client, user):
+    from routes.permissions import SESSION_COOKIE, issue_session
+    client.set_cookie(SESSION_COOKIE, issue_session(user))
+
+
+def create_user(storage, user_id, role="student"):
+    user = {
+        "id": user_id,
+        "full_name": user_id.title(),
+        "email": f"{user_id}@city.ac.uk",
+        "password": "not-a-hash",
+        "role": role
+    }
+    storage.users.create(user)
+    return user
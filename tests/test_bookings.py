@@ -0,0 +1,121 @@
+import pytest
+
+from conftest import create_user, login_as
+
+
+@pytest.fixture
+def staff(app_env):
+    _, storage = app_env
+    return create_user(storage, "staff", "staff")
+
+
+def create_event(client, staff, capacity):
+    login_as(client, staff)
+    response = client.post("/create/submit-event", data={
+        "host_name": "Staff",
+        "host_email": "staff@city.ac.uk",
+        "event_name": "Careers fair",
+        "event_loc": "Great Hall",
+        "event_date": "2030-03-14",
+        "event_time": "18:00",
+        "event_cap": str(capacity),
+        "event_desc": "Meet employers"
+    })
+    assert response.status_code == 201
+    return response.get_json()["event_id"]
+
+
+def book(client, user, event_id):
+    login_as(client, user)
+    return client.post("/book-event", json={"eventId": event_id})
+
+
+def counts(storage, event_id):
+    event = storage.events.get(event_id, consistent=True)
+    return int(event["booked_count"]), int(event["waitlist_count"])
+
+
+def test_booking_at_capacity_joins_waitlist(app_env, staff):
+    client, storage = app_env
+    event_id = create_event(client, staff, capacity=2)
+    users = [create_user(storage, name) for name in ("ada", "ben", "cai")]
+
+    responses = [book(client, user, event_id) for user in users]
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert "waitlist" in responses[2].get_data(as_text=True)
+    assert storage.bookings.booked_user_ids(event_id) == ["ada", "ben"]
+    assert storage.bookings.waitlisted_user_ids(event_id) == ["cai"]
+    assert storage.bookings.status(event_id, "cai") == "waitlisted"
+    assert counts(storage, event_id) == (2, 1)
+
+
+def test_cancel_promotes_first_waiter(app_env, staff):
+    client, storage = app_env
+    from routes.promotions import drain_promotions
+
+    event_id = create_event(client, staff, capacity=1)
+    ada, ben, cai = [create_user(storage, name) for name in ("ada", "ben", "cai")]
+    for user in (ada, ben, cai):
+        assert book(client, user, event_id).status_code == 200
+
+    login_as(client, ada)
+    assert client.post("/cancel-booking", json={"eventId": event_id}).status_code == 200
+
+    # The freed seat is owed to the waitlist; nobody can take it meanwhile
+    dan = create_user(storage, "dan")
+    assert "waitlist" in book(client, dan, event_id).get_data(as_text=True)
+
+    assert drain_promotions() == 1
+
+    assert storage.bookings.booked_user_ids(event_id) == ["ben"]
+    assert storage.bookings.waitlisted_user_ids(event_id) == ["cai", "dan"]
+    assert storage.bookings.user_bookings("ben") == {event_id: "booked"}
+    assert storage.bookings.user_bookings("ada") == {}
+    assert counts(storage, event_id) == (1, 2)
+
+
+def test_booking_twice_is_rejected(app_env, staff):
+    client, storage = app_env
+    event_id = create_event(client, staff, capacity=5)
+    ada = create_user(storage, "ada")
+
+    assert book(client, ada, event_id).status_code == 200
+    assert book(client, ada, event_id).status_code == 400
+
+    assert storage.bookings.booked_user_ids(event_id) == ["ada"]
+    assert counts(storage, event_id) == (1, 0)
+
+
+def test_joining_waitlist_twice_is_rejected(app_env, staff):
+    client, storage = app_env
+    event_id = create_event(client, staff, capacity=1)
+    ada, ben = create_user(storage, "ada"), create_user(storage, "ben")
+
+    assert book(client, ada, event_id).status_code == 200
+    assert book(client, ben, event_id).status_code == 200
+    assert book(client, ben, event_id).status_code == 400
+
+    assert storage.bookings.waitlisted_user_ids(event_id) == ["ben"]
+    assert counts(storage, event_id) == (1, 1)
+
+
+def test_delete_event_removes_its_bookings(app_env, staff):
+    client, storage = app_env
+    event_id = create_event(client, staff, capacity=1)
+    ada, ben = create_user(storage, "ada"), create_user(storage, "ben")
+    book(client, ada, event_id)
+    book(client, ben, event_id)
+
+    login_as(client, staff)
+    response = client.post("/delete-event", json={"eventId": event_id})
+
+    assert response.status_code == 200
+    assert storage.events.get(event_id) is None
+    assert storage.bookings.booked_user_ids(event_id) == []
+    assert storage.bookings.waitlisted_user_ids(event_id) == []
+    assert storage.bookings.user_bookings("ada") == {}
+    assert storage.bookings.user_bookings("ben") == {}
+
+    listed = client.get("/events").get_json()["items"]
+    assert event_id not in [event["id"] for event in listed]
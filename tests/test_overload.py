@@ -0,0 +1,73 @@
+import threading
+
+from conftest import create_user, login_as
+
+
+def test_shed_low_priority_work_answers_503(memory_env, monkeypatch):
+    client, storage = memory_env
+    import storage.throttle as throttle
+    monkeypatch.setattr(throttle, "LOW_PRIORITY_WAIT", 0.05)
+
+    # The memory backend has no DynamoDB client to hook, so put the
+    # limiter in front of the directory search as the client hooks would
+    limiter = throttle.CapacityLimiter()
+    limiter.bucket("users", "read").drain()
+    search = storage.users.search
+
+    def limited_search(*args, **kwargs):
+        limiter.acquire({("users", "read"): 1})
+        return search(*args, **kwargs)
+
+    monkeypatch.setattr(storage.users, "search", limited_search)
+    login_as(client, create_user(storage, "root", "admin"))
+
+    response = client.get("/api/users")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_high_priority_calls_never_wait_for_capacity(memory_env):
+    import storage.throttle as throttle
+
+    limiter = throttle.CapacityLimiter()
+    bucket = limiter.bucket("bookings", "write")
+    bucket.drain()
+
+    # Bookings go through at once and leave the debt to low-priority work
+    limiter.acquire({("bookings", "write"): 3})
+    assert bucket.tokens < 0
+
+
+def test_full_password_queue_answers_503(memory_env, monkeypatch):
+    client, storage = memory_env
+    import routes.passwords as passwords
+    monkeypatch.setattr(passwords, "PASSWORD_CONCURRENCY", 0)
+    monkeypatch.setattr(passwords, "PASSWORD_QUEUE", 0)
+    create_user(storage, "ada")
+
+    login = client.post("/login", data={"email": "ada@city.ac.uk", "password": "pw"})
+    register = client.post("/register", data={
+        "full_name": "Ben", "email": "ben@city.ac.uk", "password": "pw"
+    })
+
+    for response in (login, register):
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+    assert storage.users.find_by_email("ben@city.ac.uk") is None
+
+
+def test_password_check_gives_up_waiting_for_a_slot(memory_env, monkeypatch):
+    client, storage = memory_env
+    import routes.passwords as passwords
+
+    # Every hashing slot is taken by another request
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(passwords, "_slots", slots)
+    monkeypatch.setattr(passwords, "PASSWORD_QUEUE_TIMEOUT", 0.05)
+    create_user(storage, "ada")
+
+    response = client.post("/login", data={"email": "ada@city.ac.uk", "password": "pw"})
+
+    assert response.status_code == 503
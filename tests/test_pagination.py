@@ -0,0 +1,100 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import create_user, login_as
+
+
+def encode(cursor):
+    from routes.pagination import encode_cursor
+    return encode_cursor(cursor)
+
+
+def create_event_at(storage, event_id, when):
+    from routes.timekeys import time_keys
+
+    event = {
+        "id": event_id,
+        "event_name": event_id,
+        "event_date": when.strftime("%Y-%m-%d"),
+        "event_time": when.strftime("%H:%M"),
+        "event_cap": 10,
+        "created_at": datetime.utcnow().isoformat(),
+        "booked_count": 0,
+        "waitlist_count": 0
+    }
+    event.update(time_keys(event))
+    storage.events.create(event)
+
+
+def read_all_pages(client, path):
+    # Follows next_cursor to the end; returns every item in page order
+    items, cursor = [], None
+    while True:
+        url = f"{path}&cursor={cursor}" if cursor else path
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page["items"]) <= 2
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return items
+
+
+def test_event_pages_list_upcoming_then_past_in_start_order(memory_env):
+    client, storage = memory_env
+    now = datetime.now().replace(second=0, microsecond=0)
+    offsets = {"past-2": -48, "past-1": -24, "soon": 24, "later": 48, "latest": 72}
+    # Created out of order, so only the index can put them in order
+    for event_id in ("later", "past-1", "latest", "past-2", "soon"):
+        create_event_at(storage, event_id, now + timedelta(hours=offsets[event_id]))
+
+    login_as(client, create_user(storage, "ada"))
+    items = read_all_pages(client, "/events?limit=2")
+
+    assert [e["id"] for e in items] == ["soon", "later", "latest", "past-2", "past-1"]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    encode(["a", "list"]),
+    encode({"now": "yesterday", "past": False}),
+    encode({"now": int(time.time()), "past": "no"}),
+    encode({"now": int(time.time()), "past": False, "key": "no-such-position"}),
+    encode({"now": int(time.time()), "past": False, "extra": 1})
+])
+def test_event_list_rejects_malformed_cursors(memory_env, cursor):
+    client, storage = memory_env
+
+    assert client.get(f"/events?cursor={cursor}").status_code == 400
+
+
+def test_user_directory_pages_cover_every_user_once(memory_env):
+    client, storage = memory_env
+    admin = create_user(storage, "root", "admin")
+    names = ["ada", "ben", "cai", "dee", "eve"]
+    for i, name in enumerate(names):
+        create_user(storage, name, ["student", "staff"][i % 2])
+
+    login_as(client, admin)
+    items = read_all_pages(client, "/api/users?limit=2")
+
+    assert sorted(u["id"] for u in items) == sorted(names + ["root"])
+    # Pages are merged across roles in name order
+    assert [u["full_name"] for u in items] == sorted(u["full_name"] for u in items)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    encode({"wizard": "done"}),
+    encode({"student": 42}),
+    encode({"student": "name_key#staff#ada"}),
+    encode({"student": {"id": "ada"}})
+])
+def test_user_directory_rejects_malformed_cursors(memory_env, cursor):
+    client, storage = memory_env
+    login_as(client, create_user(storage, "root", "admin"))
+
+    assert client.get(f"/api/users?cursor={cursor}").status_code == 400
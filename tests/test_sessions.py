@@ -0,0 +1,65 @@
+import pytest
+
+from conftest import create_user, login_as
+
+
+@pytest.fixture
+def revalidate_every_request(monkeypatch):
+    # Tokens are normally re-checked against storage after five minutes
+    import routes.permissions as permissions
+    monkeypatch.setattr(permissions, "SESSION_REVALIDATE_AFTER", -1)
+
+
+def token_for(storage, user_id):
+    from routes.permissions import issue_session
+    return issue_session(storage.users.get(user_id))
+
+
+def use_token(client, token):
+    from routes.permissions import SESSION_COOKIE
+    client.set_cookie(SESSION_COOKIE, token)
+
+
+def test_role_change_revokes_existing_sessions(memory_env, revalidate_every_request):
+    client, storage = memory_env
+    create_user(storage, "ada", "staff")
+    admin = create_user(storage, "root", "admin")
+    old_token = token_for(storage, "ada")
+
+    use_token(client, old_token)
+    assert client.get("/reminders").status_code == 200
+
+    login_as(client, admin)
+    response = client.post("/update-role", json={"userId": "ada", "newRole": "student"})
+    assert response.status_code == 200
+
+    # The staff token no longer identifies anyone
+    use_token(client, old_token)
+    assert client.get("/reminders").status_code == 401
+    assert client.post("/create/submit-event", data={}).status_code == 403
+
+    # Logging in again gives a session with the new role
+    use_token(client, token_for(storage, "ada"))
+    assert client.get("/reminders").status_code == 200
+    assert client.post("/create/submit-event", data={}).status_code == 403
+
+
+def test_revalidated_session_is_reissued(memory_env, revalidate_every_request):
+    client, storage = memory_env
+    create_user(storage, "ada")
+
+    use_token(client, token_for(storage, "ada"))
+    response = client.get("/reminders")
+
+    assert response.status_code == 200
+    assert "session=" in response.headers.get("Set-Cookie", "")
+
+
+def test_update_role_of_unknown_user_is_404(memory_env):
+    client, storage = memory_env
+    login_as(client, create_user(storage, "root", "admin"))
+
+    response = client.post("/update-role", json={"userId": "ghost", "newRole": "staff"})
+
+    assert response.status_code == 404
+    assert storage.users.get("ghost") is None